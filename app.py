@@ -1,10 +1,41 @@
+import os
+import sqlite3
+
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
-from financial_model import General, Construction, Financing, OperationExit, Amortization, Scheduler, CashflowEngine, Parking, CapexSummary
+from pipeline import ModelGraph
+from cache import ResultCache
+from kpis import IRR_OK, IRR_MULTIPLE_SIGN_CHANGES, IRR_STATUS_LABELS
+from montecarlo import Distribution, run_monte_carlo
+from gradients import Gradients
+from optimizer import MixOptimizer
+from sensitivity import SensitivityEngine
+from goalseek import GoalSeeker
+from importer import import_asset_costs, import_units
+from export import export_model
+from viz import aggregate_periods, fan_chart, large_dataframe, scatter
+import instrument
 
 st.set_page_config(layout="wide", page_title="EstateOS", page_icon="🏢", initial_sidebar_state="collapsed")
 
+
+@st.cache_resource
+def get_model_graph():
+    # Cache disque partagé entre sessions et redémarrages ; sans répertoire accessible, mémoire seule
+    try:
+        store = ResultCache()
+    except (OSError, sqlite3.Error):
+        store = None
+    return ModelGraph(store=store)
+
+
+@st.cache_resource(max_entries=8)
+def get_goal_seeker(df_units, base_inputs, _units_table):
+    # Un solveur par table d'unités / scénario de base : le dernier point résolu sert de départ au suivant
+    return GoalSeeker(_units_table, base_inputs)
+
 # --- CSS INJECTION (Style Titanium) ---
 st.markdown("""
     <style>
@@ -69,7 +100,14 @@ with col_build:
                 {"Asset Class": "logistics", "Cost €/m²": 800},
                 {"Asset Class": "hotel", "Cost €/m²": 1500},
             ])
-            df_asset_costs = st.data_editor(default_costs, num_rows="dynamic", use_container_width=True)
+            costs_file = st.file_uploader("Importer les coûts (Excel, CSV, Parquet)", type=["xlsx", "xlsm", "csv", "parquet"], key="costs_file")
+            costs_key = "costs_editor"
+            if costs_file is not None:
+                imported_costs = import_asset_costs(costs_file)
+                default_costs, costs_key = imported_costs.df, f"costs_editor_{imported_costs.key[:12]}"
+                if imported_costs.missing:
+                    st.warning(f"Colonnes absentes : {', '.join(imported_costs.missing)}")
+            df_asset_costs = st.data_editor(default_costs, num_rows="dynamic", use_container_width=True, key=costs_key)
             i_struct = i_finish = 0
         else:
             c1, c2 = st.columns(2)
@@ -100,6 +138,14 @@ with col_build:
         for _ in range(6): units_data.append({"Code": "T2-VEFA", "AssetClass": "residential", "Surface (GLA m²)": 70, "Rent (€/m²/mo)": 16, "Price €/m²": 2300, "Start Year": 3, "Sale Year": 1, "Mode": "Mixed", "Parking per unit": 1.5, "Parking ratio (per 100 m²)": 0, "Occ %": 95, "Rent growth %": 4, "Asset Value Growth (%/yr)": 4})
         
         df_default_units = pd.DataFrame(units_data)
+        units_key = "units_editor_v6"
+        units_file = st.file_uploader("Importer les unités (Excel, CSV, Parquet)", type=["xlsx", "xlsm", "csv", "parquet"], key="units_file")
+        if units_file is not None:
+            imported_units = import_units(units_file)
+            df_default_units, units_key = imported_units.df, f"units_editor_{imported_units.key[:12]}"
+            st.caption(f"{len(df_default_units)} unités importées" + (" (cache)" if imported_units.from_cache else ""))
+            if imported_units.missing:
+                st.warning(f"Colonnes absentes : {', '.join(imported_units.missing)}")
         
         col_conf = {
             "AssetClass": st.column_config.SelectboxColumn(options=["office", "residential", "retail", "logistics", "hotel"]),
@@ -108,7 +154,16 @@ with col_build:
             "Rent (€/m²/mo)": st.column_config.NumberColumn(format="%.2f €"),
         }
         # KEY CHANGÉE POUR FORCER LE RELOAD
-        df_units = st.data_editor(df_default_units, column_config=col_conf, num_rows="dynamic", use_container_width=True, height=350, key="units_editor_v6")
+        df_units = st.data_editor(df_default_units, column_config=col_conf, num_rows="dynamic", use_container_width=True, height=350, key=units_key)
+
+        with st.expander("🧮 Optimiseur de mix (par Code)"):
+            use_optimizer = st.toggle("Optimiser Mode / année de vente", False)
+            optimizer_objectives = {"VAN": 'NPV', "TRI %": 'Levered IRR'}
+            c1, c2 = st.columns(2)
+            i_opt_objective = c1.selectbox("Maximiser", list(optimizer_objectives))
+            i_opt_dscr = c2.number_input("DSCR min (0 = libre)", 0.0, value=0.0, step=0.1)
+            i_opt_peak = c1.number_input("Equity de pointe max € (0 = libre)", 0, value=0, step=1000000)
+            i_opt_presale = c2.number_input("Pré-ventes résidentielles min %", 0.0, 100.0, 0.0, step=5.0)
 
     # 4. FINANCE
     with tab_fin:
@@ -128,11 +183,40 @@ with col_build:
             i_sell_fees = c2.number_input("Frais Vente %", 5.0)
             i_tax = c1.number_input("IS %", 30.0)
             i_tax_h = c2.number_input("Exonération", 3)
+            frequencies = {"Annuel": 'annual', "Trimestriel": 'quarterly', "Mensuel": 'monthly'}
+            i_freq = c1.selectbox("Pas de temps", list(frequencies))
         
         i_occ = 90; i_rent_g = 2.5; i_inf = 4.0; i_opex = 28.0; i_pm = 4.5
 
+        with st.expander("🎯 Solveur d'objectif"):
+            use_solver = st.toggle("Résoudre", False)
+            solver_variables = {"Dette (€)": 'debt_amount', "Yield Sortie %": 'exit_yield', "Niveau de loyers (×)": 'units_rent_multiplier'}
+            solver_metrics = {"TRI %": 'Levered IRR', "LTC %": 'LTC', "DSCR min": 'Min DSCR'}
+            c1, c2 = st.columns(2)
+            i_solve_var = c1.selectbox("Variable", list(solver_variables))
+            i_solve_metric = c2.selectbox("Objectif", list(solver_metrics))
+            i_solve_target = st.number_input("Cible", value=15.0)
+
+        with st.expander("🎲 Risque (Monte Carlo)"):
+            use_mc = st.toggle("Simuler", False)
+            c1, c2 = st.columns(2)
+            i_mc_paths = c1.number_input("Tirages", 1000, 1000000, 20000, step=1000)
+            i_mc_seed = c2.number_input("Graine", 0, value=0)
+            i_mc_jobs = st.number_input("Processus", 1, os.cpu_count() or 1, os.cpu_count() or 1)
+            st.caption("Écarts-types (points)")
+            c1, c2 = st.columns(2)
+            i_sd_exit = c1.number_input("σ Yield Sortie", 0.0, value=0.5)
+            i_sd_rent_g = c2.number_input("σ Croissance loyers", 0.0, value=0.5)
+            i_sd_occ = c1.number_input("σ Occupation", 0.0, value=3.0)
+            i_sd_rate = c2.number_input("σ Taux", 0.0, value=0.5)
+
+        with st.expander("🎯 Sensibilité"):
+            use_sens = st.toggle("Analyser", False)
+            st.caption("Tableau Yield de sortie × Croissance des loyers, tornado et gradients du TRI")
+
     st.write("")
     run = st.button("⚡ CALCULER & GÉNÉRER LE RAPPORT", type="primary", use_container_width=True)
+    perf_memory = st.toggle("⏱️ Mesurer la mémoire allouée (tracemalloc, plus lent)", False)
 
 
 # --- DASHBOARD DE RÉSULTATS ---
@@ -141,21 +225,21 @@ with col_viz:
         # MAPPING
         inp_gen = {'land_area': i_land_area, 'parcels': 3, 'construction_rate': i_const_rate, 'far': i_far, 'building_efficiency': i_eff, 'country': "Tanzanie", 'city': i_city, 'fx_eur_local': 2853.1, 'corporate_tax_rate': i_tax, 'tax_holiday': i_tax_h, 'discount_rate': 10.0}
         inp_park = {'cost_per_space': i_parking_cost}
-        park = Parking(inp_park, df_units)
-        inp_const = {'structure_cost': i_struct if not use_research else 0, 'finishing_cost': i_finish if not use_research else 0, 'utilities_cost': 200, 'permit_fees': i_permits, 'architect_fees_pct': i_arch, 'development_fees_pct': 2.0, 'marketing_fees_pct': 1.0, 'contingency_pct': i_contingency, 's_curve_y1': s1/100, 's_curve_y2': s2/100, 's_curve_y3': s3/100, 'use_research_cost': use_research, 'df_asset_costs': df_asset_costs, 'amenities_total_capex': i_amenities, 'parking_capex': park.total_capex}
+        inp_const = {'structure_cost': i_struct if not use_research else 0, 'finishing_cost': i_finish if not use_research else 0, 'utilities_cost': 200, 'permit_fees': i_permits, 'architect_fees_pct': i_arch, 'development_fees_pct': 2.0, 'marketing_fees_pct': 1.0, 'contingency_pct': i_contingency, 's_curve_y1': s1/100, 's_curve_y2': s2/100, 's_curve_y3': s3/100, 'use_research_cost': use_research, 'df_asset_costs': df_asset_costs, 'amenities_total_capex': i_amenities}
         inp_fin = {'debt_amount': i_debt, 'interest_rate': i_rate, 'loan_term': i_term, 'grace_period': i_grace, 'arrangement_fee_pct': i_arr_fee, 'upfront_fees': i_upfront, 'prepayment_fee_pct': i_prepay}
-        inp_op = {'rent_growth': i_rent_g, 'exit_yield': i_exit_y, 'holding_period': i_hold, 'inflation': i_inf, 'opex_per_m2': i_opex, 'pm_fee_pct': i_pm, 'occupancy_rate': i_occ, 'transac_fees_exit': i_sell_fees}
+        inp_op = {'rent_growth': i_rent_g, 'exit_yield': i_exit_y, 'holding_period': i_hold, 'inflation': i_inf, 'opex_per_m2': i_opex, 'pm_fee_pct': i_pm, 'occupancy_rate': i_occ, 'transac_fees_exit': i_sell_fees, 'frequency': frequencies[i_freq]}
 
+        # Mesures par étape du calcul, affichées dans le panneau Performance
+        recorder = instrument.subscribe(instrument.Recorder(), memory=perf_memory)
         try:
-            # INSTANCIATION SANS ERREUR
-            gen = General(inp_gen)
-            const = Construction(inp_const, gen, df_units)
-            fin = Financing(inp_fin)
-            op = OperationExit(inp_op)
-            capex_sum = CapexSummary(const, fin)
-            amort = Amortization(fin, op)
-            sched = Scheduler(df_units, op, gen, fin)
-            cf = CashflowEngine(gen, const, fin, capex_sum, op, amort, sched)
+            # INSTANCIATION SANS ERREUR (seules les étapes dont les entrées ont changé sont recalculées)
+            stages = get_model_graph().run(df_units, inp_gen, inp_park, inp_const, inp_fin, inp_op)
+            units_table = stages['UnitsTable']
+            capex_sum = stages['CapexSummary']
+            cf = stages['CashflowEngine']
+            if units_table.errors:
+                st.warning(f"⚠️ Units : {len(units_table.errors)} valeur(s) invalide(s), remplacées par des valeurs neutres")
+                st.dataframe(units_table.error_report(), use_container_width=True, hide_index=True)
 
             st.markdown("### 🎯 Performance")
             k1, k2, k3, k4 = st.columns(4)
@@ -163,11 +247,34 @@ with col_viz:
             k2.metric("Equity Mult.", f"{cf.kpis['Equity Multiple']:.2f}x")
             k3.metric("Profit (NPV)", f"€{cf.kpis['NPV']:,.0f}")
             k4.metric("Equity Req.", f"€{cf.kpis['Peak Equity']:,.0f}")
+            if cf.kpis['IRR Status'] == IRR_MULTIPLE_SIGN_CHANGES:
+                st.caption(f"ℹ️ TRI : {IRR_STATUS_LABELS[cf.kpis['IRR Status']]}")
+            elif cf.kpis['IRR Status'] != IRR_OK:
+                st.warning(f"TRI : {IRR_STATUS_LABELS[cf.kpis['IRR Status']]}")
+            reused = [name if state == 'hit' else f"{name} (disque)" for name, state in stages.state.items() if state != 'miss']
+            if reused:
+                st.caption(f"♻️ Étapes réutilisées : {', '.join(reused)}")
 
-            t1, t2, t3 = st.tabs(["📊 Flux", "📋 CAPEX", "📈 Détails"])
+            base_inputs = {**inp_gen, **inp_park, **inp_const, **inp_fin, **inp_op}
+            # Solveur, Monte Carlo, sensibilités et optimiseur de mix passent par le lot vectorisé, calculé en pas annuel
+            annual = inp_op['frequency'] == 'annual'
+            annual_only = f"Disponible en pas annuel uniquement (pas actuel : {i_freq.lower()})."
+            if use_solver and not annual:
+                st.warning(f"🎯 Solveur : {annual_only}")
+            elif use_solver:
+                with instrument.span("GoalSeeker"):
+                    solved = get_goal_seeker(df_units, base_inputs, units_table).solve(solver_variables[i_solve_var], solver_metrics[i_solve_metric], i_solve_target)
+                if solved.converged:
+                    st.success(f"🎯 {i_solve_var} = **{solved.value:,.2f}** → {i_solve_metric} {solved.achieved:,.2f} ({solved.evaluations} évaluations)")
+                else:
+                    st.warning(f"🎯 {solved.message} : meilleur point {i_solve_var} = {solved.value:,.2f} → {i_solve_metric} {solved.achieved:,.2f}")
+
+            t1, t2, t3, t4, t5, t6 = st.tabs(["📊 Flux", "📋 CAPEX", "📈 Détails", "🎲 Risque", "🎯 Sensibilité", "🧮 Mix"])
             
             with t1:
-                fig = px.bar(cf.df, x=cf.df.index, y=['NOI', 'Debt Service', 'Net Cash Flow'], 
+                # Pas mensuel : périodes regroupées côté serveur au-delà de 120 barres
+                df_flows = aggregate_periods(cf.df[['NOI', 'Debt Service', 'Net Cash Flow']])
+                fig = px.bar(df_flows, x=df_flows.index, y=['NOI', 'Debt Service', 'Net Cash Flow'],
                              title="Flux de Trésorerie", 
                              color_discrete_map={'NOI': '#10B981', 'Debt Service': '#EF4444', 'Net Cash Flow': '#3B82F6'})
                 fig.update_layout(plot_bgcolor="white", height=350, showlegend=False)
@@ -182,10 +289,130 @@ with col_viz:
                 st.dataframe(df_capex.style.format({"Montant": "{:,.0f} €"}), use_container_width=True, hide_index=True)
 
             with t3:
-                st.dataframe(cf.df.style.format("{:,.0f}"), use_container_width=True)
+                st.dataframe(cf.annual().style.format("{:,.0f}"), use_container_width=True)
+                if cf.periods_per_year > 1:
+                    with st.expander(f"Détail par période ({i_freq.lower()})"):
+                        large_dataframe(cf.df, use_container_width=True)
+                st.download_button("⬇️ Export Excel (toutes les feuilles)", lambda: export_model(stages, inputs=base_inputs), file_name="estateos_model.xlsx",
+                                   mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+            with t4:
+                if use_mc and not annual:
+                    st.info(f"🎲 Monte Carlo : {annual_only}")
+                elif use_mc:
+                    distributions = {
+                        'exit_yield': Distribution('normal', i_exit_y, i_sd_exit, low=0.5),
+                        'rent_growth': Distribution('normal', i_rent_g, i_sd_rent_g),
+                        'occupancy_rate': Distribution('normal', i_occ, i_sd_occ, low=0, high=100),
+                        'Occ %': Distribution('normal', 0, i_sd_occ, low=-100),
+                        'interest_rate': Distribution('normal', i_rate, i_sd_rate, low=0),
+                    }
+                    with instrument.span("Monte Carlo", rows=int(i_mc_paths)):
+                        mc = run_monte_carlo(distributions, units_table, base_inputs, n_paths=int(i_mc_paths), seed=int(i_mc_seed),
+                                             jobs=int(i_mc_jobs))
+                    summary = mc.summary()
+                    r1, r2, r3 = st.columns(3)
+                    r1.metric("TRI P5", f"{summary.loc['Levered IRR', 'P5']:.2f}%")
+                    r2.metric("TRI P50", f"{summary.loc['Levered IRR', 'P50']:.2f}%")
+                    r3.metric("TRI P95", f"{summary.loc['Levered IRR', 'P95']:.2f}%")
+                    hist = mc.histograms['Levered IRR']
+                    df_hist = pd.DataFrame({'TRI (%)': (hist.edges[:-1] + hist.edges[1:]) / 2, 'Tirages': hist.counts})
+                    df_hist = df_hist[(df_hist['TRI (%)'] >= hist.min) & (df_hist['TRI (%)'] <= hist.max)]
+                    fig = px.bar(df_hist, x='TRI (%)', y='Tirages', title="Distribution du TRI")
+                    fig.update_layout(plot_bgcolor="white", height=300, bargap=0)
+                    st.plotly_chart(fig, use_container_width=True)
+                    fig = fan_chart(mc.bands(), title="Trésorerie cumulée (P5 - P95)", yaxis_title="€")
+                    fig.update_layout(height=320)
+                    st.plotly_chart(fig, use_container_width=True)
+                    fig = scatter(mc.sample['Levered IRR'], mc.sample['NPV'], x_title="TRI (%)", y_title="VAN (€)",
+                                  title=f"TRI × VAN ({len(mc.sample):,} tirages sur {mc.n_paths:,})")
+                    fig.update_layout(height=320)
+                    st.plotly_chart(fig, use_container_width=True)
+                    st.dataframe(summary.style.format("{:,.2f}"), use_container_width=True)
+                else:
+                    st.info("Activez la simulation dans Finance › Risque (Monte Carlo).")
+
+            with t5:
+                if use_sens and not annual:
+                    st.info(f"🎯 Sensibilité : {annual_only}")
+                elif use_sens:
+                    sens = SensitivityEngine(units_table, base_inputs)
+                    exit_yields = [round(i_exit_y + d, 2) for d in np.arange(-1.5, 1.51, 0.25)]
+                    growth_shifts = [round(d, 2) for d in np.arange(-2.0, 2.01, 0.5)]
+                    with instrument.span("Sensibilité (grille)", rows=len(exit_yields) * len(growth_shifts)):
+                        grid = sens.grid('exit_yield', exit_yields, 'units_rent_growth_shift', growth_shifts)
+                    fig = px.imshow(grid, text_auto=".1f", aspect="auto", color_continuous_scale="RdYlGn",
+                                    labels={'x': "Yield Sortie %", 'y': "Δ Croissance loyers (pts)", 'color': "TRI %"},
+                                    title="TRI : Yield de sortie × Croissance des loyers")
+                    fig.update_layout(height=380)
+                    st.plotly_chart(fig, use_container_width=True)
+
+                    with instrument.span("Sensibilité (tornado)"):
+                        tornado = sens.tornado()
+                    base_irr = tornado['Base'].iloc[0]
+                    df_tornado = pd.concat([
+                        pd.DataFrame({'Input': tornado['Input'], 'Borne': "Basse", 'Δ TRI (pts)': tornado['KPI Low'] - base_irr}),
+                        pd.DataFrame({'Input': tornado['Input'], 'Borne': "Haute", 'Δ TRI (pts)': tornado['KPI High'] - base_irr}),
+                    ])
+                    fig = px.bar(df_tornado, y='Input', x='Δ TRI (pts)', color='Borne', orientation='h', barmode='overlay',
+                                 title=f"Tornado (TRI base {base_irr:.2f}%)", category_orders={'Input': tornado['Input'].tolist()},
+                                 color_discrete_map={"Basse": '#EF4444', "Haute": '#10B981'})
+                    fig.update_layout(plot_bgcolor="white", height=450)
+                    st.plotly_chart(fig, use_container_width=True)
+
+                    with st.expander("∂ Gradients (une évaluation)"):
+                        with instrument.span("Sensibilité (gradients)"):
+                            grads = Gradients(sens.units, base_inputs)
+                        for flag in grads.flags:
+                            st.warning(flag)
+                        df_grad = grads.gradient.rename(columns={'Value': "Valeur", 'Levered IRR': "∂ TRI (pts)", 'NPV': "∂ VAN",
+                                                                 'Equity Multiple': "∂ Multiple", 'Peak Equity': "∂ Equity",
+                                                                 'Switch': "Branche la plus proche", 'Switch Distance': "Écart"})
+                        st.caption("Dérivées par unité d'entrée ; « Écart » : variation de l'entrée qui ferait changer de branche "
+                                   "(impôt, signe des flux, dette, bornes d'occupation), au-delà de laquelle l'approximation linéaire ne tient plus.")
+                        st.dataframe(df_grad.style.format({"Valeur": "{:,.2f}", "∂ TRI (pts)": "{:,.4f}", "∂ VAN": "{:,.0f}",
+                                                           "∂ Multiple": "{:,.4f}", "∂ Equity": "{:,.0f}", "Écart": "{:,.2f}"}),
+                                     use_container_width=True)
+                else:
+                    st.info("Activez l'analyse dans Finance › Sensibilité.")
+
+            with t6:
+                if use_optimizer and not annual:
+                    st.info(f"🧮 Optimiseur : {annual_only}")
+                elif use_optimizer:
+                    with instrument.span("Optimiseur de mix"):
+                        mix = MixOptimizer(df_units, base_inputs).optimize(
+                            optimizer_objectives[i_opt_objective], min_dscr=i_opt_dscr or None, max_peak_equity=i_opt_peak or None,
+                            presale_share=i_opt_presale / 100 or None)
+                    if not mix.feasible:
+                        st.warning(f"🧮 {mix.message}")
+                    r1, r2, r3 = st.columns(3)
+                    r1.metric("TRI", f"{mix.kpis['Levered IRR']:.2f}%", delta=f"{mix.kpis['Levered IRR'] - mix.baseline['Levered IRR']:+.2f} pts")
+                    r2.metric("VAN", f"€{mix.kpis['NPV']:,.0f}", delta=f"€{mix.kpis['NPV'] - mix.baseline['NPV']:+,.0f}")
+                    r3.metric("DSCR min", f"{mix.kpis['Min DSCR']:.2f}")
+                    st.caption(f"{mix.evaluations:,} mix évalués, {mix.pruned:,} branches écartées par bornes, {mix.elapsed:.2f} s"
+                               + ("" if mix.exhaustive else " (recherche en faisceau)") + " — pas annuel")
+                    st.dataframe(mix.choices.style.format({"Surface": "{:,.0f}"}), use_container_width=True, hide_index=True)
+                    st.download_button("⬇️ Unités optimisées (CSV)", mix.units().to_csv(index=False), file_name="units_optimized.csv", mime="text/csv")
+                else:
+                    st.info("Activez l'optimiseur dans Unités › Optimiseur de mix.")
+
+            with st.expander("⏱️ Performance"):
+                perf = recorder.frame()
+                perf['stage'] = ['↳ ' * int(d) + name for d, name in zip(perf['depth'], perf['stage'])]
+                perf[['wall_s', 'self_s', 'cpu_s']] *= 1000
+                perf['alloc_bytes'] /= 2**20
+                perf = perf.rename(columns={'stage': "Étape", 'cache': "Cache", 'wall_s': "Total ms", 'self_s': "Propre ms",
+                                            'cpu_s': "CPU ms", 'alloc_bytes': "Alloué Mo", 'rows': "Lignes"}).drop(columns='depth')
+                top = recorder.frame().query("depth == 0")
+                st.caption(f"Dernier calcul : {top['wall_s'].sum() * 1000:,.0f} ms sur {len(top)} étapes")
+                st.dataframe(perf.style.format({"Total ms": "{:,.2f}", "Propre ms": "{:,.2f}", "CPU ms": "{:,.2f}", "Alloué Mo": "{:,.2f}", "Lignes": "{:,.0f}"}, na_rep=""),
+                             use_container_width=True, hide_index=True)
 
         except Exception as e:
             st.error(f"Erreur de calcul : {e}")
+        finally:
+            instrument.unsubscribe(recorder)
     else:
         st.info("👈 Modifiez les paramètres et lancez la simulation.")
         # Placeholder
@@ -0,0 +1,421 @@
+"""
+Évaluation vectorisée d'un lot de scénarios sur la chaîne General -> CashflowEngine.
+
+Un scénario est un dict plat regroupant les clés lues par General, Parking,
+Construction, Financing et OperationExit. Les classes Batch* reprennent les
+calculs de financial_model avec un axe scénario en tête : entrées en tableaux
+(N,) (ou (1,), diffusés), sorties en tableaux (N, années).
+"""
+import numpy as np
+import numpy_financial as npf
+import pandas as pd
+
+from financial_model import CASHFLOW_COLUMNS, UnitsTable
+from instrument import span
+from kpis import equity_kpis
+
+# Clé -> valeur par défaut (identique aux classes de financial_model)
+SCENARIO_INPUTS = {
+    # [Feuille General]
+    'building_efficiency': 80.0, 'corporate_tax_rate': 30.0, 'tax_holiday': 3, 'discount_rate': 10.0,
+    # [Feuille Parking]
+    'cost_per_space': 18754,
+    # [Feuille Construction]
+    'structure_cost': 800, 'finishing_cost': 400, 'utilities_cost': 200, 'permit_fees': 20000,
+    'architect_fees_pct': 3.0, 'development_fees_pct': 2.0, 'marketing_fees_pct': 1.0, 'contingency_pct': 5.0,
+    's_curve_y1': 40.0, 's_curve_y2': 40.0, 's_curve_y3': 20.0, 'use_research_cost': True,
+    'amenities_total_capex': 0, 'parking_capex': np.nan,
+    # [Feuille Financing]
+    'debt_amount': 14500000.0, 'interest_rate': 4.5, 'loan_term': 20, 'grace_period': 2,
+    'arrangement_fee_pct': 1.0, 'upfront_fees': 150000.0, 'prepayment_fee_pct': 2.0,
+    # [Feuille Operation] & [Feuille Exit]
+    'inflation': 4.0, 'rent_growth': 2.5, 'opex_per_m2': 28.0, 'pm_fee_pct': 4.5, 'occupancy_rate': 90.0,
+    'holding_period': 20, 'exit_yield': 8.25, 'transac_fees_exit': 5.0,
+    # [Feuille Units] : décalage (en points) des colonnes 'Occ %' et 'Rent growth %' renseignées,
+    # multiplicateur de la colonne 'Rent (€/m²/mo)'
+    'units_occ_shift': 0.0, 'units_rent_growth_shift': 0.0, 'units_rent_multiplier': 1.0,
+}
+INTEGER_INPUTS = ('loan_term', 'grace_period', 'holding_period')
+# Étapes du lot -> entrées lues (le cash flow relit aussi holding_period, rent_growth et inflation)
+STAGE_INPUTS = {
+    'capex': (
+        'building_efficiency', 'cost_per_space', 'structure_cost', 'finishing_cost', 'utilities_cost', 'permit_fees',
+        'architect_fees_pct', 'development_fees_pct', 'marketing_fees_pct', 'contingency_pct',
+        's_curve_y1', 's_curve_y2', 's_curve_y3', 'use_research_cost', 'amenities_total_capex', 'parking_capex',
+        'debt_amount', 'arrangement_fee_pct', 'upfront_fees',
+    ),
+    'amortization': ('debt_amount', 'interest_rate', 'loan_term', 'grace_period', 'holding_period'),
+    'scheduler': (
+        'holding_period', 'occupancy_rate', 'rent_growth', 'inflation',
+        'units_occ_shift', 'units_rent_growth_shift', 'units_rent_multiplier',
+    ),
+    'cashflow': tuple(SCENARIO_INPUTS),
+}
+# Clés acceptées mais sans effet sur les flux
+DESCRIPTIVE_INPUTS = ('land_area', 'parcels', 'construction_rate', 'far', 'country', 'city', 'fx_eur_local')
+# Le lot est calculé en pas annuel : 'frequency' est acceptée si elle vaut 'annual'
+FREQUENCY = 'annual'
+
+KPI_COLUMNS = ['Levered IRR', 'NPV', 'Equity Multiple', 'Peak Equity', 'IRR Status']
+
+# Taille cible des tenseurs (scénarios, profils, années) par bloc
+_CHUNK_ELEMENTS = 2_000_000
+
+
+class BatchInputs:
+    """
+    Colonnes d'entrées (N,) : liste de dicts, dict de tableaux ou DataFrame.
+    `base_inputs` fournit les valeurs communes au lot, dont `df_asset_costs`.
+    """
+    def __init__(self, scenarios, base_inputs=None):
+        base = dict(base_inputs or {})
+        self.df_asset_costs = base.pop('df_asset_costs', None)
+
+        if isinstance(scenarios, pd.DataFrame):
+            raw = {c: scenarios[c].to_numpy() for c in scenarios.columns}
+        elif isinstance(scenarios, dict):
+            raw = {k: np.asarray(v) for k, v in scenarios.items()}
+        else:
+            scenarios = list(scenarios)
+            if self.df_asset_costs is None:
+                self.df_asset_costs = next((s['df_asset_costs'] for s in scenarios if 'df_asset_costs' in s), None)
+            raw = {k: v.to_numpy() for k, v in pd.DataFrame([{k: v for k, v in s.items() if k != 'df_asset_costs'} for s in scenarios]).items()}
+        raw.pop('df_asset_costs', None)
+        frequencies = {base.pop('frequency', FREQUENCY)} | set(pd.Series(np.atleast_1d(raw.get('frequency', FREQUENCY))).dropna())
+        if frequencies != {FREQUENCY}:
+            raise ValueError(f"Le lot est calculé en pas annuel : frequency={sorted(frequencies - {FREQUENCY})} non pris en charge "
+                             "(utiliser la chaîne de financial_model)")
+        if self.df_asset_costs is None:
+            self.df_asset_costs = pd.DataFrame()
+
+        unknown = set(raw) | set(base)
+        unknown -= set(SCENARIO_INPUTS) | set(DESCRIPTIVE_INPUTS) | {'frequency'}
+        if unknown:
+            raise KeyError(f"Entrées inconnues : {sorted(unknown)}")
+
+        shapes = [np.shape(np.atleast_1d(v)) for v in raw.values()]
+        self.n = np.broadcast_shapes(*shapes)[0] if shapes else 1
+        self.columns = {}
+        for key, default in SCENARIO_INPUTS.items():
+            fill = base.get(key, default)
+            if key in raw:
+                values = np.broadcast_to(_as_float(raw[key]), (self.n,))
+                values = np.where(np.isnan(values), fill, values)
+            else:
+                values = np.full(self.n, fill, dtype=np.float64)
+            if key in INTEGER_INPUTS:
+                values = np.trunc(values).astype(np.int64)
+            self.columns[key] = values
+        self.columns['use_research_cost'] = self.columns['use_research_cost'] != 0
+
+        if (self.columns['holding_period'] < 1).any():
+            raise ValueError("holding_period doit être >= 1")
+
+    def __getitem__(self, key):
+        return self.columns[key]
+
+    def __len__(self):
+        return self.n
+
+    def take(self, index):
+        """Sous-lot (slice ou tableau d'indices)."""
+        subset = object.__new__(BatchInputs)
+        subset.df_asset_costs = self.df_asset_costs
+        subset.columns = {k: v[index] for k, v in self.columns.items()}
+        subset.n = len(subset.columns['holding_period'])
+        return subset
+
+
+class BatchUnits:
+    """
+    [Feuille Units] réduite une fois pour tout le lot : surfaces pour la
+    construction, places de parking, et profils de revenus (unités
+    regroupées par caractéristiques identiques, poids sommés).
+    `df_units` peut être une UnitsTable déjà construite.
+    """
+    def __init__(self, df_units: pd.DataFrame, df_asset_costs: pd.DataFrame = None):
+        df_asset_costs = pd.DataFrame() if df_asset_costs is None else df_asset_costs
+        units = self.table = UnitsTable.of(df_units)
+        self.asset_classes = units.asset_classes
+
+        # [Feuille Parking]
+        self.parking_spaces = units.parking_spaces
+
+        # [Feuille Construction]
+        self.total_units_gla = units.total_gla
+        self.has_asset_costs = not df_asset_costs.empty
+        self.asset_cost_gla = []
+        if self.has_asset_costs and units.has_asset_class:
+            for _, row in df_asset_costs.iterrows():
+                self.asset_cost_gla.append((units.gla_matching(row['Asset Class']), row['Cost €/m²']))
+
+        # Profils de revenus
+        earns = units.is_rent | units.is_sale
+        keys = pd.DataFrame({
+            'asset': units.asset_codes, 'is_rent': units.is_rent, 'is_sale': units.is_sale,
+            'start': units.start_year, 'is_exit': units.is_exit_sale, 'sale': units.sale_year,
+        })
+        for key in ('occ', 'rent_growth', 'price_growth'):
+            given = getattr(units, key + '_given')
+            keys[key + '_given'] = given
+            keys[key] = np.where(given, getattr(units, key), 0.0)
+        keys = keys[earns]
+        group = keys.groupby(list(keys.columns), sort=False, dropna=False).ngroup().to_numpy()
+        n_profiles = int(group.max()) + 1 if len(group) else 0
+        _, first = np.unique(group, return_index=True)
+        profiles = keys.iloc[first]
+        self.n_profiles = n_profiles
+        self.profiles = {c: profiles[c].to_numpy() for c in profiles.columns}
+
+        s = units.surface[earns]
+        self.rent_weight = np.bincount(group, weights=s * (units.rent_monthly[earns] * 12), minlength=n_profiles)
+        self.area_weight = np.bincount(group, weights=s, minlength=n_profiles)
+        self.sale_weight = np.bincount(group, weights=s * units.price_m2[earns], minlength=n_profiles)
+
+
+def _as_float(values):
+    values = np.atleast_1d(values)
+    try:
+        return values.astype(np.float64)
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+class BatchCapex:
+    """
+    Source: [Feuille Parking], [Feuille Construction], [Feuille Financing] & [Feuille CAPEX_Summary]
+    """
+    def __init__(self, inputs: BatchInputs, units: BatchUnits):
+        eff = inputs['building_efficiency'] / 100.0
+        efficiency_factor = (1 + (100 - (eff * 100)) / 100)
+        self.gfa_calculated = units.total_units_gla * efficiency_factor
+
+        research_hard_costs = np.zeros_like(eff)
+        safe_eff = np.where(eff != 0, eff, 1.0)
+        for gla, cost_per_m2 in units.asset_cost_gla:
+            gfa = np.where(eff != 0, gla / safe_eff, 0)
+            research_hard_costs = research_hard_costs + (gfa * cost_per_m2)
+        hard_cost_per_m2 = inputs['structure_cost'] + inputs['finishing_cost'] + inputs['utilities_cost']
+        use_research = inputs['use_research_cost'] & units.has_asset_costs
+        self.total_hard_costs = np.where(use_research, research_hard_costs, hard_cost_per_m2 * self.gfa_calculated)
+
+        soft_pct = inputs['architect_fees_pct'] + inputs['development_fees_pct'] + inputs['marketing_fees_pct']
+        self.total_soft_fees = (self.total_hard_costs * (soft_pct / 100)) + inputs['permit_fees']
+        subtotal = self.total_hard_costs + self.total_soft_fees
+        self.contingency_amount = subtotal * (inputs['contingency_pct'] / 100)
+        self.capex_construction_only = subtotal + self.contingency_amount
+        parking_input = inputs['parking_capex']
+        self.parking_capex = np.where(np.isnan(parking_input), units.parking_spaces * inputs['cost_per_space'], parking_input)
+        self.construction_pre_financing = self.capex_construction_only + inputs['amenities_total_capex'] + self.parking_capex
+
+        self.debt_principal = inputs['debt_amount']
+        self.arrangement_fee_amt = self.debt_principal * (inputs['arrangement_fee_pct'] / 100.0)
+        self.upfront_financing_fees = self.arrangement_fee_amt + inputs['upfront_fees']
+        self.total_capex = self.construction_pre_financing + self.upfront_financing_fees
+        self.s_curve = np.stack([inputs['s_curve_y1'], inputs['s_curve_y2'], inputs['s_curve_y3']], axis=-1) / 100.0
+
+
+class BatchAmortization:
+    """
+    Source: [Feuille Amortization]. Tableaux (N, n_years + 1) indexés par année.
+    """
+    def __init__(self, inputs: BatchInputs, n_years):
+        balance = inputs['debt_amount'].astype(np.float64)
+        rate = inputs['interest_rate'] / 100.0
+        term = inputs['loan_term']
+        grace = inputs['grace_period']
+        exit_year = inputs['holding_period']
+
+        amortization_duration = term - grace
+        amortizes = amortization_duration > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            annuity = np.where(amortizes, npf.pmt(rate, np.where(amortizes, amortization_duration, 1), -balance), 0.0)
+
+        shape = (len(balance), n_years + 1)
+        self.payment = np.zeros(shape)
+        self.interest = np.zeros(shape)
+        self.principal = np.zeros(shape)
+        self.closing = np.zeros(shape)
+        current_balance = balance
+        for year in range(1, n_years + 1):
+            active = (year <= exit_year) & (year < term + 5)
+            in_grace = year <= grace
+            in_term = ~in_grace & (year <= term)
+            opening = current_balance
+            interest = np.where(in_grace | in_term, opening * rate, 0.0)
+            payment = np.where(in_grace, interest, np.where(in_term, annuity, 0.0))
+            principal = np.where(in_term, payment - interest, 0.0)
+            closing = opening - principal
+            closing = np.where(closing < 0.01, 0.0, closing)
+            self.payment[:, year] = np.where(active, payment, 0.0)
+            self.interest[:, year] = np.where(active, interest, 0.0)
+            self.principal[:, year] = np.where(active, principal, 0.0)
+            self.closing[:, year] = np.where(active, closing, 0.0)
+            current_balance = np.where(year <= exit_year, closing, current_balance)
+
+
+class BatchScheduler:
+    """
+    Source: [Feuille RentSchedule] & [Feuille SaleSchedule].
+    Tableaux (N, n_years + 1) indexés par année (colonne 0 = année 0, vide).
+    """
+    def __init__(self, inputs: BatchInputs, units: BatchUnits, n_years):
+        p = units.profiles
+        years = np.arange(1, n_years + 1)
+        horizon = years[None, :] <= (inputs['holding_period'][:, None] + 1)
+
+        def per_profile(key, default, shift=0.0):
+            return np.where(p[key + '_given'][None, :], p[key][None, :] + shift, default[:, None])
+
+        occ_shift = inputs['units_occ_shift'][:, None] / 100.0
+        occ = per_profile('occ', inputs['occupancy_rate'] / 100.0, occ_shift)
+        # 'Occ %' décalé borné à [0, 100] % (sans décalage, valeurs de la table inchangées)
+        occ = np.where(p['occ_given'][None, :] & (occ_shift != 0), np.clip(occ, 0.0, 1.0), occ)
+        rent_growth = per_profile('rent_growth', inputs['rent_growth'] / 100.0, inputs['units_rent_growth_shift'][:, None] / 100.0)
+        price_growth = per_profile('price_growth', inputs['inflation'] / 100.0)
+
+        # Indexation Year 0 basis
+        receives_rent = p['is_rent'][:, None] & (years[None, :] >= p['start'][:, None]) & (p['is_exit'][:, None] | (p['sale'][:, None] > years[None, :]))
+        growth = (1 + rent_growth)[:, :, None] ** years[None, None, :]
+        rent_weight = units.rent_weight * inputs['units_rent_multiplier'][:, None]
+        rent = np.einsum('sp,spy->sy', rent_weight * occ, growth * receives_rent)
+        area = (units.area_weight * occ) @ receives_rent
+
+        sells = p['is_sale'] & ~p['is_exit'] & (p['sale'] >= 1) & (p['sale'] <= n_years)
+        sale_value = units.sale_weight * (1 + price_growth) ** np.where(sells, p['sale'], 0)
+        sale_slot = np.zeros((units.n_profiles, n_years), dtype=np.float64)
+        sale_slot[np.flatnonzero(sells), p['sale'][sells].astype(np.intp) - 1] = 1.0
+        sale = sale_value @ sale_slot
+
+        pad = ((0, 0), (1, 0))
+        self.rent = np.pad(np.where(horizon, rent, 0.0), pad)
+        self.sale = np.pad(np.where(horizon, sale, 0.0), pad)
+        self.occupied_area = np.pad(np.where(horizon, area, 0.0), pad)
+
+
+class BatchCashflowEngine:
+    """
+    Source: [Feuille Cashflow]. `columns[name]` est un tableau (N, années 0..n_years).
+    """
+    def __init__(self, inputs: BatchInputs, capex: BatchCapex, amortization: BatchAmortization, scheduler: BatchScheduler, n_years):
+        n = len(inputs)
+        hold = inputs['holding_period']
+        y = np.arange(n_years + 1)[None, :]
+        operating = (y >= 1) & (y <= hold[:, None])
+        at_exit = y == hold[:, None]
+        inflation = inputs['inflation'] / 100.0
+        opex_per_m2 = inputs['opex_per_m2'][:, None]
+        pm_fee_pct = (inputs['pm_fee_pct'] / 100.0)[:, None]
+
+        def at_year(matrix, year):
+            return np.take_along_axis(matrix, year[:, None], axis=1)[:, 0]
+
+        rent_n = at_year(scheduler.rent, hold)
+        area_n = at_year(scheduler.occupied_area, hold)
+        opex_fixed_n = area_n * inputs['opex_per_m2'] * ((1 + inflation) ** (hold - 1))
+        opex_var_n = rent_n * (inputs['pm_fee_pct'] / 100.0)
+        noi_n = rent_n - (opex_fixed_n + opex_var_n)
+        noi_n_plus_1 = noi_n * (1 + inputs['rent_growth'] / 100.0)
+        gross_exit_val = noi_n_plus_1 / (inputs['exit_yield'] / 100.0)
+        net_exit_val = gross_exit_val * (1 - inputs['transac_fees_exit'] / 100.0)
+
+        total_capex = capex.total_capex
+        debt_principal = capex.debt_principal
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ltc_ratio = np.where(total_capex > 0, debt_principal / total_capex, 0)
+
+        rent = np.where(operating, scheduler.rent[:, :n_years + 1], 0.0)
+        sales = np.where(operating, scheduler.sale[:, :n_years + 1], 0.0)
+        area_rented = np.where(operating, scheduler.occupied_area[:, :n_years + 1], 0.0)
+        exit_proc = np.where(at_exit, net_exit_val[:, None], 0.0)
+
+        opex_fixed = area_rented * opex_per_m2 * ((1 + inflation)[:, None] ** (y - 1))
+        pm_fee = rent * pm_fee_pct
+        total_opex = opex_fixed + pm_fee
+        noi = (rent + sales) - total_opex
+        taxable = operating & (noi > 0) & (y > inputs['tax_holiday'][:, None])
+        tax = np.where(taxable, noi * (inputs['corporate_tax_rate'] / 100.0)[:, None], 0.0)
+
+        s_curve = np.zeros((n, n_years + 1))
+        k = min(3, n_years)
+        s_curve[:, 1:k + 1] = np.broadcast_to(capex.s_curve, (n, 3))[:, :k]
+        capex_flow = np.where(operating, s_curve * total_capex[:, None], 0.0)
+        drawdown = capex_flow * ltc_ratio[:, None]
+
+        payment = np.where(operating, amortization.payment[:, :n_years + 1], 0.0)
+        bullet = np.where(at_exit, amortization.closing[:, :n_years + 1], 0.0)
+        prep_fee = bullet * (inputs['prepayment_fee_pct'] / 100.0)[:, None]
+        debt_service = -(payment + bullet + prep_fee)
+
+        net_cash_flow = noi + (-capex_flow) + debt_service + (-tax) + drawdown + exit_proc
+        upfront = np.zeros((n, n_years + 1))
+        upfront[:, 0] = -capex.upfront_financing_fees
+        equity_injection = np.zeros((n, n_years + 1))
+        equity_injection[:, 0] = -(total_capex - debt_principal)
+        net_cash_flow[:, 0] = upfront[:, 0]
+        equity_cf = net_cash_flow.copy()
+        equity_cf[:, 0] = equity_injection[:, 0]
+
+        self.columns = {
+            'Rental Income': rent, 'Sales Proceeds': sales, 'Exit Proceeds': exit_proc,
+            'Total Revenues': rent + sales + exit_proc, 'Total OPEX': -total_opex, 'NOI': noi,
+            'CAPEX': -capex_flow, 'Debt Service': debt_service, 'Tax': -tax, 'Debt Drawdown': drawdown,
+            'Upfront Fees': upfront, 'Net Cash Flow': net_cash_flow, 'Equity Injection': equity_injection,
+            'Equity CF': equity_cf,
+        }
+        equity_needed = total_capex - debt_principal
+        self.calculate_kpis(inputs['discount_rate'] / 100.0, equity_needed)
+
+    def calculate_kpis(self, discount_rate, equity_needed):
+        self.kpis = equity_kpis(self.columns['Net Cash Flow'], discount_rate, equity_needed)
+
+
+class BatchResult:
+    """
+    Résultat d'un lot : cube (N, années, colonnes) et table KPI de N lignes.
+    """
+    def __init__(self, inputs: BatchInputs, n_years):
+        self.inputs = inputs
+        self.years = np.arange(n_years + 1)
+        self.columns = list(CASHFLOW_COLUMNS)
+        self.cube = np.zeros((len(inputs), n_years + 1, len(self.columns)))
+        self.kpis = None
+
+    def column(self, name):
+        """Tableau (N, années) d'une colonne de cash flow."""
+        return self.cube[:, :, self.columns.index(name)]
+
+    def cashflow(self, i):
+        """DataFrame du scénario i, au format de CashflowEngine.df."""
+        hold = int(self.inputs['holding_period'][i])
+        df = pd.DataFrame(self.cube[i, :hold + 1], columns=self.columns, index=pd.Index(self.years[:hold + 1], name='Year'))
+        df.loc[1:, ['Upfront Fees', 'Equity Injection']] = np.nan
+        return df
+
+
+def evaluate_batch(scenarios, df_units: pd.DataFrame, base_inputs=None, chunk_size=None) -> BatchResult:
+    """
+    Évalue N scénarios en un appel vectorisé (par blocs pour borner la mémoire).
+    `df_units` peut être un BatchUnits déjà construit pour être réutilisé entre lots.
+    """
+    inputs = scenarios if isinstance(scenarios, BatchInputs) else BatchInputs(scenarios, base_inputs)
+    units = df_units if isinstance(df_units, BatchUnits) else BatchUnits(df_units, inputs.df_asset_costs)
+    n_years = int(inputs['holding_period'].max())
+    if chunk_size is None:
+        chunk_size = max(1, _CHUNK_ELEMENTS // max(1, units.n_profiles * (n_years + 1)))
+
+    with span('evaluate_batch', rows=len(inputs)):
+        result = BatchResult(inputs, n_years)
+        kpis = {key: np.zeros(len(inputs), dtype=np.int8 if key == 'IRR Status' else np.float64) for key in KPI_COLUMNS}
+        for start in range(0, len(inputs), chunk_size):
+            block = slice(start, min(start + chunk_size, len(inputs)))
+            chunk = inputs.take(block)
+            capex = BatchCapex(chunk, units)
+            amortization = BatchAmortization(chunk, n_years)
+            scheduler = BatchScheduler(chunk, units, n_years + 1)
+            cf = BatchCashflowEngine(chunk, capex, amortization, scheduler, n_years)
+            result.cube[block] = np.stack([cf.columns[c] for c in result.columns], axis=-1)
+            for key in KPI_COLUMNS:
+                kpis[key][block] = cf.kpis[key]
+        result.kpis = pd.DataFrame(kpis, index=pd.RangeIndex(len(inputs), name='Scenario'))
+    return result
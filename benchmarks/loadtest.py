@@ -0,0 +1,167 @@
+"""
+Test de charge du service local (service.py) : `clients` connexions keep-alive
+simultanées envoient chacune `requests` scénarios aléatoires ; débit et latences
+(p50 / p95 / max) sur stderr, rapport JSON optionnel.
+
+    python service.py --units units.csv --base base.json &
+    python benchmarks/loadtest.py --url http://127.0.0.1:8765 --clients 64 --requests 50
+
+Sans --url, un service est lancé dans le processus sur des unités synthétiques.
+--direct mesure en regard le débit d'un modèle complet par requête (chaîne de
+financial_model), tel que l'appellent aujourd'hui les outils internes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from synthetic import ASSET_COSTS, make_scenarios, make_units
+
+
+def _request(scenario, cashflow):
+    body = json.dumps({'scenario': scenario, 'cashflow': cashflow}).encode()
+    return (f"POST /evaluate HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+
+
+async def _read_response(reader):
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def _client(open_connection, scenarios, cashflow, latencies, errors):
+    reader, writer = await open_connection()
+    try:
+        for scenario in scenarios:
+            start = time.perf_counter()
+            writer.write(_request(scenario, cashflow))
+            await writer.drain()
+            status, _ = await _read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def _stats(open_connection):
+    reader, writer = await open_connection()
+    writer.write(b"GET /stats HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+    await writer.drain()
+    _, body = await _read_response(reader)
+    writer.close()
+    return json.loads(body)
+
+
+async def load(address, clients, n_requests, cashflow=False, seed=0):
+    """Débit et latences du service à `address` (http://hôte:port ou chemin de socket Unix)."""
+    if address.startswith('http://'):
+        host, _, port = address[len('http://'):].rstrip('/').rpartition(':')
+        open_connection = lambda: asyncio.open_connection(host, int(port))
+    else:
+        open_connection = lambda: asyncio.open_unix_connection(address)
+    scenarios = make_scenarios(clients * n_requests, seed=seed).to_dict('records')
+    scenarios = [{k: (int(v) if k == 'holding_period' else float(v)) for k, v in s.items()} for s in scenarios]
+    latencies, errors = [], []
+    before = await _stats(open_connection)
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(open_connection, scenarios[i::clients], cashflow, latencies, errors)
+                           for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    after = await _stats(open_connection)
+    latencies.sort()
+    batches = after['batches'] - before['batches']
+    return {
+        'requests': len(latencies), 'errors': len(errors), 'clients': clients, 'elapsed_s': elapsed,
+        'requests_per_s': len(latencies) / elapsed,
+        'p50_ms': 1000 * statistics.median(latencies),
+        'p95_ms': 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+        'max_ms': 1000 * latencies[-1],
+        'batches': batches, 'mean_batch': (after['requests'] - before['requests']) / batches if batches else 0.0,
+    }
+
+
+def direct(df_units, base_inputs, n_requests, seed=0):
+    """Débit d'un modèle complet par requête, dans ce processus."""
+    from cli import _scalar_kpis
+    scenarios = make_scenarios(n_requests, seed=seed).to_dict('records')
+    start = time.perf_counter()
+    for scenario in scenarios:
+        _scalar_kpis({**base_inputs, **scenario}, df_units)
+    elapsed = time.perf_counter() - start
+    return {'requests': n_requests, 'elapsed_s': elapsed, 'requests_per_s': n_requests / elapsed}
+
+
+def _start_service(df_units, base_inputs, workers, window_ms):
+    """Service lancé dans un thread (port libre) ; renvoie son adresse une fois prêt."""
+    import service
+    ready = threading.Event()
+    address = []
+
+    def on_ready(value):
+        address.append(value)
+        ready.set()
+
+    thread = threading.Thread(target=lambda: asyncio.run(service.serve(
+        df_units, base_inputs, port=0, workers=workers, window_ms=window_ms, ready=on_ready)), daemon=True)
+    thread.start()
+    if not ready.wait(60):
+        raise RuntimeError("Le service n'a pas démarré")
+    return address[0]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='benchmarks/loadtest.py', description="Test de charge du service local.")
+    parser.add_argument('--url', help="Service à tester (http://127.0.0.1:8765 ou chemin de socket Unix) ; "
+                                      "sinon lancé ici sur des unités synthétiques")
+    parser.add_argument('--units', type=int, default=100, help="Unités synthétiques du service lancé ici")
+    parser.add_argument('--workers', type=int, help="Processus du service lancé ici")
+    parser.add_argument('--window-ms', type=float, default=5.0, help="Fenêtre de regroupement du service lancé ici")
+    parser.add_argument('--clients', type=int, default=64, help="Connexions simultanées")
+    parser.add_argument('--requests', type=int, default=50, help="Requêtes par connexion")
+    parser.add_argument('--cashflow', action='store_true', help="Demander aussi le cash flow")
+    parser.add_argument('--direct', type=int, default=0, metavar='N',
+                        help="Mesurer aussi N requêtes à un modèle complet chacune (sans --url)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', '-o', help="Rapport JSON")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    log = lambda line: print(line, file=sys.stderr)
+    df_units = make_units(args.units, seed=args.seed)
+    base_inputs = {'df_asset_costs': ASSET_COSTS}
+    address = args.url or _start_service(df_units, base_inputs, args.workers, args.window_ms)
+    report = {'service': asyncio.run(load(address, args.clients, args.requests, args.cashflow, args.seed))}
+    s = report['service']
+    log(f"service : {s['requests']} requêtes ({s['errors']} erreurs) en {s['elapsed_s']:.2f} s -> "
+        f"{s['requests_per_s']:.0f} req/s, p50 {s['p50_ms']:.1f} ms, p95 {s['p95_ms']:.1f} ms, "
+        f"max {s['max_ms']:.1f} ms, {s['batches']} lots (moy. {s['mean_batch']:.1f})")
+    if args.direct and not args.url:
+        d = report['direct'] = direct(df_units, base_inputs, args.direct, args.seed)
+        log(f"direct  : {d['requests']} modèles en {d['elapsed_s']:.2f} s -> {d['requests_per_s']:.0f} req/s "
+            f"(service x{s['requests_per_s'] / d['requests_per_s']:.1f})")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 1 if s['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
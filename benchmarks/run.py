@@ -0,0 +1,186 @@
+"""
+Benchmarks du modèle : temps par étape (UnitsTable, Parking, Construction avec et
+sans coûts par Asset Class, Amortization, Scheduler, CashflowEngine, KPI), débit
+d'un lot de scénarios (batch.evaluate_batch) et mémoire de pointe, pour des
+tables synthétiques de 10 à 1M unités.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --scales 10,1000 --save-baseline
+    python benchmarks/run.py --scales 10,1000 --baseline benchmarks/baseline.json --threshold 0.25
+
+Chaque mesure est le minimum de `repeats` exécutions (arrêt après ~`budget` s) ;
+la mémoire de pointe est mesurée à part, sous tracemalloc. La référence
+livrée (baseline.json) couvre 10 et 1000 unités ; une étape plus lente de plus
+de `threshold` (et d'au moins 1 ms) est une régression : code de sortie 1.
+Une référence absente est une erreur (code 2).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import numpy as np
+import pandas as pd
+
+from batch import BatchUnits, evaluate_batch
+from cache import model_version
+from financial_model import (Amortization, CapexSummary, CashflowEngine, Construction, Financing, General,
+                             OperationExit, Parking, Scheduler, UnitsTable)
+from synthetic import ASSET_COSTS, make_scenarios, make_units
+
+DEFAULT_SCALES = (10, 1_000, 100_000, 1_000_000)
+DEFAULT_BASELINE = os.path.join(HERE, 'baseline.json')
+_NOISE_FLOOR = 1e-3   # s : écarts plus petits ignorés
+_BATCH_CELLS = 200_000   # profils x scénarios par lot mesuré
+
+
+def _measure(fn, repeats, budget):
+    times = []
+    start = time.perf_counter()
+    while len(times) < repeats and (not times or time.perf_counter() - start < budget):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return times
+
+
+def _peak_mb(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def stage_runners(df_units, frequency='annual'):
+    """Étape -> fonction sans argument ; les entrées de chaque étape sont calculées une fois."""
+    inputs = {'frequency': frequency}
+    units = UnitsTable(df_units)
+    gen, fin, op = General(inputs), Financing(inputs), OperationExit(inputs)
+    park = Parking(inputs, units)
+    research = {'parking_capex': park.total_capex, 'use_research_cost': True, 'df_asset_costs': ASSET_COSTS}
+    flat = {'parking_capex': park.total_capex, 'use_research_cost': False}
+    const = Construction(research, gen, units)
+    capex = CapexSummary(const, fin)
+    amort = Amortization(fin, op)
+    sched = Scheduler(units, op, gen, fin)
+    cf = CashflowEngine(gen, const, fin, capex, op, amort, sched)
+    return {
+        'UnitsTable': lambda: UnitsTable(df_units),
+        'Parking': lambda: Parking(inputs, units),
+        'Construction (research)': lambda: Construction(research, gen, units),
+        'Construction (flat)': lambda: Construction(flat, gen, units),
+        'Amortization': lambda: Amortization(fin, op),
+        'Scheduler': lambda: Scheduler(units, op, gen, fin),
+        'CashflowEngine': lambda: CashflowEngine(gen, const, fin, capex, op, amort, sched),
+        'KPIs': lambda: cf.calculate_kpis(gen.discount_rate, capex.total_capex - fin.debt_principal),
+    }
+
+
+def run(scales, repeats=5, budget=2.0, n_scenarios=1_000, seed=0, frequency='annual', memory=True, log=None):
+    results = []
+    for n in scales:
+        df_units = make_units(n, seed=seed)
+        runners = stage_runners(df_units, frequency)
+        # Le coût d'un lot croît comme profils x scénarios : lot réduit pour les grandes tables
+        units = BatchUnits(df_units, ASSET_COSTS)
+        batch_size = max(10, min(n_scenarios, _BATCH_CELLS // units.n_profiles))
+        scenarios = make_scenarios(batch_size, seed=seed)
+        base = {'df_asset_costs': ASSET_COSTS}
+        runners['Batch'] = lambda: evaluate_batch(scenarios, units, base)
+        for stage, fn in runners.items():
+            times = _measure(fn, repeats, budget)
+            entry = {'scale': n, 'stage': stage, 'min_s': min(times), 'median_s': statistics.median(times),
+                     'repeats': len(times), 'peak_mb': _peak_mb(fn) if memory else None}
+            if stage == 'Batch':
+                entry.update(scenarios=batch_size, profiles=units.n_profiles, scenarios_per_s=batch_size / entry['min_s'])
+            results.append(entry)
+            if log:
+                log(f"{n:>9} {stage:<28} {entry['min_s'] * 1000:10.2f} ms"
+                    + (f" {entry['peak_mb']:9.1f} MB" if memory else '')
+                    + (f"  {batch_size} scénarios x {units.n_profiles} profils" if stage == 'Batch' else ''))
+    return results
+
+
+def environment():
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+        'numpy': np.__version__, 'pandas': pd.__version__, 'machine': platform.machine(),
+        'processor': platform.processor(), 'cpus': os.cpu_count(), 'model_version': model_version(),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Lignes (échelle, étape, référence, actuel, ratio, régression) pour les mesures communes."""
+    reference = {(r['scale'], r['stage']): r['min_s'] for r in baseline['results']}
+    rows = []
+    for r in results:
+        base = reference.get((r['scale'], r['stage']))
+        if base is None:
+            continue
+        ratio = r['min_s'] / base if base > 0 else float('inf')
+        regression = ratio > 1 + threshold and r['min_s'] - base > _NOISE_FLOOR
+        rows.append((r['scale'], r['stage'], base, r['min_s'], ratio, regression))
+    return rows
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='benchmarks/run.py', description="Benchmarks du modèle par étape et par taille.")
+    parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)), help="Nombres d'unités, séparés par des virgules")
+    parser.add_argument('--repeats', type=int, default=5, help="Exécutions par mesure (minimum retenu)")
+    parser.add_argument('--budget', type=float, default=2.0, help="Temps max. par mesure en secondes (au moins une exécution)")
+    parser.add_argument('--scenarios', type=int, default=1_000, help="Scénarios du lot mesuré")
+    parser.add_argument('--frequency', choices=('annual', 'quarterly', 'monthly'), default='annual')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="Ne pas mesurer la mémoire de pointe")
+    parser.add_argument('--output', '-o', help="Résultats JSON")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Référence JSON à comparer ('' : pas de comparaison)")
+    parser.add_argument('--save-baseline', action='store_true', help="Écrire les résultats comme nouvelle référence")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Ralentissement toléré (0.25 = +25 %%)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    scales = [int(s) for s in args.scales.split(',') if s]
+    log = lambda line: print(line, file=sys.stderr)
+    if args.baseline and not args.save_baseline and not os.path.exists(args.baseline):
+        log(f"Référence introuvable : {args.baseline} (--save-baseline pour la créer, --baseline '' pour ne pas comparer)")
+        return 2
+    results = run(scales, args.repeats, args.budget, args.scenarios, args.seed, args.frequency,
+                  memory=not args.no_memory, log=log)
+    report = {'environment': environment(), 'settings': {k: v for k, v in vars(args).items() if k != 'baseline'},
+              'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        if not args.baseline:
+            build_parser().error("--save-baseline demande un chemin --baseline")
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        return 0
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline, args.threshold)
+    for scale, stage, base, current, ratio, regression in rows:
+        log(f"{scale:>9} {stage:<28} {base * 1000:10.2f} -> {current * 1000:10.2f} ms  x{ratio:5.2f}"
+            + ("  RÉGRESSION" if regression else ''))
+    regressions = sum(row[-1] for row in rows)
+    log(f"{regressions} régression(s) sur {len(rows)} mesures (seuil +{args.threshold:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
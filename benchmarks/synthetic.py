@@ -0,0 +1,59 @@
+"""
+Générateur de tables des unités synthétiques, au schéma de [Feuille Units] de
+app.py, reproductible par graine : modes Rent / Sale / Mixed, années de mise en
+service et de vente variées ('Exit' ou année), quelques pourcentages vides
+(défaut du scénario).
+"""
+import numpy as np
+import pandas as pd
+
+ASSET_CLASSES = ['office', 'residential', 'retail', 'logistics', 'hotel']
+ASSET_COSTS = pd.DataFrame({'Asset Class': ASSET_CLASSES, 'Cost €/m²': [1093, 1190, 1200, 800, 1500]})
+
+# Par Asset Class : surface (m²), loyer (€/m²/mois), prix (€/m²)
+_PROFILES = {
+    'office': (3000, 20, 0), 'residential': (70, 16, 2300), 'retail': (400, 25, 3000),
+    'logistics': (5000, 6, 0), 'hotel': (1200, 18, 2800),
+}
+
+
+def make_units(n, seed=0, holding_period=20):
+    """DataFrame de `n` unités."""
+    rng = np.random.default_rng(seed)
+    code = rng.choice(len(ASSET_CLASSES), n, p=[0.15, 0.55, 0.15, 0.05, 0.10])
+    asset = np.array(ASSET_CLASSES)[code]
+    surface0, rent0, price0 = (np.array([_PROFILES[a][i] for a in ASSET_CLASSES], dtype=float) for i in range(3))
+    mode = rng.choice(['Rent', 'Sale', 'Mixed'], n, p=[0.5, 0.2, 0.3])
+    sale_year = rng.integers(1, holding_period + 1, n).astype(object)
+    sale_year[rng.random(n) < 0.4] = 'Exit'
+
+    def blank(values, share):
+        values = values.astype(float)
+        values[rng.random(n) < share] = np.nan
+        return values
+
+    return pd.DataFrame({
+        'Code': [f'{a[:2].upper()}-{i}' for i, a in enumerate(asset)],
+        'AssetClass': asset,
+        'Surface (GLA m²)': np.round(surface0[code] * rng.uniform(0.6, 1.4, n), 1),
+        'Rent (€/m²/mo)': np.round(rent0[code] * rng.uniform(0.8, 1.2, n), 2),
+        'Price €/m²': np.round(np.where(mode == 'Rent', 0, np.maximum(price0[code], 1500) * rng.uniform(0.8, 1.2, n))),
+        'Start Year': rng.integers(1, 6, n),
+        'Sale Year': sale_year,
+        'Mode': mode,
+        'Parking per unit': np.where(asset == 'residential', rng.choice([0, 1, 1.5, 2], n), 0),
+        'Parking ratio (per 100 m²)': np.where(asset == 'residential', 0, rng.choice([0, 1.5, 2.5], n)),
+        'Occ %': blank(rng.uniform(80, 100, n).round(), 0.2),
+        'Rent growth %': blank(rng.uniform(2, 5, n).round(1), 0.2),
+        'Asset Value Growth (%/yr)': blank(rng.uniform(2, 5, n).round(1), 0.2),
+    })
+
+
+def make_scenarios(n, seed=0):
+    """`n` scénarios autour des valeurs par défaut (entrées de batch.SCENARIO_INPUTS)."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'exit_yield': rng.uniform(6, 10, n), 'rent_growth': rng.uniform(1, 4, n),
+        'interest_rate': rng.uniform(3, 7, n), 'occupancy_rate': rng.uniform(80, 98, n),
+        'holding_period': rng.integers(10, 26, n),
+    })
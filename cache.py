@@ -0,0 +1,158 @@
+"""
+Cache disque des résultats (SQLite) : cash flow par période et KPI d'un calcul,
+indexés par l'empreinte de ses entrées (dicts des classes du modèle, tables des
+unités et des coûts par Asset Class) et par la version du modèle.
+
+La version est l'empreinte de financial_model.py et kpis.py : modifier l'un des
+deux invalide les entrées existantes, purgées à l'ouverture. Le cache est borné
+en octets ; au-delà, les entrées les moins récemment lues sont évincées.
+Une lecture est un SELECT par clé primaire suivi d'un np.frombuffer (~20 µs).
+"""
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+
+import numpy as np
+
+from importer import default_cache_dir
+from pipeline import content_hash
+
+_VERSIONED_FILES = ('financial_model.py', 'kpis.py')
+# Dates d'accès regroupées : une lecture n'écrit pas sur disque
+_TOUCH_BATCH = 256
+
+
+def model_version():
+    """Empreinte des sources du modèle."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    sources = []
+    for name in _VERSIONED_FILES:
+        with open(os.path.join(here, name), 'rb') as f:
+            sources.append(f.read().hex())
+    return content_hash(*sources)
+
+
+def encode(engine):
+    """CashflowEngine -> bytes : en-tête JSON (colonnes, fréquence, KPI) puis un bloc float64."""
+    names = list(engine.columns)
+    header = json.dumps({'columns': names, 'periods_per_year': engine.periods_per_year,
+                         'kpis': engine.kpis}).encode()
+    body = np.stack([np.asarray(engine.columns[c], dtype=np.float64) for c in names]).tobytes()
+    return struct.pack('<I', len(header)) + header + body
+
+
+def decode(payload):
+    from financial_model import CashflowEngine
+    size, = struct.unpack_from('<I', payload)
+    header = json.loads(payload[4:4 + size])
+    names = header['columns']
+    matrix = np.frombuffer(payload, dtype=np.float64, offset=4 + size).reshape(len(names), -1).copy()
+    return CashflowEngine.restore(dict(zip(names, matrix)), header['periods_per_year'], header['kpis'])
+
+
+class ResultCache:
+    """
+    Cache SQLite borné à `max_bytes` (LRU). `get` / `put` prennent une clé de `key()`
+    (ou de ModelGraph, qui y ajoute la version) ; `stats()` donne hits / misses de la
+    session et cumulés.
+    """
+    def __init__(self, path=None, max_bytes=256 * 2**20, version=None):
+        self.path = path or os.path.join(default_cache_dir(), 'results.sqlite')
+        self.max_bytes = max_bytes
+        self.version = version or model_version()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, version TEXT, size INTEGER, '
+                         'accessed REAL, payload BLOB)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)')
+        self._db.execute('DELETE FROM entries WHERE version != ?', (self.version,))
+        self._size = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        self._touched = {}
+        self.hits = self.misses = self.writes = self.evictions = 0
+        self._flushed = dict.fromkeys(('hits', 'misses', 'writes', 'evictions'), 0)
+
+    def key(self, *parts):
+        """Clé d'un calcul : empreinte de la version du modèle et des entrées."""
+        return content_hash(self.version, *parts)
+
+    def get(self, key):
+        """CashflowEngine reconstruit, ou None."""
+        versioned = self.key(key)
+        with self._lock:
+            row = self._db.execute('SELECT payload FROM entries WHERE key = ?', (versioned,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[versioned] = time.time()
+            if len(self._touched) >= _TOUCH_BATCH:
+                self._flush()
+        return decode(row[0])
+
+    def put(self, key, engine):
+        payload = encode(engine)
+        versioned = self.key(key)
+        with self._lock:
+            previous = self._db.execute('SELECT size FROM entries WHERE key = ?', (versioned,)).fetchone()
+            self._db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                             (versioned, self.version, len(payload), time.time(), payload))
+            self._size += len(payload) - (previous[0] if previous else 0)
+            self.writes += 1
+            if self._size > self.max_bytes:
+                self._evict()
+            self._flush()
+
+    def _evict(self):
+        # Jusqu'à 90 % de la borne, les moins récemment lues d'abord
+        self._flush()
+        target = 0.9 * self.max_bytes
+        for key, size in self._db.execute('SELECT key, size FROM entries ORDER BY accessed').fetchall():
+            if self._size <= target:
+                break
+            self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self._size -= size
+            self.evictions += 1
+
+    def _flush(self):
+        self._db.execute('BEGIN')
+        self._db.executemany('UPDATE entries SET accessed = ? WHERE key = ?',
+                             [(t, k) for k, t in self._touched.items()])
+        for name in self._flushed:
+            delta = getattr(self, name) - self._flushed[name]
+            if delta:
+                self._db.execute('INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?',
+                                 (name, delta, delta))
+                self._flushed[name] += delta
+        self._db.execute('COMMIT')
+        self._touched.clear()
+
+    def stats(self):
+        with self._lock:
+            self._flush()
+            totals = dict(self._db.execute('SELECT name, value FROM counters').fetchall())
+            entries = self._db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits, 'misses': self.misses, 'hit rate': self.hits / lookups if lookups else 0.0,
+            'writes': self.writes, 'evictions': self.evictions, 'entries': entries, 'bytes': self._size,
+            'max bytes': self.max_bytes, 'version': self.version,
+            **{f'{name} (total)': totals.get(name, 0) for name in self._flushed},
+        }
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM entries')
+            self._size = 0
+            self._touched.clear()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._db.close()
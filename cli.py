@@ -0,0 +1,253 @@
+"""
+Exécution sans interface : scénarios et unités lus en JSON, CSV ou Parquet,
+KPI écrits bloc par bloc en CSV, Parquet ou Excel (.xlsx, write-only) au fil des calculs.
+
+    python cli.py --units units.csv --scenarios scenarios.csv --base base.json \
+        --output results.parquet --jobs 4
+
+Ni streamlit ni plotly ne sont importés ; numpy / pandas et les modules du
+modèle ne le sont qu'après lecture des arguments (--help reste immédiat).
+Une colonne `scenario` (voir --id-column) est recopiée telle quelle dans la sortie.
+"""
+import argparse
+import json
+import sys
+
+ENGINES = ('batch', 'scalar')
+
+
+def _suffix(path):
+    return path.rsplit('.', 1)[-1].lower() if '.' in path else ''
+
+
+def read_table(path):
+    """DataFrame depuis un fichier .json (liste d'objets), .csv ou .parquet."""
+    import pandas as pd
+    suffix = _suffix(path)
+    if suffix == 'csv':
+        return pd.read_csv(path)
+    if suffix in ('parquet', 'pq'):
+        return pd.read_parquet(path)
+    if suffix == 'json':
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return pd.DataFrame(data.get('scenarios', data.get('units', [])) if isinstance(data, dict) else data)
+    raise ValueError(f"Format non supporté : {path} (attendus : .json, .csv, .parquet)")
+
+
+def read_base(path, asset_costs=None):
+    """Entrées communes (JSON) ; `df_asset_costs` peut y figurer en liste d'objets ou venir d'un fichier."""
+    import pandas as pd
+    base = {}
+    if path:
+        with open(path, encoding='utf-8') as f:
+            base = json.load(f)
+    if asset_costs:
+        base['df_asset_costs'] = read_table(asset_costs)
+    elif isinstance(base.get('df_asset_costs'), list):
+        base['df_asset_costs'] = pd.DataFrame(base['df_asset_costs'])
+    return base
+
+
+class ResultWriter:
+    """Écrit les blocs de résultats au fil de l'eau : CSV (ou '-' pour stdout), Parquet ou Excel."""
+    def __init__(self, path):
+        self.path = path
+        self.format = 'csv' if path == '-' else _suffix(path)
+        if self.format not in ('csv', 'parquet', 'pq', 'xlsx'):
+            raise ValueError(f"Format de sortie non supporté : {path} (attendus : .csv, .parquet, .xlsx)")
+        self.rows = 0
+        self._writer = None
+        self._file = None
+
+    def write(self, df):
+        if self.format == 'csv':
+            if self._file is None:
+                self._file = sys.stdout if self.path == '-' else open(self.path, 'w', newline='', encoding='utf-8')
+                df.to_csv(self._file, index=False)
+            else:
+                df.to_csv(self._file, index=False, header=False)
+        elif self.format == 'xlsx':
+            if self._writer is None:
+                from export import SheetWriter
+                self._writer = SheetWriter().sheet('Scenarios', df.columns)
+            self._writer.append_rows(df.to_numpy(dtype=object))
+        else:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError as exc:
+                raise RuntimeError("La sortie Parquet nécessite pyarrow") from exc
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None and self.format == 'xlsx':
+            self._writer.save(self.path)
+        elif self._writer is not None:
+            self._writer.close()
+        if self._file is not None and self._file is not sys.stdout:
+            self._file.close()
+
+
+_WORKER = {}
+
+
+def _init_worker(engine, units, base_inputs):
+    _WORKER.update(engine=engine, units=units, base_inputs=base_inputs)
+
+
+def _scalar_kpis(inputs, df_units):
+    """KPI d'un scénario par la chaîne de classes de financial_model (entrées à plat)."""
+    from financial_model import (Amortization, CapexSummary, CashflowEngine, Construction, Financing, General,
+                                 OperationExit, Parking, Scheduler)
+    gen = General(inputs)
+    park = Parking(inputs, df_units)
+    const = Construction({'parking_capex': park.total_capex, **inputs}, gen, df_units)
+    fin = Financing(inputs)
+    op = OperationExit(inputs)
+    capex_sum = CapexSummary(const, fin)
+    amort = Amortization(fin, op)
+    sched = Scheduler(df_units, op, gen, fin)
+    return CashflowEngine(gen, const, fin, capex_sum, op, amort, sched).kpis
+
+
+def _frequencies(scenarios, base_inputs):
+    """Pas de temps de chaque scénario (colonne 'frequency', sinon celui des entrées communes)."""
+    import pandas as pd
+    default = base_inputs.get('frequency', 'annual')
+    if 'frequency' not in scenarios.columns:
+        return pd.Series(default, index=scenarios.index)
+    return scenarios['frequency'].fillna(default)
+
+
+def _scalar_chunk(chunk, df_units, base_inputs):
+    import pandas as pd
+    from batch import KPI_COLUMNS
+    rows = []
+    for record in chunk.to_dict('records'):
+        scenario = {**base_inputs, **{k: v for k, v in record.items() if not pd.isna(v)}}
+        rows.append(_scalar_kpis(scenario, df_units))
+    return pd.DataFrame(rows, columns=KPI_COLUMNS)
+
+
+def _run_chunk(chunk):
+    import numpy as np
+    import pandas as pd
+    from batch import evaluate_batch
+    base_inputs = _WORKER['base_inputs']
+    if _WORKER['engine'] != 'batch':
+        return _scalar_chunk(chunk, _WORKER['units'], base_inputs)
+    # Le lot est annuel : les scénarios trimestriels / mensuels passent par la chaîne de financial_model
+    annual = (_frequencies(chunk, base_inputs) == 'annual').to_numpy()
+    parts = []
+    if annual.any():
+        batch_base = {k: v for k, v in base_inputs.items() if k != 'frequency'}
+        kpis = evaluate_batch(chunk[annual].drop(columns='frequency', errors='ignore'), _WORKER['units'], batch_base).kpis
+        parts.append(kpis.set_axis(np.flatnonzero(annual)))
+    if not annual.all():
+        kpis = _scalar_chunk(chunk[~annual], _WORKER['units'].table, base_inputs)
+        parts.append(kpis.set_axis(np.flatnonzero(~annual)))
+    return pd.concat(parts).sort_index().reset_index(drop=True)
+
+
+def run(scenarios, df_units, base_inputs, writer, engine='batch', jobs=1, chunk_size=10_000,
+        id_column='scenario', with_inputs=False, strict=False):
+    """
+    Évalue `scenarios` par blocs de `chunk_size` et écrit chaque bloc dès qu'il est prêt.
+    Les valeurs invalides de la table des unités sont signalées sur stderr (erreur si `strict`).
+    """
+    import pandas as pd
+    if id_column in scenarios.columns:
+        ids, scenarios = scenarios[id_column], scenarios.drop(columns=id_column)
+    else:
+        ids = pd.Series(range(len(scenarios)), name=id_column)
+    if engine == 'batch':
+        from batch import BatchUnits
+        units = BatchUnits(df_units, base_inputs.get('df_asset_costs'))
+    else:
+        from financial_model import UnitsTable
+        units = UnitsTable(df_units)
+    table = units.table if engine == 'batch' else units
+    if strict:
+        table.raise_for_errors()
+    for row, column, value, error in table.errors:
+        print(f"Units ligne {row}, {column} = {value!r} : {error}", file=sys.stderr)
+    if engine == 'batch':
+        periodic = int((_frequencies(scenarios, base_inputs) != 'annual').sum())
+        if periodic:
+            print(f"{periodic} scénario(s) en pas trimestriel ou mensuel : évalués par la chaîne de financial_model",
+                  file=sys.stderr)
+    starts = range(0, len(scenarios), chunk_size)
+    chunks = (scenarios.iloc[start:start + chunk_size] for start in starts)
+
+    def emit(start, kpis):
+        block = slice(start, start + len(kpis))
+        parts = [ids.iloc[block].reset_index(drop=True).to_frame(id_column)]
+        if with_inputs:
+            parts.append(scenarios.iloc[block].reset_index(drop=True))
+        parts.append(kpis)
+        writer.write(pd.concat(parts, axis=1))
+
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(engine, units, base_inputs)) as pool:
+            for start, kpis in zip(starts, pool.map(_run_chunk, chunks)):
+                emit(start, kpis)
+    else:
+        _init_worker(engine, units, base_inputs)
+        for start, chunk in zip(starts, chunks):
+            emit(start, _run_chunk(chunk))
+    return writer.rows
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description="Évalue des scénarios du modèle sans interface.")
+    parser.add_argument('--units', required=True, help="Table des unités (.json, .csv, .parquet)")
+    parser.add_argument('--scenarios', help="Un scénario par ligne, colonnes = entrées du modèle (défaut : scénario de base seul)")
+    parser.add_argument('--base', help="Entrées communes à tous les scénarios (.json)")
+    parser.add_argument('--asset-costs', help="Coûts par Asset Class (.json, .csv, .parquet)")
+    parser.add_argument('--output', '-o', default='-', help="Fichier .csv, .parquet ou .xlsx (défaut : CSV sur stdout)")
+    parser.add_argument('--jobs', '-j', type=int, default=1, help="Processus de calcul (défaut : 1)")
+    parser.add_argument('--chunk-size', type=int, default=10_000, help="Scénarios par bloc écrit (défaut : 10000)")
+    parser.add_argument('--engine', choices=ENGINES, default='batch',
+                        help="batch : moteur vectorisé (pas annuel, les autres pas passent par financial_model) ; "
+                             "scalar : classes de financial_model, une par scénario")
+    parser.add_argument('--id-column', default='scenario', help="Colonne identifiant recopiée en sortie (défaut : scenario)")
+    parser.add_argument('--with-inputs', action='store_true', help="Recopier les colonnes d'entrée en sortie")
+    parser.add_argument('--strict', action='store_true', help="Échouer si la table des unités contient des valeurs invalides")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.jobs < 1 or args.chunk_size < 1:
+        print("--jobs et --chunk-size doivent être >= 1", file=sys.stderr)
+        return 2
+
+    import pandas as pd
+    writer = None
+    try:
+        df_units = read_table(args.units)
+        base_inputs = read_base(args.base, args.asset_costs)
+        scenarios = read_table(args.scenarios) if args.scenarios else pd.DataFrame(index=range(1))
+        writer = ResultWriter(args.output)
+        rows = run(scenarios, df_units, base_inputs, writer, engine=args.engine, jobs=args.jobs,
+                   chunk_size=args.chunk_size, id_column=args.id_column, with_inputs=args.with_inputs,
+                   strict=args.strict)
+    except (OSError, KeyError, ValueError, RuntimeError) as exc:
+        print(f"Erreur : {exc}", file=sys.stderr)
+        return 1
+    finally:
+        if writer is not None:
+            writer.close()
+    if args.output != '-':
+        print(f"{rows} scénarios -> {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Export Excel du modèle, une feuille par étape (General, Construction, Financing,
+Operation, Amortization, RentSchedule, SaleSchedule, Cashflow, KPIs), et export
+d'un lot de scénarios (une ligne par scénario).
+
+Le classeur est écrit en mode write-only d'openpyxl : chaque ligne est sérialisée
+dès qu'elle est ajoutée, la mémoire ne dépend pas du nombre de lignes.
+`target` est un chemin ou un buffer binaire (io.BytesIO pour st.download_button).
+"""
+import io
+
+import numpy as np
+
+from financial_model import CASHFLOW_COLUMNS
+
+
+def _cell(value):
+    """Valeur acceptée par openpyxl : scalaires Python, NaN / inf -> cellule vide."""
+    if isinstance(value, (np.bool_, bool)):
+        return bool(value)
+    if isinstance(value, (np.integer, int)):
+        return int(value)
+    if isinstance(value, (np.floating, float)):
+        return float(value) if np.isfinite(value) else None
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+def _scalars(obj):
+    """Attributs publics scalaires d'un objet du modèle, dans l'ordre de calcul."""
+    return [(k, v) for k, v in vars(obj).items()
+            if not k.startswith('_') and isinstance(v, (bool, int, float, str, np.number, np.bool_))]
+
+
+class SheetWriter:
+    """Classeur write-only : `sheet(titre, en-tête)` puis `append(ligne)` ou `append_rows(tableau)`."""
+    def __init__(self):
+        try:
+            from openpyxl import Workbook
+        except ImportError as exc:
+            raise RuntimeError("L'export Excel nécessite openpyxl") from exc
+        self.workbook = Workbook(write_only=True)
+        self._sheet = None
+
+    def sheet(self, title, header=None):
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+        self._sheet = self.workbook.create_sheet(title[:31])
+        if header is not None:
+            bold = Font(bold=True)
+            cells = []
+            for name in header:
+                cell = WriteOnlyCell(self._sheet, value=_cell(name))
+                cell.font = bold
+                cells.append(cell)
+            self._sheet.append(cells)
+        return self
+
+    def append(self, row):
+        self._sheet.append([_cell(v) for v in row])
+
+    def append_rows(self, rows, labels=None):
+        """Lignes d'un tableau 2D (converties par .tolist(), ligne à ligne), précédées de `labels`."""
+        for i, row in enumerate(np.asarray(rows)):
+            values = row.tolist()
+            self._sheet.append([_cell(v) for v in ([] if labels is None else list(labels[i])) + values])
+
+    def key_values(self, title, pairs):
+        self.sheet(title, ['Item', 'Value'])
+        for key, value in pairs:
+            self.append((key, value))
+
+    def save(self, target):
+        self.workbook.save(target)
+        return target
+
+
+def export_model(stages, target=None, inputs=None):
+    """
+    Écrit les étapes d'un calcul (dict {nom: objet} comme ModelGraph.run) dans un
+    classeur. `inputs` (dict à plat) ajoute une feuille Inputs. Sans `target`,
+    renvoie le contenu .xlsx en bytes.
+    """
+    out = SheetWriter()
+    if inputs:
+        out.key_values('Inputs', [(k, v) for k, v in inputs.items() if k != 'df_asset_costs'])
+    out.key_values('General', _scalars(stages['General']))
+
+    # [Feuille Construction] : postes, parking et courbe en S annuelle
+    construction = stages['Construction']
+    out.key_values('Construction', _scalars(construction) + [(f'parking_{k}', v) for k, v in _scalars(stages['Parking'])])
+    out.append(())
+    out.append(('Year', 'CAPEX'))
+    for year, amount in construction.get_yearly_capex().items():
+        out.append((year, amount))
+
+    out.key_values('Financing', _scalars(stages['Financing']) + _scalars(stages['CapexSummary']))
+    out.key_values('Operation', _scalars(stages['OperationExit']))
+
+    amortization = stages['Amortization']
+    fields = list(amortization.FIELDS)
+    out.sheet('Amortization', ['Period', 'Year'] + fields)
+    out.append_rows(np.column_stack([getattr(amortization, f) for f in fields]),
+                    labels=np.column_stack([amortization.periods, amortization.years]).tolist())
+
+    scheduler = stages['Scheduler']
+    for title, by_asset, total in (('RentSchedule', scheduler.rent_schedule_by_asset, scheduler.rent_total),
+                                   ('SaleSchedule', scheduler.sale_schedule_by_asset, scheduler.sale_total)):
+        assets = [a for a in scheduler.asset_classes if a in by_asset]
+        out.sheet(title, ['Year'] + assets + ['Total'])
+        matrix = np.column_stack([[by_asset[a][y] for y in scheduler.years.tolist()] for a in assets] + [total])
+        out.append_rows(matrix, labels=[[y] for y in scheduler.years.tolist()])
+
+    cf = stages['CashflowEngine']
+    annual = cf.periods_per_year == 1
+    out.sheet('Cashflow', (['Year'] if annual else ['Period', 'Year']) + CASHFLOW_COLUMNS)
+    index = cf.periods[:, None] if annual else np.column_stack([cf.periods, cf.period_years])
+    out.append_rows(np.column_stack([cf.columns[c] for c in CASHFLOW_COLUMNS]), labels=index.tolist())
+
+    out.key_values('KPIs', cf.kpis.items())
+    return _finish(out, target)
+
+
+def export_batch(result, target=None, cashflow_columns=('Net Cash Flow',), chunk_rows=10_000):
+    """
+    Écrit un lot (BatchResult) : feuille Scenarios (entrées + KPI, une ligne par
+    scénario) et une feuille (scénario x années) par colonne de `cashflow_columns`.
+    Les lignes sont converties par blocs de `chunk_rows`.
+    """
+    out = SheetWriter()
+    inputs = result.inputs
+    keys = list(inputs.columns)
+    kpis = result.kpis
+    out.sheet('Scenarios', ['Scenario'] + keys + list(kpis.columns))
+    for start in range(0, len(inputs), chunk_rows):
+        block = slice(start, start + chunk_rows)
+        ids = np.arange(len(inputs))[block]
+        table = [ids.tolist()] + [inputs[k][block].tolist() for k in keys] + [kpis[c].to_numpy()[block].tolist() for c in kpis.columns]
+        for row in zip(*table):
+            out.append(row)
+
+    holding = np.asarray(inputs['holding_period'])
+    for name in cashflow_columns:
+        values = result.column(name)
+        out.sheet(name, ['Scenario'] + [f'Year {y}' for y in result.years.tolist()])
+        for start in range(0, len(values), chunk_rows):
+            block = values[start:start + chunk_rows]
+            # Au-delà de la durée de détention du scénario : cellules vides
+            block = np.where(result.years[None, :] <= holding[start:start + chunk_rows, None], block, np.nan)
+            out.append_rows(block, labels=[[i] for i in range(start, start + len(block))])
+    return _finish(out, target)
+
+
+def _finish(out, target):
+    if target is None:
+        buffer = io.BytesIO()
+        out.save(buffer)
+        return buffer.getvalue()
+    return out.save(target)
@@ -1,7 +1,12 @@
+import re
+
 import numpy as np
 import numpy_financial as npf
 import pandas as pd
 
+from instrument import span
+from kpis import equity_kpis
+
 class General:
     """
     Source: [Feuille General]
@@ -20,27 +25,160 @@ class General:
         self.gfa = self.buildable_footprint * self.far
         self.gla = self.gfa * self.building_efficiency
 
+class UnitsTable:
+    """
+    Source: [Feuille Units]
+
+    Table des unités validée et convertie une seule fois en tableaux typés, lue
+    par Parking, Construction et Scheduler : montants float64 (0 si vide),
+    pourcentages float64 (*_given = False si vide : défaut du scénario),
+    années int16 (Sale Year 'Exit' -> SALE_AT_EXIT, 0 -> NEVER), codes
+    d'asset class et Mode en bits (MODE_RENT | MODE_SALE).
+    Les cellules non vides impossibles à convertir, et les années vides, sont
+    relevées dans `errors` (voir error_report) ; l'unité reçoit la valeur neutre
+    (0, défaut du scénario, NEVER, Mode 0) au lieu de faire échouer le calcul.
+    """
+    SALE_AT_EXIT = -1
+    NEVER = 999    # année hors horizon : jamais louée / vendue
+    MODE_RENT = 1
+    MODE_SALE = 2
+    MODES = {'rent': MODE_RENT, 'sale': MODE_SALE, 'mixed': MODE_RENT | MODE_SALE}
+
+    def __init__(self, df_units: pd.DataFrame):
+        self.n_units = len(df_units)
+        self.index = df_units.index
+        self.errors = []
+        self._df = df_units
+
+        # MAPPING EXACT [Feuille Units].txt (montants : cellule vide = 0)
+        self.surface = np.nan_to_num(self._numeric('Surface (GLA m²)', 0))
+        self.rent_monthly = np.nan_to_num(self._numeric('Rent (€/m²/mo)', 0))
+        self.price_m2 = np.nan_to_num(self._numeric('Price €/m²', 0))
+        self.parking_fixed = np.nan_to_num(self._numeric('Parking per unit', 0))
+        self.parking_ratio = np.nan_to_num(self._numeric('Parking ratio (per 100 m²)', 0))
+        for key, column in [('occ', 'Occ %'), ('rent_growth', 'Rent growth %'), ('price_growth', 'Asset Value Growth (%/yr)')]:
+            values = self._numeric(column, np.nan)
+            setattr(self, key, values / 100.0)
+            setattr(self, key + '_given', ~np.isnan(values))
+
+        start_year = self._numeric('Start Year', self.NEVER, required=True)
+        self.start_year = np.where(np.isnan(start_year), self.NEVER, np.trunc(start_year)).astype(np.int16)
+        self.sale_year = self._sale_years()
+
+        codes, labels = self._factorize('Mode', '')
+        lookup = np.array([self.MODES.get(str(v).strip().lower(), 0) for v in labels], dtype=np.int8)
+        self._record(codes, labels, lookup == 0, 'Mode', "attendu : Rent, Sale ou Mixed", skip_blank=True)
+        self.mode = lookup[codes] if len(lookup) else np.zeros(self.n_units, dtype=np.int8)
+
+        # Asset class : libellés bruts distincts (recherche des coûts) et classes normalisées
+        self.has_asset_class = 'AssetClass' in df_units.columns
+        self.asset_label_codes, raw_labels = self._factorize('AssetClass', None)
+        self.asset_labels = [str(v) for v in raw_labels]
+        raw_keys = [label.lower().strip() for label in self.asset_labels] if self.has_asset_class else []
+        self.asset_classes = list(dict.fromkeys(raw_keys + ['other']))
+        lookup = {k: i for i, k in enumerate(self.asset_classes)}
+        self.asset_codes = np.array([lookup[k] for k in raw_keys] or [lookup['other']], dtype=np.int16)[self.asset_label_codes]
+        self._df = None
+
+    @classmethod
+    def of(cls, df_units):
+        """UnitsTable déjà construite, ou construite depuis un DataFrame."""
+        return df_units if isinstance(df_units, cls) else cls(df_units)
+
+    @property
+    def is_rent(self):
+        return (self.mode & self.MODE_RENT) != 0
+
+    @property
+    def is_sale(self):
+        return (self.mode & self.MODE_SALE) != 0
+
+    @property
+    def is_exit_sale(self):
+        return self.sale_year == self.SALE_AT_EXIT
+
+    @property
+    def total_gla(self):
+        return float(self.surface.sum())
+
+    @property
+    def parking_spaces(self):
+        # Cumul dans l'ordre des lignes, comme la boucle d'origine
+        spaces = self.parking_fixed + (self.surface / 100) * self.parking_ratio
+        return float(np.bincount(np.zeros(self.n_units, dtype=np.intp), weights=spaces, minlength=1)[0])
+
+    def gla_matching(self, asset_name):
+        """GLA des unités dont l'AssetClass contient `asset_name` (regex, sans casse), testé sur les seuls libellés distincts."""
+        if not self.has_asset_class:
+            return 0.0
+        pattern = re.compile(str(asset_name), re.IGNORECASE)
+        matched = np.array([pattern.search(label) is not None for label in self.asset_labels], dtype=bool)
+        if not matched.any():
+            return 0.0
+        return self.surface[matched[self.asset_label_codes]].sum()
+
+    def error_report(self):
+        return pd.DataFrame(self.errors, columns=['Row', 'Column', 'Value', 'Error'])
+
+    def raise_for_errors(self):
+        if self.errors:
+            shown = '; '.join(f"ligne {row}, {column} = {value!r} ({error})" for row, column, value, error in self.errors[:5])
+            more = f" (+{len(self.errors) - 5} autres)" if len(self.errors) > 5 else ''
+            raise ValueError(f"Units : {len(self.errors)} valeur(s) invalide(s) : {shown}{more}")
+
+    # --- conversion ---
+    def _factorize(self, column, default):
+        if column not in self._df.columns:
+            return np.zeros(self.n_units, dtype=np.intp), np.array([default], dtype=object)
+        codes, uniques = pd.factorize(self._df[column], use_na_sentinel=False)
+        return codes, np.asarray(uniques, dtype=object)
+
+    def _numeric(self, column, default, required=False):
+        # Conversion sur les valeurs distinctes ; vide = NaN, non numérique = erreur relevée
+        if column not in self._df.columns:
+            return np.full(self.n_units, default, dtype=np.float64)
+        codes, uniques = self._factorize(column, default)
+        values = pd.to_numeric(pd.Series(uniques, dtype=object), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        blank = np.array([_is_blank(v) for v in uniques], dtype=bool)
+        self._record(codes, uniques, np.isnan(values) & ~blank, column, "valeur non numérique")
+        if required:
+            self._record(codes, uniques, blank, column, "année manquante")
+        return values[codes] if len(values) else np.zeros(0)
+
+    def _sale_years(self):
+        column = 'Sale Year'
+        if column not in self._df.columns:
+            return np.full(self.n_units, self.SALE_AT_EXIT, dtype=np.int16)
+        codes, uniques = self._factorize(column, 'Exit')
+        is_exit = np.array([str(v).strip().lower() == 'exit' for v in uniques], dtype=bool)
+        numeric = pd.to_numeric(pd.Series(uniques, dtype=object), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        invalid = ~is_exit & np.isnan(numeric)
+        self._record(codes, uniques, invalid, column, "attendu : année ou 'Exit'")
+        years = np.where(numeric == 0, self.NEVER, np.trunc(numeric))
+        years = np.where(is_exit, self.SALE_AT_EXIT, np.where(invalid, self.NEVER, years))
+        return years.astype(np.int16)[codes]
+
+    def _record(self, codes, uniques, bad_uniques, column, message, skip_blank=False):
+        if skip_blank:
+            bad_uniques = bad_uniques & ~np.array([_is_blank(v) for v in uniques], dtype=bool)
+        if not bad_uniques.any():
+            return
+        for row in np.flatnonzero(bad_uniques[codes]):
+            self.errors.append((self.index[row], column, uniques[codes[row]], message))
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NA or (isinstance(value, str) and not value.strip())
+
 class Parking:
     """
     Source: [Feuille Parking] linked to [Feuille Units]
     """
     def __init__(self, inputs, df_units: pd.DataFrame):
         self.cost_per_space = inputs.get('cost_per_space', 18754)
-        self.total_spaces = 0
-        
-        if not df_units.empty:
-            for _, row in df_units.iterrows():
-                # Mapping exact des colonnes Units.txt
-                fixed = pd.to_numeric(row.get('Parking per unit', 0), errors='coerce')
-                ratio = pd.to_numeric(row.get('Parking ratio (per 100 m²)', 0), errors='coerce')
-                surface = pd.to_numeric(row.get('Surface (GLA m²)', 0), errors='coerce')
-                
-                if pd.isna(fixed): fixed = 0
-                if pd.isna(ratio): ratio = 0
-                if pd.isna(surface): surface = 0
-                
-                spaces = fixed + ((surface / 100) * ratio)
-                self.total_spaces += spaces
+        units = UnitsTable.of(df_units)
+        # places fixes + ratio pour 100 m², cellules vides = 0
+        self.total_spaces = units.parking_spaces
         
         self.total_capex = self.total_spaces * self.cost_per_space
 
@@ -66,26 +204,25 @@ class Construction:
         self.amenities_capex = inputs.get('amenities_total_capex', 0)
         self.parking_capex = inputs.get('parking_capex', 0)
 
-        total_units_gla = 0
-        if not df_units.empty and 'Surface (GLA m²)' in df_units.columns:
-            total_units_gla = df_units['Surface (GLA m²)'].sum()
+        units = UnitsTable.of(df_units)
+        total_units_gla = units.total_gla
             
         efficiency_factor = (1 + (100 - (general.building_efficiency * 100)) / 100)
         self.gfa_calculated = total_units_gla * efficiency_factor
 
         self.total_hard_costs = 0
         if self.use_research_cost and not self.df_asset_costs.empty:
-            for _, row in self.df_asset_costs.iterrows():
-                asset_name = str(row['Asset Class'])
-                cost_per_m2 = row['Cost €/m²']
-                
-                # Recherche avec 'AssetClass' (sans espace)
-                if 'AssetClass' in df_units.columns and 'Surface (GLA m²)' in df_units.columns:
-                    mask = df_units['AssetClass'].astype(str).str.contains(asset_name, case=False, na=False)
-                    gla = df_units.loc[mask, 'Surface (GLA m²)'].sum()
-                    eff_decimal = general.building_efficiency
-                    gfa = gla / eff_decimal if eff_decimal else 0
-                    self.total_hard_costs += (gfa * cost_per_m2)
+            with span('Construction.asset_costs', rows=len(self.df_asset_costs)):
+                for _, row in self.df_asset_costs.iterrows():
+                    asset_name = str(row['Asset Class'])
+                    cost_per_m2 = row['Cost €/m²']
+
+                    # Recherche avec 'AssetClass' (sans espace)
+                    if units.has_asset_class:
+                        gla = units.gla_matching(asset_name)
+                        eff_decimal = general.building_efficiency
+                        gfa = gla / eff_decimal if eff_decimal else 0
+                        self.total_hard_costs += (gfa * cost_per_m2)
         else:
             self.hard_cost_per_m2 = self.structure_cost + self.finishing_cost + self.utilities_cost
             self.total_hard_costs = self.hard_cost_per_m2 * self.gfa_calculated
@@ -130,6 +267,9 @@ class CapexSummary:
         self.upfront_financing_fees = financing.total_upfront_fees
         self.total_capex = self.construction_pre_financing + self.upfront_financing_fees
 
+# Pas de temps du cash flow et de la dette -> périodes par an
+FREQUENCIES = {'annual': 1, 'quarterly': 4, 'monthly': 12}
+
 class OperationExit:
     """
     Source: [Feuille Operation] & [Feuille Exit]
@@ -143,27 +283,49 @@ class OperationExit:
         self.holding_period = int(inputs.get('holding_period', 20))
         self.exit_yield = inputs.get('exit_yield', 8.25) / 100.0
         self.transac_fees_exit = inputs.get('transac_fees_exit', 5.0) / 100.0
+        frequency = inputs.get('frequency', 'annual')
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"Fréquence inconnue : {frequency} (attendues : {list(FREQUENCIES)})")
+        self.frequency = frequency
+        self.periods_per_year = FREQUENCIES[frequency]
 
 class Amortization:
     """
     Source: [Feuille Amortization]
+
+    Échéancier en colonnes float64 indexées par période (self.periods = 1 .. term + 4 ans) ;
+    `schedule` (dict par période) est reconstruit à la demande. En fréquence
+    mensuelle (trimestrielle), taux, franchise et durée sont ramenés au mois
+    (au trimestre) : intérêts courus et annuités par période. En annuel, une période = une année.
     """
+    FIELDS = ('opening', 'payment', 'interest', 'principal', 'closing')
+
     def __init__(self, financing: Financing, operation: OperationExit):
-        self.schedule = {}
+        m = operation.periods_per_year
         balance = financing.debt_principal
-        rate = financing.interest_rate
-        term = financing.loan_term
-        grace = financing.grace_period
-        exit_year = operation.holding_period
+        rate = financing.interest_rate / m
+        term = financing.loan_term * m
+        grace = financing.grace_period * m
+        exit_year = operation.holding_period * m
         
         amortization_duration = term - grace
         annuity = npf.pmt(rate, amortization_duration, -balance) if amortization_duration > 0 else 0
 
+        self.periods_per_year = m
+        self.periods = np.arange(1, term + 4 * m + 1)
+        self.years = (self.periods - 1) // m + 1
+        n_years = len(self.periods)
+        self.opening = np.zeros(n_years)
+        self.payment = np.zeros(n_years)
+        self.interest = np.zeros(n_years)
+        self.principal = np.zeros(n_years)
+        self.closing = np.zeros(n_years)
+        self._schedule = None
+
+        # Récurrence sur le solde : boucle scalaire, écriture directe dans les colonnes
         current_balance = balance
-        for year in range(1, term + 5):
-            if year > exit_year:
-                self.schedule[year] = {'opening': 0, 'payment': 0, 'interest': 0, 'principal': 0, 'closing': 0}
-                continue
+        for i in range(min(n_years, max(exit_year, 0))):
+            year = i + 1
             opening = current_balance
             interest = opening * rate
             if year <= grace:
@@ -176,12 +338,82 @@ class Amortization:
                 payment = 0; principal = 0; interest = 0
             closing = opening - principal
             if closing < 0.01: closing = 0
-            self.schedule[year] = {'opening': opening, 'payment': payment, 'interest': interest, 'principal': principal, 'closing': closing}
+            self.opening[i] = opening
+            self.payment[i] = payment
+            self.interest[i] = interest
+            self.principal[i] = principal
+            self.closing[i] = closing
             current_balance = closing
 
+    @property
+    def schedule(self):
+        if self._schedule is None:
+            columns = [getattr(self, field).tolist() for field in self.FIELDS]
+            self._schedule = {period: dict(zip(self.FIELDS, row)) for period, row in zip(self.periods.tolist(), zip(*columns))}
+        return self._schedule
+
+_EXACT_POW_LIMIT = 4096
+
+def _growth_factors(rates, years):
+    """
+    Matrice (unités, années) des facteurs (1 + g) ** y.
+
+    Les taux distincts sont peu nombreux (un par typologie) : les puissances sont
+    calculées par le pow() de Python sur les seuls taux distincts, pour rester
+    identiques au calcul scalaire. Au-delà de _EXACT_POW_LIMIT taux distincts,
+    np.power prend le relais (écarts possibles au dernier bit).
+    """
+    base, inverse = np.unique(1 + rates, return_inverse=True)
+    if len(base) > _EXACT_POW_LIMIT:
+        return base[inverse][:, None] ** years[None, :]
+    exponents = years.tolist()
+    table = np.array([[b ** y for y in exponents] for b in base.tolist()], dtype=np.float64).reshape(len(base), len(exponents))
+    return table[inverse]
+
+def _s_curve_shares(shares, periods_per_year):
+    """
+    Parts de CAPEX par période à partir des parts annuelles : courbe cumulée
+    monotone (Hermite, pentes de Fritsch-Carlson, nulles aux extrémités) passant
+    exactement par les cumuls de fin d'année. En annuel, les parts sont inchangées.
+    """
+    shares = np.asarray(shares, dtype=np.float64)
+    m = periods_per_year
+    if m == 1:
+        return shares
+    cumulative = np.concatenate([[0.0], np.cumsum(shares)])
+    slopes = np.zeros(len(cumulative))
+    same_sign = shares[:-1] * shares[1:] > 0
+    with np.errstate(divide='ignore'):
+        slopes[1:-1] = np.where(same_sign, 2 / (1 / np.where(same_sign, shares[:-1], 1) + 1 / np.where(same_sign, shares[1:], 1)), 0.0)
+    t = np.arange(len(shares) * m + 1) / m
+    k = np.minimum(np.floor(t).astype(np.intp), len(shares) - 1)
+    u = t - k
+    h00, h10, h01, h11 = 2 * u**3 - 3 * u**2 + 1, u**3 - 2 * u**2 + u, -2 * u**3 + 3 * u**2, u**3 - u**2
+    curve = h00 * cumulative[k] + h10 * slopes[k] + h01 * cumulative[k + 1] + h11 * slopes[k + 1]
+    return np.diff(curve)
+
+def _ordered_sums(matrix, codes, n_groups):
+    """
+    Totaux par colonne et par groupe de `matrix`, accumulés dans l'ordre des
+    lignes (même ordre d'accumulation que la boucle ligne par ligne).
+    """
+    columns = np.asfortranarray(matrix)
+    single = np.zeros(len(codes), dtype=np.intp)
+    total = np.zeros(matrix.shape[1])
+    by_group = np.zeros((n_groups, matrix.shape[1]))
+    for j in range(matrix.shape[1]):
+        total[j] = np.bincount(single, weights=columns[:, j], minlength=1)[0]
+        by_group[:, j] = np.bincount(codes, weights=columns[:, j], minlength=n_groups)
+    return total, by_group
+
 class Scheduler:
     """
     Source: [Feuille RentSchedule] & [Feuille SaleSchedule]
+
+    Les loyers, ventes et surfaces occupées sont calculés en matrices
+    (unités, années) : rent_matrix, sale_matrix, occupied_area_matrix.
+    Les totaux par année (rent_total, sale_total, occupied_area_total) et les
+    dictionnaires par année en sont des réductions.
     """
     def __init__(self, df_units, operation: OperationExit, general: General, financing: Financing):
         self.rent_schedule = {} 
@@ -191,76 +423,91 @@ class Scheduler:
         self.occupied_area_schedule = {}
 
         years = range(1, operation.holding_period + 2)
-        for y in years:
-            self.rent_schedule[y] = 0.0
-            self.sale_schedule[y] = 0.0
-            self.occupied_area_schedule[y] = 0.0
-            
-        asset_classes = df_units['AssetClass'].unique() if 'AssetClass' in df_units.columns else []
-        asset_classes = [str(ac).lower().strip() for ac in asset_classes]
-        for ac in asset_classes:
-            self.rent_schedule_by_asset[ac] = {y: 0.0 for y in years}
-            self.sale_schedule_by_asset[ac] = {y: 0.0 for y in years}
-        self.rent_schedule_by_asset['other'] = {y: 0.0 for y in years}
-        self.sale_schedule_by_asset['other'] = {y: 0.0 for y in years}
-
-        for _, row in df_units.iterrows():
-            raw_asset = str(row.get('AssetClass', 'Other'))
-            asset_key = raw_asset.lower().strip()
-            if asset_key not in self.rent_schedule_by_asset: asset_key = 'other'
-
-            # MAPPING EXACT [Feuille Units].txt
-            surface = pd.to_numeric(row.get('Surface (GLA m²)', 0), errors='coerce')
-            base_rent_monthly = pd.to_numeric(row.get('Rent (€/m²/mo)', 0), errors='coerce')
-            base_price_m2 = pd.to_numeric(row.get('Price €/m²', 0), errors='coerce')
-            mode = str(row.get('Mode', '')).lower()
-            start_year = int(pd.to_numeric(row.get('Start Year', 999), errors='coerce'))
-            
-            sale_year_val = row.get('Sale Year', 'Exit')
-            is_exit_sale = str(sale_year_val).strip().lower() == 'exit'
-            sale_year = operation.holding_period if is_exit_sale else int(pd.to_numeric(sale_year_val, errors='coerce') or 999)
-            
-            occ = (pd.to_numeric(row.get('Occ %', np.nan), errors='coerce') / 100.0) if pd.notna(row.get('Occ %')) else operation.occupancy_default
-            rent_growth = (pd.to_numeric(row.get('Rent growth %', np.nan), errors='coerce') / 100.0) if pd.notna(row.get('Rent growth %')) else operation.rent_growth
-            price_growth = (pd.to_numeric(row.get('Asset Value Growth (%/yr)', np.nan), errors='coerce') / 100.0) if pd.notna(row.get('Asset Value Growth (%/yr)')) else operation.inflation
-
-            if mode in ['rent', 'mixed']:
-                current_rent_m2 = base_rent_monthly * 12
-                for y in years:
-                    receives_rent = False
-                    if y >= start_year:
-                        if is_exit_sale: receives_rent = True
-                        elif sale_year > y: receives_rent = True 
-                    
-                    if receives_rent:
-                        # Indexation Year 0 basis
-                        indexed_rent = current_rent_m2 * ((1 + rent_growth) ** y)
-                        val = surface * indexed_rent * occ
-                        self.rent_schedule[y] += val
-                        self.rent_schedule_by_asset[asset_key][y] += val
-                        self.occupied_area_schedule[y] += (surface * occ)
-
-            if mode in ['sale', 'mixed']:
-                if not is_exit_sale and sale_year in years:
-                    # Indexation Year 0 basis
-                    price_indexed = base_price_m2 * ((1 + price_growth) ** sale_year)
-                    val = surface * price_indexed
-                    self.sale_schedule[sale_year] += val
-                    self.sale_schedule_by_asset[asset_key][sale_year] += val
+        self.years = np.arange(1, operation.holding_period + 2)
+        units = UnitsTable.of(df_units)
+        n_units = units.n_units
+        self.asset_classes = units.asset_classes
+        self.asset_codes = units.asset_codes
+
+        surface = units.surface
+        base_rent_monthly = units.rent_monthly
+        base_price_m2 = units.price_m2
+        start_year = units.start_year
+        is_exit_sale = units.is_exit_sale
+        sale_year = np.where(is_exit_sale, operation.holding_period, units.sale_year)
+        is_rent = units.is_rent
+        is_sale = units.is_sale
+
+        occ = np.where(units.occ_given, units.occ, operation.occupancy_default)
+        rent_growth = np.where(units.rent_growth_given, units.rent_growth, operation.rent_growth)
+        price_growth = np.where(units.price_growth_given, units.price_growth, operation.inflation)
+
+        y = self.years[None, :]
+
+        # Indexation Year 0 basis
+        receives_rent = is_rent[:, None] & (y >= start_year[:, None]) & (is_exit_sale[:, None] | (sale_year[:, None] > y))
+        indexed_rent = (base_rent_monthly * 12)[:, None] * _growth_factors(rent_growth, self.years)
+        self.rent_matrix = np.where(receives_rent, surface[:, None] * indexed_rent * occ[:, None], 0.0)
+        self.occupied_area_matrix = np.where(receives_rent, (surface * occ)[:, None], 0.0)
+
+        sells = is_sale & ~is_exit_sale & (sale_year >= 1) & (sale_year <= operation.holding_period + 1)
+        sale_col = np.where(sells, sale_year, 1).astype(np.intp) - 1
+        price_indexed = base_price_m2 * _growth_factors(price_growth, self.years)[np.arange(n_units), sale_col]
+        self.sale_matrix = np.where(sells[:, None] & (y == sale_year[:, None]), (surface * price_indexed)[:, None], 0.0)
+
+        n_assets = len(self.asset_classes)
+        rent_total, rent_by_asset = _ordered_sums(self.rent_matrix, self.asset_codes, n_assets)
+        sale_total, sale_by_asset = _ordered_sums(self.sale_matrix, self.asset_codes, n_assets)
+        area_total, _ = _ordered_sums(self.occupied_area_matrix, self.asset_codes, n_assets)
+
+        self.rent_total, self.sale_total, self.occupied_area_total = rent_total, sale_total, area_total
+        self.rent_schedule = dict(zip(years, rent_total.tolist()))
+        self.sale_schedule = dict(zip(years, sale_total.tolist()))
+        self.occupied_area_schedule = dict(zip(years, area_total.tolist()))
+        for i, ac in enumerate(self.asset_classes):
+            self.rent_schedule_by_asset[ac] = dict(zip(years, rent_by_asset[i].tolist()))
+            self.sale_schedule_by_asset[ac] = dict(zip(years, sale_by_asset[i].tolist()))
+
+CASHFLOW_COLUMNS = [
+    'Rental Income', 'Sales Proceeds', 'Exit Proceeds', 'Total Revenues', 'Total OPEX', 'NOI', 'CAPEX',
+    'Debt Service', 'Tax', 'Debt Drawdown', 'Upfront Fees', 'Net Cash Flow', 'Equity Injection', 'Equity CF',
+]
 
 class CashflowEngine:
     """
     Source: [Feuille Cashflow]
+
+    Chaque ligne du cash flow est une colonne float64 indexée par période
+    (self.periods = 0 .. holding_period x périodes par an) dans self.columns, dans
+    l'ordre de CASHFLOW_COLUMNS ; `df` n'est construit qu'au premier accès.
+    En annuel, une période = une année. En mensuel / trimestriel, loyers et OPEX
+    de l'année sont répartis sur ses périodes, les ventes tombent en première
+    période de l'année, la S-curve est lissée et la dette suit l'échéancier par
+    période ; `annual()` agrège par année.
     """
     def __init__(self, general: General, construction: Construction, financing: Financing, capex_summary: CapexSummary, operation: OperationExit, amortization: Amortization, scheduler: Scheduler):
-        self.df = pd.DataFrame()
         self.kpis = {}
-        years = range(0, operation.holding_period + 1)
-        data = []
-        
-        rent_n = scheduler.rent_schedule.get(operation.holding_period, 0)
-        area_n = scheduler.occupied_area_schedule.get(operation.holding_period, 0)
-        opex_fixed_n = area_n * operation.opex_per_m2 * ((1 + operation.inflation) ** (operation.holding_period - 1))
+        self._df = None
+        hold = operation.holding_period
+        m = self.periods_per_year = operation.periods_per_year
+        self.periods = np.arange(0, hold * m + 1)
+        self.period_years = np.concatenate([[0], (self.periods[1:] - 1) // m + 1])
+        n_periods = len(self.periods)
+        last = n_periods - 1
+
+        # Flux annuels du scheduler alignés sur les années 0 .. hold (0 hors échéancier)
+        rent_y = np.zeros(hold + 1); sales_y = np.zeros(hold + 1); area_y = np.zeros(hold + 1)
+        k = min(len(scheduler.rent_total), hold)
+        rent_y[1:k + 1] = scheduler.rent_total[:k]
+        sales_y[1:k + 1] = scheduler.sale_total[:k]
+        area_y[1:k + 1] = scheduler.occupied_area_total[:k]
+        inflation_y = np.zeros(hold + 1)
+        inflation_y[1:] = _growth_factors(np.array([operation.inflation]), np.arange(hold))[0]
+        opex_fixed_y = area_y * operation.opex_per_m2 * inflation_y
+
+        rent_n = rent_y[hold] if hold >= 1 else 0
+        area_n = area_y[hold] if hold >= 1 else 0
+        opex_fixed_n = area_n * operation.opex_per_m2 * ((1 + operation.inflation) ** (hold - 1))
         opex_var_n = rent_n * operation.pm_fee_pct
         noi_n = rent_n - (opex_fixed_n + opex_var_n)
         noi_n_plus_1 = noi_n * (1 + operation.rent_growth)
@@ -269,62 +516,94 @@ class CashflowEngine:
         
         ltc_ratio = financing.debt_principal / capex_summary.total_capex if capex_summary.total_capex > 0 else 0
 
-        for y in years:
-            row = {'Year': y}
-            if y == 0:
-                row['Rental Income'] = 0; row['Sales Proceeds'] = 0; row['Exit Proceeds'] = 0; row['Total Revenues'] = 0
-                row['Total OPEX'] = 0; row['NOI'] = 0; row['CAPEX'] = 0; row['Debt Service'] = 0; row['Tax'] = 0; row['Debt Drawdown'] = 0
-                row['Upfront Fees'] = -financing.total_upfront_fees
-                row['Net Cash Flow'] = row['Upfront Fees']
-                row['Equity Injection'] = -(capex_summary.total_capex - financing.debt_principal)
-                row['Equity CF'] = row['Equity Injection']
-            else:
-                rent = scheduler.rent_schedule.get(y, 0)
-                sales = scheduler.sale_schedule.get(y, 0)
-                exit_proc = net_exit_val if y == operation.holding_period else 0
-                row['Exit Proceeds'] = exit_proc
-                
-                area_rented = scheduler.occupied_area_schedule.get(y, 0)
-                opex_fixed = area_rented * operation.opex_per_m2 * ((1 + operation.inflation) ** (y - 1))
-                pm_fee = rent * operation.pm_fee_pct
-                total_opex = opex_fixed + pm_fee
-                
-                row['Rental Income'] = rent; row['Sales Proceeds'] = sales
-                row['Total Revenues'] = rent + sales + exit_proc
-                row['Total OPEX'] = -total_opex
-                row['NOI'] = (rent + sales) - total_opex
-                
-                tax = 0
-                if row['NOI'] > 0 and y > general.tax_holiday:
-                    tax = row['NOI'] * general.corporate_tax_rate
-                row['Tax'] = -tax
-                
-                s_curve_map = {1: construction.s_curve_y1, 2: construction.s_curve_y2, 3: construction.s_curve_y3}
-                capex_flow = s_curve_map.get(y, 0) * capex_summary.total_capex
-                row['CAPEX'] = -capex_flow
-                row['Debt Drawdown'] = capex_flow * ltc_ratio
-                
-                debt = amortization.schedule.get(y, {'payment': 0, 'closing': 0, 'interest': 0, 'principal': 0})
-                bullet = 0; prep_fee = 0
-                if y == operation.holding_period:
-                    bullet = debt['closing']
-                    prep_fee = bullet * financing.prepayment_fee_pct
-                row['Debt Service'] = -(debt['payment'] + bullet + prep_fee)
-                
-                row['Net Cash Flow'] = row['NOI'] + row['CAPEX'] + row['Debt Service'] + row['Tax'] + row['Debt Drawdown'] + exit_proc
-                row['Equity CF'] = row['Net Cash Flow']
-            data.append(row)
-            
-        self.df = pd.DataFrame(data).set_index('Year')
+        # Passage aux périodes
+        py = self.period_years
+        operating = self.periods >= 1
+        first_of_year = operating & ((self.periods - 1) % m == 0)
+        rent = rent_y[py] / m
+        sales = np.where(first_of_year, sales_y[py], 0.0)
+        opex_fixed = opex_fixed_y[py] / m
+
+        payment = np.zeros(n_periods); closing = np.zeros(n_periods)
+        k = min(len(amortization.periods), last)
+        payment[1:k + 1] = amortization.payment[:k]
+        closing[1:k + 1] = amortization.closing[:k]
+
+        exit_proc = np.zeros(n_periods)
+        bullet = np.zeros(n_periods)
+        if last >= 1:
+            exit_proc[last] = net_exit_val
+            bullet[last] = closing[last]
+        prep_fee = bullet * financing.prepayment_fee_pct
+
+        pm_fee = rent * operation.pm_fee_pct
+        total_opex = opex_fixed + pm_fee
+        noi = (rent + sales) - total_opex
+        taxable = (noi > 0) & (py > general.tax_holiday)
+
+        s_curve = np.zeros(n_periods)
+        shares = _s_curve_shares([construction.s_curve_y1, construction.s_curve_y2, construction.s_curve_y3], m)
+        s_curve[1:len(shares) + 1] = shares[:last]
+        capex_flow = s_curve * capex_summary.total_capex
+
+        nan_after_0 = np.full(n_periods, np.nan)
+        c = self.columns = {}
+        c['Rental Income'] = rent
+        c['Sales Proceeds'] = sales
+        c['Exit Proceeds'] = exit_proc
+        c['Total Revenues'] = rent + sales + exit_proc
+        c['Total OPEX'] = np.where(operating, -total_opex, 0.0)
+        c['NOI'] = noi
+        c['CAPEX'] = np.where(operating, -capex_flow, 0.0)
+        c['Debt Service'] = np.where(operating, -(payment + bullet + prep_fee), 0.0)
+        c['Tax'] = np.where(taxable, -(noi * general.corporate_tax_rate), 0.0)
+        c['Debt Drawdown'] = capex_flow * ltc_ratio
+        c['Upfront Fees'] = nan_after_0.copy()
+        c['Upfront Fees'][0] = -financing.total_upfront_fees
+        c['Net Cash Flow'] = c['NOI'] + c['CAPEX'] + c['Debt Service'] + c['Tax'] + c['Debt Drawdown'] + exit_proc
+        c['Net Cash Flow'][0] = c['Upfront Fees'][0]
+        c['Equity Injection'] = nan_after_0
+        c['Equity Injection'][0] = -(capex_summary.total_capex - financing.debt_principal)
+        c['Equity CF'] = c['Net Cash Flow'].copy()
+        c['Equity CF'][0] = c['Equity Injection'][0]
+
         equity_needed = capex_summary.total_capex - financing.debt_principal
         self.calculate_kpis(general.discount_rate, equity_needed)
 
+    @classmethod
+    def restore(cls, columns, periods_per_year, kpis):
+        """CashflowEngine reconstruit à partir de ses colonnes et KPI (sans recalcul)."""
+        engine = cls.__new__(cls)
+        engine.columns = dict(columns)
+        engine.kpis = dict(kpis)
+        engine._df = None
+        m = engine.periods_per_year = periods_per_year
+        engine.periods = np.arange(len(next(iter(engine.columns.values()))))
+        engine.period_years = np.concatenate([[0], (engine.periods[1:] - 1) // m + 1])
+        return engine
+
+    @property
+    def df(self):
+        if self._df is None:
+            name = 'Year' if self.periods_per_year == 1 else 'Period'
+            self._df = pd.DataFrame(self.columns, index=pd.Index(self.periods, name=name))
+        return self._df
+
+    def annual(self):
+        """Cash flow agrégé par année (égal à `df` en annuel)."""
+        starts = np.flatnonzero(np.r_[True, np.diff(self.period_years) != 0])
+        data = {name: np.add.reduceat(values, starts) for name, values in self.columns.items()}
+        return pd.DataFrame(data, index=pd.Index(self.period_years[starts], name='Year'))
+
     def calculate_kpis(self, discount_rate, equity_needed):
-        flows = self.df['Net Cash Flow'].values
-        final_flows = flows.copy()
-        final_flows[0] = -equity_needed
-        try: irr = npf.irr(final_flows)
-        except: irr = 0
-        npv = npf.npv(discount_rate, final_flows)
-        positive = flows[flows > 0].sum()
-        self.kpis = {'Levered IRR': irr * 100, 'NPV': npv, 'Equity Multiple': positive / equity_needed if equity_needed > 0 else 0, 'Peak Equity': equity_needed}
+        # Hors annuel : actualisation au taux périodique équivalent, TRI annualisé
+        m = self.periods_per_year
+        options = {}
+        if m > 1:
+            discount_rate = (1 + discount_rate) ** (1 / m) - 1
+            options['guess'] = 1.1 ** (1 / m) - 1
+        with span('KPIs', rows=len(self.periods)):
+            kpis = equity_kpis(self.columns['Net Cash Flow'], discount_rate, equity_needed, **options)
+        if m > 1:
+            kpis['Levered IRR'] = ((1 + kpis['Levered IRR'] / 100) ** m - 1) * 100
+        self.kpis = {key: values[0].item() for key, values in kpis.items()}
@@ -0,0 +1,158 @@
+"""
+Solveur d'objectif : montant de dette, yield de sortie ou niveau de loyer qui
+atteint un TRI, un LTC ou un DSCR minimum cible.
+
+Chaque itération passe par SensitivityEngine : seules les étapes qui dépendent
+de la variable résolue sont recalculées (ex. le yield de sortie ne touche que
+le cash flow). Encadrement par balayage vectorisé, puis regula falsi (Illinois).
+"""
+import numpy as np
+
+from sensitivity import SensitivityEngine
+
+# Variable -> bornes de recherche par défaut (None : dépend du scénario de base)
+VARIABLES = {
+    'debt_amount': None,
+    'exit_yield': (1.0, 25.0),
+    'units_rent_multiplier': (0.05, 5.0),
+}
+METRICS = ('Levered IRR', 'NPV', 'LTC', 'Min DSCR')
+
+
+def min_dscr(inputs, amortization, cf):
+    """
+    DSCR minimum = NOI / annuité sur la phase d'amortissement
+    (années au-delà de la franchise, avant la sortie, avec paiement > 0).
+    """
+    noi = cf.columns['NOI']
+    years = np.arange(noi.shape[1])
+    payment = np.broadcast_to(amortization.payment[:, :noi.shape[1]], noi.shape)
+    paying = (payment > 0) & (years > inputs['grace_period'][:, None]) & (years >= 1) & (years <= inputs['holding_period'][:, None])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(paying, noi / payment, np.inf)
+    dscr = ratio.min(axis=1)
+    return np.where(np.isinf(dscr), np.nan, dscr)
+
+
+def metric_values(metric, inputs, capex, amortization, cf):
+    if metric == 'LTC':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.broadcast_to(capex.debt_principal / capex.total_capex * 100, (len(inputs),))
+    if metric == 'Min DSCR':
+        return min_dscr(inputs, amortization, cf)
+    return cf.kpis[metric]
+
+
+class GoalSeekResult:
+    def __init__(self, variable, metric, target, value, achieved, evaluations, converged, message):
+        self.variable = variable
+        self.metric = metric
+        self.target = target
+        self.value = value
+        self.achieved = achieved
+        self.evaluations = evaluations
+        self.converged = converged
+        self.message = message
+
+    def __repr__(self):
+        return (f"GoalSeekResult({self.variable}={self.value:.6g}, {self.metric}={self.achieved:.6g} "
+                f"-> cible {self.target}, {self.evaluations} évaluations, {self.message})")
+
+
+class GoalSeeker:
+    """
+    Résout `variable` pour que `metric` atteigne `target`. La dernière solution
+    de chaque couple (variable, metric) sert de point de départ au solve suivant.
+    """
+    def __init__(self, df_units=None, base_inputs=None, engine: SensitivityEngine = None):
+        self.engine = engine or SensitivityEngine(df_units, base_inputs)
+        self._last = {}
+
+    def evaluate(self, variable, values, metric):
+        stages = self.engine.run({variable: np.atleast_1d(np.asarray(values, dtype=np.float64))})
+        inputs, capex, amortization, _, cf = stages
+        return metric_values(metric, inputs, capex, amortization, cf)
+
+    def default_bounds(self, variable):
+        if variable not in VARIABLES:
+            raise KeyError(f"Variable non résoluble : {variable} (attendues : {sorted(VARIABLES)})")
+        if VARIABLES[variable] is not None:
+            return VARIABLES[variable]
+        _, capex, _, _, _ = self.engine.run({})
+        return (0.0, float(capex.construction_pre_financing[0]))
+
+    def solve(self, variable, metric, target, bounds=None, guess=None, tol=1e-8, max_iter=60, scan_points=17):
+        if metric not in METRICS:
+            raise KeyError(f"Objectif inconnu : {metric} (attendus : {METRICS})")
+        lo, hi = bounds or self.default_bounds(variable)
+        guess = self._last.get((variable, metric)) if guess is None else guess
+        evaluations = 0
+
+        def f(values):
+            nonlocal evaluations
+            evaluations += len(np.atleast_1d(values))
+            return self.evaluate(variable, values, metric) - target
+
+        # Encadrement : d'abord autour du point de départ, sinon balayage des bornes
+        bracket = None
+        if guess is not None and lo < guess < hi:
+            width = (hi - lo) / (scan_points - 1)
+            xs = np.clip([guess - width, guess, guess + width], lo, hi)
+            bracket = _find_bracket(xs, f(xs), guess)
+        if bracket is None:
+            xs = np.linspace(lo, hi, scan_points)
+            fs = f(xs)
+            bracket = _find_bracket(xs, fs, guess)
+            if bracket is None:
+                valid = ~np.isnan(fs)
+                if not valid.any():
+                    return GoalSeekResult(variable, metric, target, np.nan, np.nan, evaluations, False, "objectif non évaluable")
+                best = np.flatnonzero(valid)[np.argmin(np.abs(fs[valid]))]
+                return GoalSeekResult(variable, metric, target, xs[best], fs[best] + target, evaluations, False,
+                                      "cible hors d'atteinte dans les bornes")
+
+        # Regula falsi (Illinois)
+        a, fa, b, fb = bracket
+        x, fx = (a, fa) if abs(fa) < abs(fb) else (b, fb)
+        side = 0
+        for _ in range(max_iter):
+            if fx == 0 or abs(b - a) <= tol * (1 + abs(x)):
+                break
+            x = b - fb * (b - a) / (fb - fa)
+            if not (min(a, b) < x < max(a, b)):
+                x = (a + b) / 2
+            fx = f([x])[0]
+            if np.isnan(fx):
+                x = (a + b) / 2
+                fx = f([x])[0]
+            if np.sign(fx) == np.sign(fb):
+                b, fb = x, fx
+                if side == 1: fa /= 2
+                side = 1
+            else:
+                a, fa = x, fx
+                if side == -1: fb /= 2
+                side = -1
+        converged = bool(fx == 0 or abs(b - a) <= tol * (1 + abs(x)) or abs(fx) <= tol * (1 + abs(target)))
+        self._last[(variable, metric)] = x
+        return GoalSeekResult(variable, metric, target, x, fx + target, evaluations, converged,
+                              "OK" if converged else "non convergé")
+
+
+def _find_bracket(xs, fs, guess=None):
+    """Intervalle [a, b] où f change de signe, le plus proche de `guess`."""
+    xs, fs = np.asarray(xs, dtype=np.float64), np.asarray(fs, dtype=np.float64)
+    exact = np.flatnonzero(fs == 0)
+    if len(exact):
+        return xs[exact[0]], 0.0, xs[exact[0]], 0.0
+    change = np.flatnonzero((np.sign(fs[:-1]) * np.sign(fs[1:]) < 0))
+    if not len(change):
+        return None
+    centre = (xs[change] + xs[change + 1]) / 2
+    i = change[np.argmin(np.abs(centre - guess))] if guess is not None else change[0]
+    return xs[i], fs[i], xs[i + 1], fs[i + 1]
+
+
+def goal_seek(df_units, base_inputs, variable, metric, target, **options) -> GoalSeekResult:
+    """Raccourci : un solve sur un scénario de base."""
+    return GoalSeeker(df_units, base_inputs).solve(variable, metric, target, **options)
@@ -0,0 +1,422 @@
+"""
+Sensibilités analytiques : une évaluation du modèle (pas annuel) renvoie les KPI
+et leur gradient par rapport à chaque entrée continue, par propagation en mode
+direct (nombres duaux) à travers CAPEX, Amortization, Scheduler, CashflowEngine
+et les KPI. Le TRI est dérivé par le théorème des fonctions implicites
+(VAN(TRI) = 0) : dTRI = -(dVAN/dθ) / (dVAN/dr).
+
+Les dérivées sont exprimées par unité de l'entrée (point de %, €/m², €...).
+Les branches du modèle (impôt si NOI > 0, solde de dette < 0.01, signe des flux
+du multiple, CAPEX > 0, bornes 0 / 100 % de l'Occ % décalé) sont relevées : pour
+chaque entrée, `discontinuities` donne l'écart qui ferait changer de branche au
+premier ordre. Les entrées entières (durées, tax_holiday) et booléennes n'ont pas
+de dérivée (DISCRETE_INPUTS).
+
+    g = Gradients(df_units, base_inputs)
+    g.gradient           # entrée x KPI
+    g.linear_tornado()   # tornado au premier ordre, sans réévaluation
+"""
+import numpy as np
+import pandas as pd
+
+from batch import INTEGER_INPUTS, SCENARIO_INPUTS, STAGE_INPUTS, BatchInputs, BatchUnits
+from financial_model import CASHFLOW_COLUMNS
+from instrument import span
+from kpis import IRR_MULTIPLE_SIGN_CHANGES, IRR_OK, solve_irr
+from sensitivity import DEFAULT_TORNADO
+
+DISCRETE_INPUTS = INTEGER_INPUTS + ('tax_holiday', 'use_research_cost')
+# parking_capex : saisi, il remplace le calcul par place (constante du modèle)
+GRADIENT_INPUTS = tuple(k for k in SCENARIO_INPUTS if k not in DISCRETE_INPUTS and k != 'parking_capex')
+GRADIENT_KPIS = ['Levered IRR', 'NPV', 'Equity Multiple', 'Peak Equity']
+
+# Taille cible des tangentes (profils, années, entrées) par bloc du scheduler
+_CHUNK_ELEMENTS = 2_000_000
+
+
+class Dual:
+    """
+    Valeur `v` (tableau) et tangente `d` de forme v.shape + (entrées,) ;
+    d = None pour une constante.
+    """
+    __slots__ = ('v', 'd')
+    __array_priority__ = 1000
+
+    def __init__(self, v, d=None):
+        self.v = np.asarray(v, dtype=np.float64)
+        self.d = d
+
+    @staticmethod
+    def of(x):
+        return x if isinstance(x, Dual) else Dual(x)
+
+    def _tangent(self, shape):
+        return np.broadcast_to(self.d, shape + self.d.shape[-1:])
+
+    def __add__(self, other):
+        other = Dual.of(other)
+        v = self.v + other.v
+        if self.d is None or other.d is None:
+            src = self if other.d is None else other
+            return Dual(v, None if src.d is None else src._tangent(v.shape))
+        return Dual(v, self.d + other.d)
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return Dual(-self.v, None if self.d is None else -self.d)
+
+    def __sub__(self, other):
+        return self + (-Dual.of(other))
+
+    def __rsub__(self, other):
+        return Dual.of(other) + (-self)
+
+    def __mul__(self, other):
+        other = Dual.of(other)
+        v = self.v * other.v
+        d = None
+        if self.d is not None:
+            d = self.d * other.v[..., None]
+        if other.d is not None:
+            d = other.d * self.v[..., None] if d is None else d + other.d * self.v[..., None]
+        return Dual(v, d)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        other = Dual.of(other)
+        v = self.v / other.v
+        d = None
+        if self.d is not None:
+            d = self.d / other.v[..., None]
+        if other.d is not None:
+            term = other.d * (v / other.v)[..., None]
+            d = -term if d is None else d - term
+        return Dual(v, d)
+
+    def __rtruediv__(self, other):
+        return Dual.of(other) / self
+
+    def __pow__(self, exponent):
+        # Exposant constant : d(x^e) = e x^(e-1) dx
+        e = np.asarray(exponent, dtype=np.float64)
+        v = self.v ** e
+        if self.d is None:
+            return Dual(v)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = np.where(e == 0, 0.0, e * self.v ** (e - 1))
+        return Dual(v, self.d * slope[..., None])
+
+    def __getitem__(self, index):
+        return Dual(self.v[index], None if self.d is None else self.d[index])
+
+    def sum(self, axis=0):
+        return Dual(self.v.sum(axis=axis), None if self.d is None else self.d.sum(axis=axis))
+
+    @staticmethod
+    def where(condition, a, b):
+        a, b = Dual.of(a), Dual.of(b)
+        condition = np.asarray(condition)
+        v = np.where(condition, a.v, b.v)
+        if a.d is None and b.d is None:
+            return Dual(v)
+        return Dual(v, np.where(condition[..., None], 0.0 if a.d is None else a.d, 0.0 if b.d is None else b.d))
+
+    @staticmethod
+    def stack(items, n_inputs):
+        items = [Dual.of(x) for x in items]
+        d = [np.zeros(x.v.shape + (n_inputs,)) if x.d is None else x._tangent(x.v.shape) for x in items]
+        return Dual(np.stack([x.v for x in items]), np.stack(d))
+
+
+class Gradients:
+    """
+    KPI et gradients d'un scénario (dict plat d'entrées, comme batch.BatchInputs).
+    `columns[name]` : Dual (années 0..holding_period) des lignes du cash flow.
+    """
+    def __init__(self, df_units, inputs=None):
+        inputs = dict(inputs or {})
+        batch_inputs = BatchInputs([{}], inputs)
+        units = df_units if isinstance(df_units, BatchUnits) else BatchUnits(df_units, batch_inputs.df_asset_costs)
+        self.inputs = list(GRADIENT_INPUTS)
+        self.values = {k: batch_inputs[k][0].item() for k in SCENARIO_INPUTS}
+        k = self.n_inputs = len(self.inputs)
+        seeds = np.eye(k)
+        x = {key: Dual(self.values[key], seeds[i]) for i, key in enumerate(self.inputs)}
+        self._branches = []
+        with span('Gradients', rows=k):
+            capex = self._capex(x, units)
+            payment, closing = self._amortization(x)
+            rent, area, sale = self._scheduler(x, units)
+            self._cashflow(x, capex, payment, closing, rent, area, sale)
+            self._kpis(x)
+        self._report()
+
+    def _branch(self, kind, year, margin):
+        """Condition `margin > 0` (ou son contraire) du modèle : écart d'entrée jusqu'au changement de signe."""
+        self._branches.append((kind, year, margin))
+
+    # --- [Feuille Construction], [Feuille Parking], [Feuille CAPEX_Summary] ---
+    def _capex(self, x, units):
+        eff = x['building_efficiency'] / 100.0
+        efficiency_factor = 1 + (100 - (eff * 100)) / 100
+        gfa_calculated = efficiency_factor * units.total_units_gla
+        if self.values['use_research_cost'] and units.has_asset_costs:
+            total_hard_costs = Dual(0.0)
+            if eff.v != 0:
+                for gla, cost_per_m2 in units.asset_cost_gla:
+                    total_hard_costs = total_hard_costs + (gla / eff) * float(cost_per_m2)
+        else:
+            total_hard_costs = (x['structure_cost'] + x['finishing_cost'] + x['utilities_cost']) * gfa_calculated
+        soft_pct = x['architect_fees_pct'] + x['development_fees_pct'] + x['marketing_fees_pct']
+        subtotal = total_hard_costs + (total_hard_costs * (soft_pct / 100) + x['permit_fees'])
+        capex_construction_only = subtotal + subtotal * (x['contingency_pct'] / 100)
+        parking = self.values['parking_capex']
+        parking_capex = x['cost_per_space'] * units.parking_spaces if np.isnan(parking) else Dual(parking)
+        construction = capex_construction_only + x['amenities_total_capex'] + parking_capex
+        upfront_fees = x['debt_amount'] * (x['arrangement_fee_pct'] / 100.0) + x['upfront_fees']
+        return {
+            'upfront_fees': upfront_fees, 'total_capex': construction + upfront_fees,
+            's_curve': [x['s_curve_y1'] / 100.0, x['s_curve_y2'] / 100.0, x['s_curve_y3'] / 100.0],
+        }
+
+    # --- [Feuille Amortization] ---
+    def _amortization(self, x):
+        hold = int(self.values['holding_period'])
+        term, grace = int(self.values['loan_term']), int(self.values['grace_period'])
+        balance = x['debt_amount']
+        rate = x['interest_rate'] / 100.0
+        duration = term - grace
+        if duration <= 0:
+            annuity = Dual(0.0)
+        elif rate.v == 0:
+            annuity = balance / duration
+        else:
+            growth = (1 + rate) ** duration
+            annuity = balance * rate * growth / (growth - 1)
+
+        payment, closing = [Dual(0.0)], [Dual(0.0)]
+        current = balance
+        for year in range(1, hold + 1):
+            if year >= term + 5:
+                payment.append(Dual(0.0)); closing.append(Dual(0.0))
+                continue
+            opening = current
+            if year <= grace:
+                pay, principal = opening * rate, Dual(0.0)
+            elif year <= term:
+                pay = annuity
+                principal = annuity - opening * rate
+            else:
+                pay, principal = Dual(0.0), Dual(0.0)
+            current = opening - principal
+            if year > grace and year <= term:
+                self._branch('Dette : solde < 0.01', year, current - 0.01)
+            if current.v < 0.01:
+                current = Dual(0.0)
+            payment.append(pay)
+            closing.append(current)
+        return Dual.stack(payment, self.n_inputs), Dual.stack(closing, self.n_inputs)
+
+    # --- [Feuille RentSchedule] & [Feuille SaleSchedule], par blocs de profils ---
+    def _scheduler(self, x, units):
+        hold = int(self.values['holding_period'])
+        years = np.arange(1, hold + 1)
+        p = units.profiles
+        # Tangentes restreintes aux seules entrées du scheduler, replacées ensuite parmi toutes les entrées
+        local = [k for k in STAGE_INPUTS['scheduler'] if k in self.inputs]
+        seeds = np.eye(len(local))
+        x = {k: Dual(self.values[k], seeds[i]) for i, k in enumerate(local)}
+        rent_weight = x['units_rent_multiplier'] * units.rent_weight
+        occ_default, occ_shift = x['occupancy_rate'] / 100.0, x['units_occ_shift'] / 100.0
+        growth_default, growth_shift = x['rent_growth'] / 100.0, x['units_rent_growth_shift'] / 100.0
+        price_default = x['inflation'] / 100.0
+        rent = area = sale = Dual(np.zeros(hold))
+        columns = [self.inputs.index(k) for k in local]
+
+        chunk = max(1, _CHUNK_ELEMENTS // max(1, hold * len(local)))
+        for start in range(0, units.n_profiles, chunk):
+            b = slice(start, start + chunk)
+            # 'Occ %' décalé borné à [0, 100] %, comme BatchScheduler (dérivée nulle hors bornes)
+            shifted = occ_shift + p['occ'][b]
+            given = np.flatnonzero(p['occ_given'][b])
+            if len(given):
+                self._occupancy_bounds(shifted[given], p['start'][b][given], columns)
+            if occ_shift.v != 0:
+                shifted = Dual.where(shifted.v < 0.0, 0.0, Dual.where(shifted.v > 1.0, 1.0, shifted))
+            occ = Dual.where(p['occ_given'][b], shifted, occ_default + np.zeros(len(p['occ'][b])))
+            growth = Dual.where(p['rent_growth_given'][b], growth_shift + p['rent_growth'][b],
+                                growth_default + np.zeros(len(p['rent_growth'][b])))
+            price_growth = Dual.where(p['price_growth_given'][b], Dual(p['price_growth'][b]),
+                                      price_default + np.zeros(len(p['price_growth'][b])))
+
+            receives_rent = p['is_rent'][b][:, None] & (years[None, :] >= p['start'][b][:, None]) & (
+                p['is_exit'][b][:, None] | (p['sale'][b][:, None] > years[None, :]))
+            occupied = (rent_weight[b] * occ)[:, None] * receives_rent
+            rent = rent + (occupied * ((1 + growth)[:, None] ** years[None, :])).sum(axis=0)
+            area = area + ((occ * units.area_weight[b])[:, None] * receives_rent).sum(axis=0)
+
+            sale_year = p['sale'][b]
+            sells = p['is_sale'][b] & ~p['is_exit'][b] & (sale_year >= 1) & (sale_year <= hold)
+            value = ((1 + price_growth) ** np.where(sells, sale_year, 0)) * units.sale_weight[b]
+            slot = sells[:, None] & (years[None, :] == sale_year[:, None])
+            sale = sale + (value[:, None] * slot).sum(axis=0)
+
+        def embed(values):
+            d = np.zeros((hold + 1, self.n_inputs))
+            if values.d is not None:
+                d[1:, columns] = values._tangent(values.v.shape)
+            return Dual(np.concatenate([[0.0], values.v]), d)
+        return embed(rent), embed(area), embed(sale)
+
+    def _occupancy_bounds(self, shifted, years, columns):
+        """Bornes 0 / 100 % de l'occupation décalée : marge la plus proche de chaque borne, tangente replacée parmi les entrées."""
+        for kind, margin in (('Occ % : borne 0 %', shifted), ('Occ % : borne 100 %', 1.0 - shifted)):
+            i = np.argmin(np.abs(margin.v))
+            d = np.zeros(self.n_inputs)
+            if margin.d is not None:
+                d[columns] = margin._tangent(margin.v.shape)[i]
+            self._branch(kind, int(years[i]), Dual(margin.v[i], d))
+
+    # --- [Feuille Cashflow] ---
+    def _cashflow(self, x, capex, payment, closing, rent, area, sale):
+        hold = int(self.values['holding_period'])
+        y = np.arange(hold + 1)
+        operating = y >= 1
+        at_exit = y == hold
+        inflation = x['inflation'] / 100.0
+        pm_fee_pct = x['pm_fee_pct'] / 100.0
+
+        opex_fixed_n = area[hold] * x['opex_per_m2'] * ((1 + inflation) ** (hold - 1))
+        noi_n = rent[hold] - (opex_fixed_n + rent[hold] * pm_fee_pct)
+        gross_exit_val = noi_n * (1 + x['rent_growth'] / 100.0) / (x['exit_yield'] / 100.0)
+        net_exit_val = gross_exit_val * (1 - x['transac_fees_exit'] / 100.0)
+
+        total_capex = capex['total_capex']
+        debt_principal = x['debt_amount']
+        self._branch('CAPEX > 0', 0, total_capex)
+        ltc_ratio = debt_principal / total_capex if total_capex.v > 0 else Dual(0.0)
+
+        exit_proc = Dual.where(at_exit, net_exit_val + np.zeros(hold + 1), 0.0)
+        opex_fixed = area * x['opex_per_m2'] * ((1 + inflation) ** (y - 1))
+        total_opex = opex_fixed + rent * pm_fee_pct
+        noi = (rent + sale) - total_opex
+        eligible = operating & (y > self.values['tax_holiday'])
+        for year in np.flatnonzero(eligible):
+            self._branch('Impôt : NOI > 0', int(year), noi[year])
+        taxable = eligible & (noi.v > 0)
+        tax = Dual.where(taxable, noi * (x['corporate_tax_rate'] / 100.0), 0.0)
+
+        shares = [Dual(0.0)] + capex['s_curve'][:min(3, hold)] + [Dual(0.0)] * max(0, hold - 3)
+        capex_flow = Dual.stack(shares, self.n_inputs) * total_capex
+        drawdown = capex_flow * ltc_ratio
+        bullet = Dual.where(at_exit, closing, 0.0)
+        debt_service = -(Dual.where(operating, payment, 0.0) + bullet + bullet * (x['prepayment_fee_pct'] / 100.0))
+
+        upfront = Dual.where(y == 0, -capex['upfront_fees'] + np.zeros(hold + 1), 0.0)
+        equity_needed = total_capex - debt_principal
+        equity_injection = Dual.where(y == 0, -equity_needed + np.zeros(hold + 1), 0.0)
+        net_cash_flow = Dual.where(y == 0, upfront, noi - capex_flow + debt_service - tax + drawdown + exit_proc)
+        self.columns = {
+            'Rental Income': rent, 'Sales Proceeds': sale, 'Exit Proceeds': exit_proc,
+            'Total Revenues': rent + sale + exit_proc, 'Total OPEX': -total_opex, 'NOI': noi,
+            'CAPEX': -capex_flow, 'Debt Service': debt_service, 'Tax': -tax, 'Debt Drawdown': drawdown,
+            'Upfront Fees': upfront, 'Net Cash Flow': net_cash_flow, 'Equity Injection': equity_injection,
+            'Equity CF': Dual.where(y == 0, equity_injection, net_cash_flow),
+        }
+        self.equity_needed = equity_needed
+
+    # --- KPI ---
+    def _kpis(self, x):
+        ncf = self.columns['Net Cash Flow']
+        t = np.arange(len(ncf.v))
+        flows = Dual.where(t == 0, -self.equity_needed + np.zeros(len(t)), ncf)
+
+        irr, status = solve_irr(flows.v[None, :])
+        irr, status = irr[0], int(status[0])
+        d_irr = np.full(self.n_inputs, np.nan)
+        if np.isfinite(irr):
+            v = 1 / (1 + irr)
+            dnpv_dtheta = flows._tangent(flows.v.shape).T @ (v ** t)
+            dnpv_dr = -(flows.v * t) @ (v ** (t + 1))
+            if dnpv_dr != 0:
+                d_irr = -dnpv_dtheta / dnpv_dr * 100
+        self.irr_status = status
+
+        discount = 1 / (1 + x['discount_rate'] / 100.0)
+        npv = (flows * discount ** t).sum()
+
+        for year in t[1:]:
+            self._branch('Multiple : signe du flux', int(year), ncf[year])
+        positive = Dual.where(ncf.v > 0, ncf, 0.0).sum()
+        equity_multiple = positive / self.equity_needed if self.equity_needed.v > 0 else Dual(0.0)
+
+        values = {'Levered IRR': float(irr * 100), 'NPV': npv.v.item(), 'Equity Multiple': equity_multiple.v.item(),
+                  'Peak Equity': self.equity_needed.v.item()}
+        tangents = {'Levered IRR': d_irr, 'NPV': _full(npv, self.n_inputs),
+                    'Equity Multiple': _full(equity_multiple, self.n_inputs),
+                    'Peak Equity': _full(self.equity_needed, self.n_inputs)}
+        self.kpis = {**values, 'IRR Status': status}
+        self.gradient = pd.DataFrame(tangents, index=pd.Index(self.inputs, name='Input'))
+        self.gradient.insert(0, 'Value', [self.values[k] for k in self.inputs])
+
+    def _report(self):
+        rows = []
+        for kind, year, margin in self._branches:
+            tangent = _full(margin, self.n_inputs)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                distance = np.where(tangent != 0, -margin.v.item() / tangent, np.inf)
+            for i in np.flatnonzero(np.isfinite(distance)):
+                rows.append((kind, year, self.inputs[i], distance[i]))
+        df = pd.DataFrame(rows, columns=['Kind', 'Year', 'Input', 'Distance'])
+        # Plus proche changement de branche par (type, entrée)
+        df = df.loc[df['Distance'].abs().groupby([df['Kind'], df['Input']]).idxmin()] if len(df) else df
+        self.discontinuities = df.sort_values(['Input', 'Kind']).reset_index(drop=True)
+        nearest = self.discontinuities.loc[self.discontinuities['Distance'].abs().groupby(self.discontinuities['Input']).idxmin()] \
+            if len(self.discontinuities) else self.discontinuities
+        nearest = nearest.set_index('Input')
+        self.gradient['Switch'] = [f"{nearest.at[k, 'Kind']} (année {nearest.at[k, 'Year']})" if k in nearest.index else ''
+                                   for k in self.inputs]
+        self.gradient['Switch Distance'] = [nearest.at[k, 'Distance'] if k in nearest.index else np.inf for k in self.inputs]
+        self.flags = []
+        if self.irr_status == IRR_MULTIPLE_SIGN_CHANGES:
+            self.flags.append("TRI : plusieurs changements de signe, gradient de la racine retenue")
+        elif self.irr_status != IRR_OK:
+            self.flags.append("TRI indéfini : gradient NaN")
+
+    def flow_gradient(self, name):
+        """DataFrame (années x entrées) des dérivées d'une ligne du cash flow."""
+        if name not in CASHFLOW_COLUMNS:
+            raise KeyError(f"Colonne inconnue : {name}")
+        column = self.columns[name]
+        return pd.DataFrame(column._tangent(column.v.shape) if column.d is not None else np.zeros((len(column.v), self.n_inputs)),
+                            index=pd.Index(np.arange(len(column.v)), name='Year'), columns=self.inputs)
+
+    def linear_tornado(self, ranges=None, metric='Levered IRR'):
+        """
+        Tornado au premier ordre (colonnes de SensitivityEngine.tornado) ; `Crosses Switch`
+        signale un écart qui franchit un changement de branche (approximation moins fiable).
+        """
+        ranges = DEFAULT_TORNADO if ranges is None else ranges
+        keys = [k for k in ranges if k in self.gradient.index]
+        slope = self.gradient.loc[keys, metric].to_numpy()
+        low = np.array([ranges[k][0] for k in keys], dtype=np.float64)
+        high = np.array([ranges[k][1] for k in keys], dtype=np.float64)
+        base = self.kpis[metric]
+        switch = self.gradient.loc[keys, 'Switch Distance'].to_numpy()
+        crosses = [((s < 0) & (lo <= s)) | ((s > 0) & (s <= hi)) for s, lo, hi in zip(switch, low, high)]
+        df = pd.DataFrame({
+            'Input': keys, 'Low': [self.values[k] + r for k, r in zip(keys, low)],
+            'High': [self.values[k] + r for k, r in zip(keys, high)],
+            'KPI Low': base + slope * low, 'KPI High': base + slope * high,
+        })
+        df['Base'] = base
+        df['Swing'] = (df['KPI High'] - df['KPI Low']).abs()
+        df['Crosses Switch'] = crosses
+        return df.sort_values('Swing', ascending=False).reset_index(drop=True)
+
+
+def _full(value, n_inputs):
+    """Tangente d'un scalaire (zéros pour une constante)."""
+    return np.zeros(n_inputs) if value.d is None else np.broadcast_to(value.d, (n_inputs,)).copy()
@@ -0,0 +1,261 @@
+"""
+Import de [Feuille Units] et des coûts par Asset Class depuis Excel (.xlsx, lu
+en read-only ligne à ligne), CSV ou Parquet, par blocs de `chunk_rows` lignes.
+
+Les en-têtes sont rapprochés des colonnes du modèle par alias (casse, accents,
+ponctuation et unités ignorés : "Surface GLA (m2)", "surface_gla" ou "GLA" donnent
+'Surface (GLA m²)'). Le résultat est mis en cache sur disque, une colonne NumPy
+(.npy) par colonne, rouvert en mémoire mappée : la clé est l'empreinte du fichier
+source, réimporter le même classeur ne relit pas le fichier.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+UNITS_COLUMNS = [
+    'Code', 'AssetClass', 'Surface (GLA m²)', 'Rent (€/m²/mo)', 'Price €/m²', 'Start Year', 'Sale Year', 'Mode',
+    'Parking per unit', 'Parking ratio (per 100 m²)', 'Occ %', 'Rent growth %', 'Asset Value Growth (%/yr)',
+]
+ASSET_COST_COLUMNS = ['Asset Class', 'Cost €/m²']
+
+# Colonne du modèle -> autres en-têtes acceptés (comparés après normalize_header)
+UNITS_ALIASES = {
+    'Code': ['unit', 'unit code', 'lot', 'typologie', 'type'],
+    'AssetClass': ['asset class', 'asset', 'classe', 'classe d actif', 'usage'],
+    'Surface (GLA m²)': ['surface', 'gla', 'surface gla', 'gla m2', 'area', 'surface m2', 'sla'],
+    'Rent (€/m²/mo)': ['rent', 'loyer', 'rent eur m2 mo', 'rent m2 month', 'loyer m2 mois', 'loyer eur m2 mois'],
+    'Price €/m²': ['price', 'prix', 'prix m2', 'price m2', 'sale price', 'prix de vente m2'],
+    'Start Year': ['start', 'debut', 'annee debut', 'annee de mise en service', 'delivery year'],
+    'Sale Year': ['sale', 'vente', 'annee vente', 'annee de vente', 'exit year'],
+    'Mode': ['strategy', 'strategie', 'rent sale', 'exploitation'],
+    'Parking per unit': ['parking', 'places', 'places par unite', 'parking spaces'],
+    'Parking ratio (per 100 m²)': ['parking ratio', 'ratio parking', 'places pour 100 m2'],
+    'Occ %': ['occ', 'occupancy', 'occupation', 'taux d occupation'],
+    'Rent growth %': ['rent growth', 'indexation', 'indexation loyer', 'croissance loyer'],
+    'Asset Value Growth (%/yr)': ['asset value growth', 'value growth', 'price growth', 'croissance valeur'],
+}
+ASSET_COST_ALIASES = {
+    'Asset Class': ['assetclass', 'asset', 'classe', 'usage'],
+    'Cost €/m²': ['cost', 'cout', 'cout eur m2', 'cout m2', 'cost m2', 'hard cost', 'cout travaux eur m2'],
+}
+KINDS = {'units': (UNITS_COLUMNS, UNITS_ALIASES), 'asset_costs': (ASSET_COST_COLUMNS, ASSET_COST_ALIASES)}
+
+_CACHE_VERSION = 1
+_HASH_BLOCK = 1 << 20
+
+
+def normalize_header(name):
+    """'Rent (€/m²/mo)' -> 'rent eur m2 mo' : minuscules, sans accents ni ponctuation."""
+    text = str(name).replace('²', '2').replace('€', ' eur ').replace('%', ' ').replace('’', ' ')
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+    return ' '.join(re.findall(r'[a-z0-9]+', text.lower()))
+
+
+def resolve_columns(headers, kind='units', aliases=None):
+    """
+    En-têtes source -> colonnes du modèle. `aliases` complète les alias par défaut
+    ({colonne du modèle: [en-têtes]}). Les en-têtes non reconnus sont conservés tels quels.
+    """
+    expected, defaults = KINDS[kind]
+    lookup = {}
+    for column in expected:
+        for alias in [column] + defaults.get(column, []) + list((aliases or {}).get(column, [])):
+            lookup.setdefault(normalize_header(alias), column)
+    mapping = {}
+    for header in headers:
+        column = lookup.get(normalize_header(header), header)
+        if column not in mapping.values():
+            mapping[header] = column
+    return mapping
+
+
+class ImportedTable:
+    """
+    Résultat d'un import : `df` (colonnes du modèle), `mapping` (en-tête source ->
+    colonne), `missing` (colonnes attendues absentes), `from_cache`, `key`.
+    """
+    def __init__(self, df, mapping, missing, from_cache, key):
+        self.df = df
+        self.mapping = mapping
+        self.missing = missing
+        self.from_cache = from_cache
+        self.key = key
+
+
+# --- lecture par blocs ---
+def _iter_excel(source, sheet, chunk_rows):
+    try:
+        import openpyxl
+    except ImportError as exc:
+        raise RuntimeError("L'import Excel nécessite openpyxl") from exc
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.active
+        rows = worksheet.iter_rows(values_only=True)
+        header = None
+        for row in rows:
+            if any(v is not None and str(v).strip() for v in row):
+                header = [str(v).strip() if v is not None else f'Unnamed: {i}' for i, v in enumerate(row)]
+                break
+        if header is None:
+            return
+        block = []
+        for row in rows:
+            if not any(v is not None and (not isinstance(v, str) or v.strip()) for v in row):
+                continue
+            block.append(row[:len(header)])
+            if len(block) == chunk_rows:
+                yield pd.DataFrame(block, columns=header)
+                block = []
+        if block:
+            yield pd.DataFrame(block, columns=header)
+    finally:
+        workbook.close()
+
+
+def _iter_parquet(source, chunk_rows):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise RuntimeError("L'import Parquet nécessite pyarrow") from exc
+    for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows):
+        yield batch.to_pandas()
+
+
+def iter_chunks(source, name, sheet=None, chunk_rows=10_000):
+    """Blocs DataFrame de `chunk_rows` lignes, selon l'extension de `name`."""
+    suffix = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+    if suffix in ('xlsx', 'xlsm'):
+        return _iter_excel(source, sheet, chunk_rows)
+    if suffix == 'csv':
+        return pd.read_csv(source, chunksize=chunk_rows)
+    if suffix in ('parquet', 'pq'):
+        return _iter_parquet(source, chunk_rows)
+    raise ValueError(f"Format non supporté : {name} (attendus : .xlsx, .csv, .parquet)")
+
+
+# --- colonnes compactes ---
+def _compact(values):
+    """Colonne d'un bloc -> tableau float64 si entièrement numérique (ou vide), sinon objet."""
+    numeric = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    blank = pd.isna(pd.Series(values, dtype=object)).to_numpy()
+    return numeric if not (np.isnan(numeric) & ~blank).any() else np.asarray(values, dtype=object)
+
+
+def _finalize(blocks):
+    if all(b.dtype == np.float64 for b in blocks):
+        values = np.concatenate(blocks) if blocks else np.zeros(0)
+        whole = values[~np.isnan(values)]
+        return values.astype(np.int64) if len(whole) == len(values) and len(values) and (whole == np.trunc(whole)).all() else values
+    # Colonne mixte ('Exit' et années) : texte, vide = ''
+    parts = [np.where(np.isnan(b), '', np.char.mod('%.15g', np.nan_to_num(b))) if b.dtype == np.float64
+             else np.array(['' if pd.isna(v) else str(v) for v in b], dtype=object) for b in blocks]
+    return np.concatenate(parts).astype(str)
+
+
+def _read(source, name, kind, sheet, aliases, chunk_rows):
+    columns, mapping = {}, None
+    for chunk in iter_chunks(source, name, sheet, chunk_rows):
+        if mapping is None:
+            mapping = resolve_columns(chunk.columns, kind, aliases)
+        for header, column in mapping.items():
+            columns.setdefault(column, []).append(_compact(chunk[header].to_numpy(dtype=object)))
+    mapping = mapping or {}
+    return {column: _finalize(blocks) for column, blocks in columns.items()}, mapping
+
+
+def _to_frame(arrays):
+    data = {}
+    for column, values in arrays.items():
+        if values.dtype.kind == 'U':
+            values = np.where(values == '', None, values.astype(object))
+        data[column] = values
+    return pd.DataFrame(data)
+
+
+# --- cache disque ---
+def default_cache_dir():
+    return os.environ.get('ESTATEOS_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'estateos'))
+
+
+def file_key(source, kind, sheet, aliases):
+    """Empreinte du contenu source et des options d'import."""
+    digest = hashlib.blake2b(digest_size=20)
+    if isinstance(source, (bytes, bytearray)):
+        digest.update(source)
+    else:
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK), b''):
+                digest.update(block)
+    options = json.dumps([_CACHE_VERSION, kind, sheet, aliases or {}], sort_keys=True, ensure_ascii=False)
+    digest.update(options.encode())
+    return digest.hexdigest()
+
+
+def _load_cached(path):
+    with open(os.path.join(path, 'columns.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    arrays = {column: np.load(os.path.join(path, f'{i}.npy'), mmap_mode='r') for i, column in enumerate(meta['columns'])}
+    return arrays, meta['mapping']
+
+
+def _store(path, arrays, mapping):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    staging = tempfile.mkdtemp(dir=os.path.dirname(path))
+    try:
+        for i, values in enumerate(arrays.values()):
+            np.save(os.path.join(staging, f'{i}.npy'), values, allow_pickle=False)
+        with open(os.path.join(staging, 'columns.json'), 'w', encoding='utf-8') as f:
+            json.dump({'columns': list(arrays), 'mapping': mapping}, f, ensure_ascii=False)
+        os.replace(staging, path)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def import_table(source, kind='units', name=None, sheet=None, aliases=None, chunk_rows=10_000,
+                 cache_dir=None, use_cache=True) -> ImportedTable:
+    """
+    Importe un fichier (chemin, ou objet avec .name / .getvalue() comme un
+    UploadedFile Streamlit) vers les colonnes du modèle. `kind` : 'units' ou 'asset_costs'.
+    """
+    if kind not in KINDS:
+        raise KeyError(f"Type d'import inconnu : {kind} (attendus : {list(KINDS)})")
+    if hasattr(source, 'getvalue') or hasattr(source, 'read'):
+        name = name or getattr(source, 'name', '')
+        content = source.getvalue() if hasattr(source, 'getvalue') else source.read()
+        key_source, reader = content, lambda: io.BytesIO(content)
+    else:
+        name = name or str(source)
+        key_source, reader = source, lambda: source
+    expected = KINDS[kind][0]
+
+    key = file_key(key_source, kind, sheet, aliases)
+    path = os.path.join(cache_dir or default_cache_dir(), 'imports', key)
+    if use_cache and os.path.exists(os.path.join(path, 'columns.json')):
+        arrays, mapping = _load_cached(path)
+        from_cache = True
+    else:
+        arrays, mapping = _read(reader(), name, kind, sheet, aliases, chunk_rows)
+        if use_cache:
+            _store(path, arrays, mapping)
+        from_cache = False
+    ordered = {c: arrays[c] for c in expected if c in arrays}
+    ordered.update({c: v for c, v in arrays.items() if c not in ordered})
+    missing = [c for c in expected if c not in arrays]
+    return ImportedTable(_to_frame(ordered), mapping, missing, from_cache, key)
+
+
+def import_units(source, **options) -> ImportedTable:
+    return import_table(source, 'units', **options)
+
+
+def import_asset_costs(source, **options) -> ImportedTable:
+    return import_table(source, 'asset_costs', **options)
@@ -0,0 +1,159 @@
+"""
+Instrumentation des étapes du modèle : temps écoulé, temps CPU, octets alloués
+(sous tracemalloc), lignes traitées et état du cache, publiés à des abonnés.
+
+Désactivée par défaut : sans abonné, `span()` renvoie un contexte vide partagé
+(un test de liste, pas d'horloge lue). Un abonné reçoit un dict par étape :
+
+    {'stage', 'wall_s', 'self_s', 'cpu_s', 'alloc_bytes', 'rows', 'cache', 'depth', 'thread', ...}
+
+`self_s` exclut le temps des étapes imbriquées (mesurées dans le même thread).
+
+    with instrument.recording() as rec:
+        graph.run(...)['CashflowEngine']
+    rec.frame()
+"""
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+_subscribers = []
+_memory_subscribers = 0
+_started_tracing = False
+_local = threading.local()
+_NULL = nullcontext()
+
+
+def subscribe(callback, memory=False):
+    """Abonne `callback(event)` ; `memory` active tracemalloc (coût notable) tant qu'il est abonné."""
+    global _memory_subscribers, _started_tracing
+    _subscribers.append((callback, memory))
+    if memory:
+        _memory_subscribers += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+    return callback
+
+
+def unsubscribe(callback):
+    global _memory_subscribers, _started_tracing
+    for i, (cb, memory) in enumerate(_subscribers):
+        if cb is callback:
+            del _subscribers[i]
+            if memory:
+                _memory_subscribers -= 1
+                if not _memory_subscribers and _started_tracing:
+                    tracemalloc.stop()
+                    _started_tracing = False
+            return
+
+
+def enabled():
+    return bool(_subscribers)
+
+
+def span(stage, rows=None, **fields):
+    """Contexte mesurant une étape ; `rows` et `fields` sont recopiés dans l'événement."""
+    if not _subscribers:
+        return _NULL
+    return _Span(stage, rows, fields)
+
+
+def emit(stage, **fields):
+    """Événement sans mesure (ex. étape relue du cache)."""
+    if _subscribers:
+        _publish({'stage': stage, 'wall_s': 0.0, 'self_s': 0.0, 'cpu_s': 0.0, 'alloc_bytes': None, 'rows': None,
+                  'cache': None, 'depth': len(_stack()), 'thread': threading.get_ident(), **fields})
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _publish(event):
+    for callback, _ in list(_subscribers):
+        callback(event)
+
+
+class _Span:
+    def __init__(self, stage, rows, fields):
+        self.event = {'stage': stage, 'rows': rows, 'cache': None, **fields}
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+        self.memory = tracemalloc.is_tracing()
+        if self.memory:
+            # Pic du parent relevé avant remise à zéro du pic courant
+            current, peak = tracemalloc.get_traced_memory()
+            if self.parent is not None and self.parent.memory:
+                self.parent.peak = max(self.parent.peak, peak)
+            tracemalloc.reset_peak()
+            self.start_memory = self.peak = current
+        self.children = 0.0
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+        return self.event
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        alloc = None
+        if self.memory and tracemalloc.is_tracing():
+            peak = max(tracemalloc.get_traced_memory()[1], self.peak)
+            alloc = peak - self.start_memory
+            if self.parent is not None and self.parent.memory:
+                self.parent.peak = max(self.parent.peak, peak)
+        stack = _stack()
+        stack.pop()
+        if self.parent is not None:
+            self.parent.children += wall
+        self.event.update(wall_s=wall, self_s=wall - self.children, cpu_s=cpu, alloc_bytes=alloc, depth=len(stack),
+                          thread=threading.get_ident())
+        _publish(self.event)
+        return False
+
+
+class Recorder:
+    """Abonné qui garde les événements (du seul thread appelant par défaut)."""
+    def __init__(self, all_threads=False):
+        self.thread = None if all_threads else threading.get_ident()
+        self.events = []
+
+    def __call__(self, event):
+        if self.thread is None or event['thread'] == self.thread:
+            self.events.append(event)
+
+    def frame(self):
+        import pandas as pd
+        columns = ['stage', 'cache', 'wall_s', 'self_s', 'cpu_s', 'alloc_bytes', 'rows', 'depth']
+        df = pd.DataFrame(self.events)
+        return df.reindex(columns=columns + [c for c in df.columns if c not in columns and c != 'thread'])
+
+
+@contextmanager
+def recording(memory=False, all_threads=False):
+    """Enregistre les événements le temps du bloc."""
+    recorder = Recorder(all_threads)
+    subscribe(recorder, memory)
+    try:
+        yield recorder
+    finally:
+        unsubscribe(recorder)
+
+
+def log_subscriber(logger=None, level=logging.INFO):
+    """Abonné écrivant chaque événement en JSON sur un logger ('estateos.perf' par défaut)."""
+    logger = logger or logging.getLogger('estateos.perf')
+
+    def callback(event):
+        logger.log(level, json.dumps({k: v for k, v in event.items() if k != 'thread'}, default=str))
+    return callback
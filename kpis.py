@@ -0,0 +1,169 @@
+"""
+KPI equity vectorisés : TRI par Newton sécurisé (encadrement + pas de Newton),
+VAN et multiple en une passe sur un tableau (N, années) de flux.
+"""
+import numpy as np
+
+IRR_OK = 0
+IRR_MULTIPLE_SIGN_CHANGES = 1   # racine trouvée, mais d'autres TRI peuvent exister
+IRR_NO_SIGN_CHANGE = 2          # TRI = NaN
+IRR_NO_BRACKET = 3              # TRI = NaN : aucun changement de signe de la VAN trouvé
+IRR_NOT_CONVERGED = 4           # TRI = NaN
+IRR_STATUS_LABELS = {
+    IRR_OK: "OK",
+    IRR_MULTIPLE_SIGN_CHANGES: "Plusieurs changements de signe : TRI non unique",
+    IRR_NO_SIGN_CHANGE: "Flux sans changement de signe : pas de TRI",
+    IRR_NO_BRACKET: "Aucune racine encadrée : pas de TRI",
+    IRR_NOT_CONVERGED: "TRI non convergé",
+}
+
+# Taux testés pour encadrer une racine quand plusieurs TRI sont possibles
+_RATE_GRID = np.array([
+    -0.99, -0.9, -0.75, -0.5, -0.3, -0.2, -0.1, -0.05, 0.0, 0.025, 0.05, 0.075, 0.1, 0.125,
+    0.15, 0.2, 0.25, 0.3, 0.4, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 100.0,
+])
+# Au-delà, les racines voisines sont résolues à partir des scénarios pilotes
+_WARM_START_STRIDE = 16
+
+
+# Au-delà (pas mensuels / trimestriels), P(x) est évalué par puissances plutôt que par Horner
+_HORNER_MAX_TERMS = 64
+
+
+def _horner(coefs, x):
+    """P(x) = sum c_t x^t et P'(x), lignes indépendantes."""
+    if coefs.shape[1] > _HORNER_MAX_TERMS:
+        t = np.arange(coefs.shape[1])
+        with np.errstate(over='ignore', invalid='ignore'):
+            powers = x[:, None] ** t
+            return (coefs * powers).sum(axis=1), (coefs[:, 1:] * t[1:] * powers[:, :-1]).sum(axis=1)
+    p = coefs[:, -1].copy()
+    dp = np.zeros_like(p)
+    for t in range(coefs.shape[1] - 2, -1, -1):
+        dp = dp * x + p
+        p = p * x + coefs[:, t]
+    return p, dp
+
+
+def _sign_changes(flows):
+    # Signe du dernier flux non nul précédent, propagé le long de chaque ligne
+    s = np.sign(flows)
+    last_nonzero = np.maximum.accumulate(np.where(s != 0, np.arange(s.shape[1]), 0), axis=1)
+    filled = np.take_along_axis(s, last_nonzero, axis=1)
+    return ((s[:, 1:] != 0) & (filled[:, :-1] != 0) & (s[:, 1:] != filled[:, :-1])).sum(axis=1)
+
+
+def _solve(flows, guess, tol, max_iter, start=None):
+    n = len(flows)
+    irr = np.full(n, np.nan)
+    status = np.full(n, IRR_OK, dtype=np.int8)
+
+    changes = _sign_changes(flows)
+    status[changes == 0] = IRR_NO_SIGN_CHANGE
+    status[changes > 1] = IRR_MULTIPLE_SIGN_CHANGES
+    rows = np.flatnonzero(changes > 0)
+    if not len(rows):
+        return irr, status
+    c = flows[rows]
+
+    # En x = 1 / (1 + r), la VAN est un polynôme ; racines positives dans (0, borne de Cauchy)
+    nonzero = c != 0
+    first = np.argmax(nonzero, axis=1)
+    last = c.shape[1] - 1 - np.argmax(nonzero[:, ::-1], axis=1)
+    lead = np.abs(c[np.arange(len(c)), last])
+    lo = np.zeros(len(c))
+    hi = 1 + np.abs(c).max(axis=1) / lead
+    sign_lo = np.sign(c[np.arange(len(c)), first])
+
+    # Plusieurs changements de signe : encadrement sur la grille le plus proche du guess
+    multi = np.flatnonzero(changes[rows] > 1)
+    if len(multi):
+        grid_x = 1 / (1 + _RATE_GRID)[::-1]
+        with np.errstate(over='ignore', invalid='ignore'):
+            values = c[multi] @ (grid_x[None, :] ** np.arange(c.shape[1])[:, None])
+        finite = np.isfinite(values)
+        brackets = (np.sign(values[:, :-1]) * np.sign(values[:, 1:]) <= 0) & finite[:, :-1] & finite[:, 1:]
+        guess_x = 1 / (1 + guess[rows[multi]])
+        distance = np.abs((grid_x[:-1] + grid_x[1:]) / 2 - guess_x[:, None])
+        best = np.argmin(np.where(brackets, distance, np.inf), axis=1)
+        found = brackets[np.arange(len(multi)), best]
+        lo[multi] = grid_x[best]
+        hi[multi] = grid_x[best + 1]
+        sign_lo[multi] = np.sign(values[np.arange(len(multi)), best])
+        status[rows[multi[~found]]] = IRR_NO_BRACKET
+        sign_lo[multi[~found]] = np.nan
+
+    x = 1 / (1 + (guess if start is None else start)[rows])
+    x = np.where((x > lo) & (x < hi), x, (lo + hi) / 2)
+    active = np.flatnonzero(~np.isnan(sign_lo))
+    for _ in range(max_iter):
+        if not len(active):
+            break
+        xa, la, ha = x[active], lo[active], hi[active]
+        p, dp = _horner(c[active], xa)
+        same = np.sign(p) == sign_lo[active]
+        la = np.where(same, xa, la)
+        ha = np.where(same, ha, xa)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = xa - p / dp
+        bisect = ~((newton > la) & (newton < ha))
+        x_new = np.where(bisect, (la + ha) / 2, newton)
+        with np.errstate(divide='ignore'):
+            converged = (p == 0) | (np.abs(1 / x_new - 1 / xa) < tol) | (ha - la < tol * xa * xa)
+        x[active], lo[active], hi[active] = np.where(p == 0, xa, x_new), la, ha
+        done = active[converged]
+        irr[rows[done]] = 1 / x[done] - 1
+        active = active[~converged]
+    status[rows[active]] = IRR_NOT_CONVERGED
+    return irr, status
+
+
+def solve_irr(flows, guess=0.1, tol=1e-12, max_iter=100, warm_start=True):
+    """
+    TRI de chaque ligne de `flows` (N, années) -> (irr, status).
+
+    Une seule racine (un changement de signe) : Newton sécurisé dans
+    l'encadrement (0, borne de Cauchy) en x = 1 / (1 + r). Plusieurs
+    changements de signe : racine encadrée la plus proche de `guess`,
+    status IRR_MULTIPLE_SIGN_CHANGES. Échec : NaN et status explicite.
+    Avec warm_start, un scénario sur _WARM_START_STRIDE est résolu d'abord
+    et sert de point de départ à ses voisins (le choix de la racine reste
+    fixé par `guess`).
+    """
+    flows = np.atleast_2d(np.asarray(flows, dtype=np.float64))
+    guess = np.broadcast_to(np.asarray(guess, dtype=np.float64), (len(flows),)).copy()
+    if not warm_start or len(flows) < 2 * _WARM_START_STRIDE:
+        return _solve(flows, guess, tol, max_iter)
+
+    pilots = np.arange(0, len(flows), _WARM_START_STRIDE)
+    pilot_irr, pilot_status = _solve(flows[pilots], guess[pilots], tol, max_iter)
+    neighbour = np.repeat(pilot_irr, _WARM_START_STRIDE)[:len(flows)]
+    start = np.where(np.isnan(neighbour), guess, neighbour)
+    rest = np.setdiff1d(np.arange(len(flows)), pilots)
+    irr = np.empty(len(flows))
+    status = np.empty(len(flows), dtype=np.int8)
+    irr[pilots], status[pilots] = pilot_irr, pilot_status
+    irr[rest], status[rest] = _solve(flows[rest], guess[rest], tol, max_iter, start=start[rest])
+    return irr, status
+
+
+def equity_kpis(net_cash_flow, discount_rate, equity_needed, **irr_options):
+    """
+    TRI, VAN, multiple et equity de pointe d'un lot, comme CashflowEngine.calculate_kpis :
+    le flux de l'année 0 est remplacé par -equity_needed.
+    """
+    flows = np.atleast_2d(np.asarray(net_cash_flow, dtype=np.float64))
+    equity_needed = np.broadcast_to(np.asarray(equity_needed, dtype=np.float64), (len(flows),))
+    discount_rate = np.broadcast_to(np.asarray(discount_rate, dtype=np.float64), (len(flows),))
+    final_flows = flows.copy()
+    final_flows[:, 0] = -equity_needed
+
+    irr, status = solve_irr(final_flows, **irr_options)
+    npv, _ = _horner(final_flows, 1 / (1 + discount_rate))
+    positive = np.where(flows > 0, flows, 0.0).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        equity_multiple = np.where(equity_needed > 0, positive / equity_needed, 0.0)
+    return {
+        'Levered IRR': irr * 100, 'NPV': npv, 'Equity Multiple': equity_multiple,
+        'Peak Equity': equity_needed.copy(), 'IRR Status': status,
+    }
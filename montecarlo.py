@@ -0,0 +1,264 @@
+"""
+Simulation Monte Carlo des KPI : tirages des drivers d'OperationExit, du taux
+de Financing et des colonnes 'Occ %' / 'Rent growth %' des unités, évalués par
+blocs avec batch.evaluate_batch sur un pool de processus.
+
+Chaque bloc a son propre flux aléatoire (SeedSequence.spawn) : le résultat ne
+dépend que de la graine, pas du nombre de processus. Les distributions sont
+agrégées en histogrammes cumulés, la mémoire ne croît pas avec le nombre de tirages :
+un histogramme par KPI, un par année pour la trésorerie cumulée (bandes du fan
+chart) et un échantillon borné de trajectoires (nuage TRI × VAN).
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from batch import BatchInputs, BatchUnits, evaluate_batch
+from kpis import IRR_STATUS_LABELS
+
+# Drivers tirables -> clé d'entrée du lot (valeurs dans l'unité des inputs, % en points)
+DRIVERS = {
+    'exit_yield': 'exit_yield', 'rent_growth': 'rent_growth', 'inflation': 'inflation',
+    'occupancy_rate': 'occupancy_rate', 'opex_per_m2': 'opex_per_m2', 'interest_rate': 'interest_rate',
+    'Occ %': 'units_occ_shift', 'Rent growth %': 'units_rent_growth_shift',
+}
+METRICS = ['Levered IRR', 'NPV', 'Equity Multiple', 'Min Cash Position']
+PERCENTILES = [1, 5, 10, 25, 50, 75, 90, 95, 99]
+
+
+class Distribution:
+    """
+    Loi d'un driver : 'normal' (moyenne, écart-type), 'lognormal' (moyenne, écart-type
+    du log), 'uniform' (min, max), 'triangular' (min, mode, max) ou 'fixed' (valeur).
+    `low` / `high` bornent les tirages. Pour 'Occ %' et 'Rent growth %', le tirage
+    est un décalage en points appliqué à toutes les unités renseignées.
+    """
+    KINDS = {'normal': 2, 'lognormal': 2, 'uniform': 2, 'triangular': 3, 'fixed': 1}
+
+    def __init__(self, kind, *params, low=None, high=None):
+        if kind not in self.KINDS or len(params) != self.KINDS[kind]:
+            raise ValueError(f"Distribution inconnue ou mal paramétrée : {kind}{params}")
+        self.kind = kind
+        self.params = params
+        self.low = low
+        self.high = high
+
+    def sample(self, rng: np.random.Generator, n):
+        if self.kind == 'fixed':
+            draws = np.full(n, float(self.params[0]))
+        else:
+            draws = getattr(rng, self.kind)(*self.params, size=n)
+        if self.low is not None or self.high is not None:
+            draws = np.clip(draws, self.low, self.high)
+        return draws
+
+
+class StreamingHistogram:
+    """
+    Histogramme à bornes fixes + moments exacts, fusionnable entre blocs.
+    Les percentiles sont interpolés dans les classes ; hors bornes, le min / max exact sert de borne.
+    """
+    def __init__(self, low, high, bins=2000):
+        self.edges = np.linspace(low, high, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+        self.n = 0
+        self.n_nan = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        valid = values[~np.isnan(values)]
+        self.n_nan += len(values) - len(valid)
+        if not len(valid):
+            return
+        self.n += len(valid)
+        self.total += valid.sum()
+        self.total_sq += (valid * valid).sum()
+        self.min = min(self.min, valid.min())
+        self.max = max(self.max, valid.max())
+        self.underflow += int((valid < self.edges[0]).sum())
+        self.overflow += int((valid > self.edges[-1]).sum())
+        self.counts += np.histogram(valid, bins=self.edges)[0]
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        self.n += other.n
+        self.n_nan += other.n_nan
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.total / self.n if self.n else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(max(self.total_sq / self.n - self.mean ** 2, 0.0)) if self.n else np.nan
+
+    def percentile(self, q):
+        if not self.n:
+            return np.nan
+        edges = np.concatenate([[min(self.min, self.edges[0])], self.edges, [max(self.max, self.edges[-1])]])
+        counts = np.concatenate([[self.underflow], self.counts, [self.overflow]])
+        cumulative = np.concatenate([[0], np.cumsum(counts)])
+        target = q / 100.0 * self.n
+        i = min(np.searchsorted(cumulative, target, side='left'), len(counts))
+        i = max(i, 1)
+        inside = counts[i - 1]
+        frac = (target - cumulative[i - 1]) / inside if inside else 0.0
+        return float(np.clip(edges[i - 1] + frac * (edges[i] - edges[i - 1]), self.min, self.max))
+
+
+class MonteCarloResult:
+    """
+    Distributions agrégées des KPI : `histograms[metric]`, `summary()` et comptage des statuts de TRI.
+    `cash_histograms[t]` : trésorerie cumulée (Equity CF) en fin d'année t, pour `bands()`.
+    `sample` : au plus `sample_size` trajectoires tirées uniformément (KPI par tirage).
+    """
+    def __init__(self, histograms, irr_status_counts, n_paths, seed, cash_histograms=None, sample=None):
+        self.histograms = histograms
+        self.irr_status_counts = irr_status_counts
+        self.n_paths = n_paths
+        self.seed = seed
+        self.cash_histograms = cash_histograms or []
+        self.sample = sample if sample is not None else pd.DataFrame(columns=METRICS)
+
+    def summary(self):
+        rows = []
+        for metric, hist in self.histograms.items():
+            row = {'KPI': metric, 'Mean': hist.mean, 'Std': hist.std, 'Min': hist.min, 'Max': hist.max}
+            row.update({f'P{q}': hist.percentile(q) for q in PERCENTILES})
+            row['NaN'] = hist.n_nan
+            rows.append(row)
+        return pd.DataFrame(rows).set_index('KPI')
+
+    def irr_status(self):
+        return pd.Series({IRR_STATUS_LABELS[k]: int(v) for k, v in enumerate(self.irr_status_counts) if v})
+
+    def bands(self, percentiles=(5, 25, 50, 75, 95)):
+        """Percentiles de la trésorerie cumulée par année : index Year, colonnes P5, P25, ..."""
+        rows = [[hist.percentile(q) for q in percentiles] for hist in self.cash_histograms]
+        return pd.DataFrame(rows, columns=[f'P{q}' for q in percentiles],
+                            index=pd.Index(range(len(rows)), name='Year'))
+
+
+def _draw_inputs(distributions, base_inputs, rng, n):
+    columns = {DRIVERS[name]: dist.sample(rng, n) for name, dist in distributions.items()}
+    return BatchInputs(columns, base_inputs)
+
+
+def _path_metrics(result):
+    cash = np.cumsum(result.column('Equity CF'), axis=1)
+    metrics = {key: result.kpis[key].to_numpy() for key in METRICS[:3]}
+    metrics['Min Cash Position'] = cash.min(axis=1)
+    return metrics, cash, np.bincount(result.kpis['IRR Status'].to_numpy(), minlength=len(IRR_STATUS_LABELS))
+
+
+def _edges(values, bins, scale=1.0):
+    """
+    Bornes d'histogramme tirées du bloc pilote : P0.1 - P99.9 élargies de moitié de
+    l'écart, ou de `scale` x |P99.9| si l'écart est plus faible.
+    """
+    finite = values[np.isfinite(values)]
+    low, high = (np.percentile(finite, [0.1, 99.9]) if len(finite) else (0.0, 1.0))
+    pad = max(high - low, abs(high) * scale, 1e-9) * 0.5
+    return low - pad, high + pad, bins
+
+
+_WORKER = {}
+
+
+def _init_worker(distributions, units, base_inputs, edges):
+    _WORKER.update(distributions=distributions, units=units, base_inputs=base_inputs, edges=edges)
+
+
+def _aggregate(metrics, cash, status, n_sample, edges):
+    """Tirages d'un bloc -> histogrammes des KPI, de la trésorerie par année, statuts et échantillon."""
+    histograms = {}
+    for key, values in metrics.items():
+        histograms[key] = StreamingHistogram(*edges[key])
+        histograms[key].update(values)
+    cash_histograms = []
+    for t, cash_edges in enumerate(edges['cash']):
+        cash_histograms.append(StreamingHistogram(*cash_edges))
+        cash_histograms[t].update(cash[:, t])
+    # Tirages i.i.d. : les premiers du bloc forment un échantillon uniforme
+    sample = pd.DataFrame({key: values[:n_sample] for key, values in metrics.items()})
+    return histograms, cash_histograms, status, sample
+
+
+def _run_chunk(task):
+    seed_seq, n, n_sample = task
+    rng = np.random.default_rng(seed_seq)
+    inputs = _draw_inputs(_WORKER['distributions'], _WORKER['base_inputs'], rng, n)
+    metrics, cash, status = _path_metrics(evaluate_batch(inputs, _WORKER['units']))
+    return _aggregate(metrics, cash, status, n_sample, _WORKER['edges'])
+
+
+def _normalize(distributions):
+    normalized = {}
+    for name, dist in distributions.items():
+        if name not in DRIVERS:
+            raise KeyError(f"Driver inconnu : {name} (attendus : {sorted(DRIVERS)})")
+        normalized[name] = dist if isinstance(dist, Distribution) else Distribution(*dist)
+    return normalized
+
+
+def run_monte_carlo(distributions, df_units: pd.DataFrame, base_inputs=None, n_paths=100_000,
+                    chunk_size=10_000, jobs=1, seed=0, bins=2000, cash_bins=400, sample_size=5000) -> MonteCarloResult:
+    """
+    Simule `n_paths` trajectoires. `distributions` associe un nom de DRIVERS à une
+    Distribution (ou un tuple ('normal', 8.25, 0.5)). `jobs` > 1 répartit les blocs
+    sur un pool de processus. `sample_size` borne l'échantillon conservé, réparti
+    entre blocs au prorata de leur taille.
+    """
+    if n_paths < 1:
+        raise ValueError(f"n_paths doit être >= 1 (reçu : {n_paths})")
+    distributions = _normalize(distributions)
+    base_inputs = dict(base_inputs or {})
+    units = BatchUnits(df_units, base_inputs.get('df_asset_costs'))
+    sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    samples = np.diff(np.floor(np.cumsum([0] + sizes) * min(sample_size, n_paths) / n_paths).astype(int))
+
+    # Bloc pilote : fixe les bornes des histogrammes
+    _init_worker(distributions, units, base_inputs, None)
+    pilot_inputs = _draw_inputs(distributions, base_inputs, np.random.default_rng(seeds[0]), sizes[0])
+    pilot, cash, status = _path_metrics(evaluate_batch(pilot_inputs, units))
+    edges = {key: _edges(values, bins) for key, values in pilot.items()}
+    # Trésorerie : montants élevés, faible dispersion -> marge relative réduite pour garder la résolution
+    edges['cash'] = [_edges(cash[:, t], cash_bins, scale=1e-3) for t in range(cash.shape[1])]
+    histograms, cash_histograms, status_counts, sample = _aggregate(pilot, cash, status, samples[0], edges)
+    samples_kept = [sample]
+
+    def merge(chunk):
+        nonlocal status_counts
+        chunk_histograms, chunk_cash, chunk_status, chunk_sample = chunk
+        status_counts += chunk_status
+        for key, hist in chunk_histograms.items():
+            histograms[key].merge(hist)
+        for hist, other in zip(cash_histograms, chunk_cash):
+            hist.merge(other)
+        samples_kept.append(chunk_sample)
+
+    tasks = list(zip(seeds[1:], sizes[1:], samples[1:]))
+    if jobs > 1 and tasks:
+        with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(distributions, units, base_inputs, edges)) as pool:
+            for chunk in pool.map(_run_chunk, tasks):
+                merge(chunk)
+    else:
+        _init_worker(distributions, units, base_inputs, edges)
+        for task in tasks:
+            merge(_run_chunk(task))
+    return MonteCarloResult(histograms, status_counts, n_paths, seed, cash_histograms,
+                            pd.concat(samples_kept, ignore_index=True))
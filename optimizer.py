@@ -0,0 +1,395 @@
+"""
+Optimiseur du mix d'unités : pour chaque groupe d'unités (même `Code`), choix du
+Mode (Rent / Sale / Mixed), de l'année de vente et, en option, de l'année de mise
+en service, qui maximise la VAN ou le TRI sous contraintes (DSCR minimum, equity
+de pointe maximum, quota de pré-ventes résidentielles).
+
+Les loyers, ventes et surfaces occupées du Scheduler sont linéaires par unité :
+la contribution de chaque (groupe, option) est calculée une fois, un mix coûte
+une somme de tableaux. Les mix candidats sont évalués exactement par lots
+vectorisés (BatchCashflowEngine). La recherche est un beam search groupe par
+groupe : des bornes supérieures séparables (VAN, NOI, pré-ventes, cumul des
+flux equity) éliminent les branches qui ne peuvent ni battre la meilleure
+solution ni respecter les contraintes ; un passage 1-opt par lots termine.
+
+    result = MixOptimizer(df_units, base_inputs).optimize('NPV', min_dscr=1.2, presale_share=0.3)
+    result.choices          # un choix par groupe
+    result.units()          # table des unités modifiée
+
+Pas annuel (comme batch). L'equity de pointe est le creux du cumul des flux
+equity (comme portfolio). Pour le TRI, une branche est écartée si sa VAN au TRI
+de la meilleure solution ne peut être positive : exact pour des flux
+conventionnels (un seul changement de signe).
+"""
+import copy
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch import BatchAmortization, BatchCapex, BatchCashflowEngine, BatchInputs, BatchUnits
+from financial_model import General, Financing, OperationExit, Scheduler, UnitsTable
+from goalseek import min_dscr
+from instrument import span
+
+MODES = ('Rent', 'Sale', 'Mixed')
+OBJECTIVES = ('NPV', 'Levered IRR')
+CURRENT = 'Actuel'
+# Colonnes de [Feuille Units] lues par le Scheduler (la surface est sommée, les autres regroupent)
+_SCHEDULE_COLUMNS = ['Code', 'AssetClass', 'Rent (€/m²/mo)', 'Price €/m²', 'Start Year', 'Sale Year', 'Mode',
+                     'Occ %', 'Rent growth %', 'Asset Value Growth (%/yr)']
+_SURFACE = 'Surface (GLA m²)'
+_TOL = 1e-9
+
+
+class _MixSchedule:
+    """Totaux par année d'un lot de mix, au format de BatchScheduler (colonne 0 = année 0)."""
+    def __init__(self, rent, area, sale):
+        pad = ((0, 0), (1, 0))
+        self.rent = np.pad(rent, pad)
+        self.occupied_area = np.pad(area, pad)
+        self.sale = np.pad(sale, pad)
+
+
+class MixResult:
+    def __init__(self, optimizer, choice, values, baseline, objective, evaluations, candidates, pruned, exhaustive,
+                 elapsed, message):
+        self._optimizer = optimizer
+        self.choice = choice
+        self.kpis = values
+        self.baseline = baseline
+        self.objective = objective
+        self.evaluations = evaluations
+        self.candidates = candidates
+        self.pruned = pruned
+        self.exhaustive = exhaustive
+        self.elapsed = elapsed
+        self.message = message
+        self.feasible = bool(values['Feasible'])
+        self.choices = optimizer.describe(choice)
+
+    def units(self):
+        """Table des unités avec le mix retenu."""
+        return self._optimizer.apply(self.choice)
+
+    def __repr__(self):
+        return (f"MixResult({self.objective}={self.kpis[self.objective]:,.6g} (base {self.baseline[self.objective]:,.6g}), "
+                f"{self.evaluations} évaluations, {self.pruned} branches écartées, {self.elapsed:.2f} s, {self.message})")
+
+
+class MixOptimizer:
+    """
+    Contributions (groupe, option) calculées à la construction. Options d'un groupe :
+    'Actuel' (table inchangée), Rent jusqu'à la sortie, Sale ou Mixed avec vente
+    l'année `sale_years` (1..holding_period par défaut), chacune pour chaque année de
+    mise en service de `start_years` (None : années de la table). Les options aux
+    contributions identiques sont fusionnées.
+    """
+    def __init__(self, df_units: pd.DataFrame, base_inputs=None, modes=MODES, sale_years=None, start_years=None,
+                 groups=None, presale_pattern='residential', presale_by_year=3):
+        base_inputs = dict(base_inputs or {})
+        self.df_units = df_units
+        self.inputs = BatchInputs([{}], base_inputs)
+        self.hold = hold = int(self.inputs['holding_period'][0])
+        sale_years = list(range(1, hold + 1)) if sale_years is None else [int(y) for y in sale_years if 1 <= int(y) <= hold]
+        start_years = [None] if start_years is None else [int(y) for y in start_years]
+
+        codes = df_units['Code'].astype(str) if 'Code' in df_units.columns else pd.Series('', index=df_units.index)
+        self.codes = list(dict.fromkeys(codes))
+        optimized = set(self.codes if groups is None else map(str, groups))
+        options = [(CURRENT, None, None)]
+        for start in start_years:
+            for mode in modes:
+                if mode == 'Rent':
+                    options.append(('Rent', 'Exit', start))
+                else:
+                    options.extend((mode, year, start) for year in sale_years)
+
+        # Lignes identiques (hors surface et parking) regroupées : le Scheduler est linéaire en surface
+        columns = [c for c in _SCHEDULE_COLUMNS if c in df_units.columns]
+        compact = df_units.assign(Code=codes).groupby(columns, sort=False, dropna=False)[_SURFACE].sum().reset_index() \
+            if _SURFACE in df_units.columns else df_units.assign(Code=codes)
+        group_of = pd.Index(self.codes).get_indexer(compact['Code'])
+        # Lignes contiguës par groupe : sommes par groupe en un np.add.reduceat
+        compact = compact.iloc[np.argsort(group_of, kind='stable')].reset_index(drop=True)
+        group_of = np.sort(group_of, kind='stable')
+        group_starts = np.searchsorted(group_of, np.arange(len(self.codes)))
+        n_groups = len(self.codes)
+        pattern = re.compile(str(presale_pattern), re.IGNORECASE)
+
+        general, financing, operation = General(base_inputs), Financing(base_inputs), OperationExit({**base_inputs, 'frequency': 'annual'})
+        contributions = np.zeros((len(options), n_groups, 3, hold))
+        presold = np.zeros((len(options), n_groups))
+        # Table convertie une fois ; chaque option remplace Mode, année de vente et de mise en service
+        table = UnitsTable(compact)
+        matched = np.array([pattern.search(label) is not None for label in table.asset_labels], dtype=bool)[table.asset_label_codes] \
+            if table.has_asset_class else np.zeros(table.n_units, dtype=bool)
+        self.presale_total = float(table.surface[matched].sum())
+        with span('MixOptimizer.contributions', rows=len(options) * len(compact)):
+            for o, (mode, sale, start) in enumerate(options):
+                units = table
+                if mode != CURRENT:
+                    units = copy.copy(table)
+                    units.mode = np.full(table.n_units, UnitsTable.MODES[mode.lower()], dtype=np.int8)
+                    units.sale_year = np.full(table.n_units, UnitsTable.SALE_AT_EXIT if sale == 'Exit' else sale, dtype=np.int16)
+                    if start is not None:
+                        units.start_year = np.full(table.n_units, start, dtype=np.int16)
+                scheduler = Scheduler(units, operation, general, financing)
+                for i, matrix in enumerate((scheduler.rent_matrix, scheduler.occupied_area_matrix, scheduler.sale_matrix)):
+                    contributions[o, :, i] = np.add.reduceat(matrix[:, :hold], group_starts, axis=0)
+                sold = units.is_sale & ~units.is_exit_sale & (units.sale_year >= 1) & (units.sale_year <= presale_by_year)
+                presold[o] = np.bincount(group_of, weights=units.surface * (matched & sold), minlength=n_groups)
+
+        # Options par groupe : doublons fusionnés ; groupes non optimisés figés sur 'Actuel'
+        self.options = options
+        self.group_options = []
+        for g, code in enumerate(self.codes):
+            if code not in optimized:
+                self.group_options.append(np.array([0]))
+                continue
+            flat = np.concatenate([contributions[:, g].reshape(len(options), -1), presold[:, g, None]], axis=1)
+            _, first = np.unique(flat, axis=0, return_index=True)
+            self.group_options.append(np.sort(first))
+        self.n_options = max(len(o) for o in self.group_options)
+        self.valid = np.zeros((n_groups, self.n_options), dtype=bool)
+        index = np.zeros((n_groups, self.n_options), dtype=np.intp)
+        for g, opts in enumerate(self.group_options):
+            self.valid[g, :len(opts)] = True
+            index[g] = np.concatenate([opts, np.full(self.n_options - len(opts), opts[0])])
+        self.option_index = index
+        # (groupe, option locale, rent / area / sale, années 1..hold)
+        self.contributions = contributions[index, np.arange(n_groups)[:, None]]
+        self.presold = presold[index, np.arange(n_groups)[:, None]]
+
+        self.units = BatchUnits(df_units, self.inputs.df_asset_costs)
+        self.capex = BatchCapex(self.inputs, self.units)
+        self.amortization = BatchAmortization(self.inputs, hold)
+        self.n_groups = n_groups
+
+    # --- évaluation exacte d'un lot de mix ---
+    def evaluate(self, choices):
+        """KPI, DSCR min, equity de pointe, pré-ventes pour des choix (N, groupes) d'options locales."""
+        choices = np.atleast_2d(np.asarray(choices, dtype=np.intp))
+        n = len(choices)
+        totals = np.zeros((n, 3, self.hold))
+        presold = np.zeros(n)
+        for g in range(self.n_groups):
+            totals += self.contributions[g, choices[:, g]]
+            presold += self.presold[g, choices[:, g]]
+        return self._evaluate_totals(totals, presold)
+
+    def _evaluate_totals(self, totals, presold):
+        n = len(totals)
+        inputs = self.inputs.take(np.zeros(n, dtype=np.intp))
+        # Année hold + 1 (hors horizon du cash flow) laissée à zéro
+        extra = np.zeros((n, 1))
+        schedule = _MixSchedule(*(np.concatenate([totals[:, i], extra], axis=1) for i in range(3)))
+        cf = BatchCashflowEngine(inputs, self.capex, self.amortization, schedule, self.hold)
+        equity_cf = cf.columns['Equity CF']
+        return {
+            'Levered IRR': cf.kpis['Levered IRR'], 'NPV': cf.kpis['NPV'], 'IRR Status': cf.kpis['IRR Status'],
+            'Min DSCR': min_dscr(inputs, self.amortization, cf),
+            'Peak Equity': np.maximum(0.0, -np.cumsum(equity_cf, axis=1).min(axis=1)),
+            'Presold': presold, 'NOI': cf.columns['NOI'], 'Equity CF': equity_cf,
+        }
+
+    # --- bornes séparables ---
+    def _coefficients(self):
+        """NOI et valeur de sortie par (groupe, option) et par année ; constantes du cash flow."""
+        x = self.inputs
+        years = np.arange(1, self.hold + 1)
+        pm = x['pm_fee_pct'][0] / 100.0
+        opex = x['opex_per_m2'][0] * (1 + x['inflation'][0] / 100.0) ** (years - 1)
+        rent, area, sale = self.contributions[:, :, 0], self.contributions[:, :, 1], self.contributions[:, :, 2]
+        noi = rent * (1 - pm) + sale - area * opex
+        exit_factor = (1 + x['rent_growth'][0] / 100.0) / (x['exit_yield'][0] / 100.0) * (1 - x['transac_fees_exit'][0] / 100.0)
+        exit_value = (rent[..., -1] * (1 - pm) - area[..., -1] * opex[-1]) * exit_factor
+        return noi, exit_value
+
+    def _pv(self, noi, exit_value, rate, taxed):
+        """Valeur actuelle séparable par (groupe, option), impôt au taux `taxed` (λ dans [0, 1]) par année."""
+        v = (1 + rate) ** -np.arange(1, self.hold + 1)
+        tax_rate = self.inputs['corporate_tax_rate'][0] / 100.0
+        return (noi * (1 - tax_rate * taxed) * v).sum(axis=-1) + exit_value * v[-1]
+
+    def optimize(self, objective='NPV', min_dscr=None, max_peak_equity=None, presale_share=None, beam_width=64,
+                 max_polish=20):
+        if objective not in OBJECTIVES:
+            raise KeyError(f"Objectif inconnu : {objective} (attendus : {OBJECTIVES})")
+        start_time = time.perf_counter()
+        with span('MixOptimizer.optimize', rows=self.n_groups):
+            return self._search(objective, min_dscr, max_peak_equity, presale_share, beam_width, max_polish, start_time)
+
+    def _search(self, objective, dscr_min, max_peak, presale_share, beam_width, max_polish, start_time):
+        G, Y = self.n_groups, self.hold
+        evaluations = candidates = pruned = 0
+        exhaustive = True
+        quota = None if not presale_share else presale_share * self.presale_total
+        tax_holiday = self.inputs['tax_holiday'][0]
+        eligible = np.arange(1, Y + 1) > tax_holiday
+
+        def feasible(values):
+            ok = np.ones(len(values['NPV']), dtype=bool)
+            if dscr_min is not None:
+                ok &= ~(values['Min DSCR'] < dscr_min - _TOL)
+            if max_peak is not None:
+                ok &= values['Peak Equity'] <= max_peak + _TOL
+            if quota is not None:
+                ok &= values['Presold'] >= quota - _TOL * max(1.0, quota)
+            return ok
+
+        def score(values):
+            s = values[objective].astype(np.float64)
+            return np.where(np.isnan(s), -np.inf, s)
+
+        # Point de départ : la table actuelle
+        current = np.zeros((1, G), dtype=np.intp)
+        baseline = self.evaluate(current)
+        evaluations += 1
+        best_choice, best_values = current[0], {k: v[0] for k, v in baseline.items()}
+        best_feasible = bool(feasible(baseline)[0])
+        best_score = score(baseline)[0] if best_feasible else -np.inf
+
+        noi, exit_value = self._coefficients()
+        # Constantes : mix vide (aucune contribution)
+        empty = self._evaluate_totals(np.zeros((1, 3, Y)), np.zeros(1))
+        evaluations += 1
+        equity_base = np.cumsum(empty['Equity CF'][0])
+        cumulative = np.cumsum(noi, axis=-1)
+        cumulative[..., -1] += exit_value
+        payment = self.amortization.payment[0, 1:Y + 1]
+        paying = (payment > 0) & (np.arange(1, Y + 1) > self.inputs['grace_period'][0])
+
+        def tables():
+            # λ = 1 les années imposables où la meilleure solution a un NOI positif (borne valide pour tout λ de [0, 1])
+            taxed = eligible & (best_values['NOI'][1:Y + 1] > 0)
+            if objective == 'NPV' or not np.isfinite(best_score):
+                rate = self.inputs['discount_rate'][0] / 100.0
+            else:
+                rate = best_score / 100.0
+            # Flux du mix vide (année 0 = -equity), actualisés au taux des bornes
+            constant = float(empty['Equity CF'][0] @ (1 + rate) ** -np.arange(Y + 1))
+            pv = np.where(self.valid, self._pv(noi, exit_value, rate, taxed), -np.inf)
+            return pv, constant
+
+        pv, constant = tables()
+        order = np.argsort(-(np.where(self.valid, pv, -np.inf).max(axis=1) - np.where(self.valid, pv, np.inf).min(axis=1)),
+                          kind='stable')
+
+        def suffix(table):
+            # Somme, sur les groupes restants (ordre de recherche), du meilleur cas de chaque groupe
+            best = np.where(self.valid[..., None] if table.ndim == 3 else self.valid, table, -np.inf).max(axis=1)
+            out = np.zeros((G + 1,) + best.shape[1:])
+            for i in range(G - 1, -1, -1):
+                out[i] = out[i + 1] + best[order[i]]
+            return out
+
+        rest_pv, rest_noi, rest_cum = suffix(pv), suffix(noi), suffix(cumulative)
+        rest_presold = suffix(self.presold)
+
+        # Beam : états = choix fixés pour order[:i]
+        states = np.zeros((1, G), dtype=np.intp)
+        state_noi = np.zeros((1, Y)); state_cum = np.zeros((1, Y)); state_presold = np.zeros(1)
+        for i, g in enumerate(order):
+            state_pv = sum(pv[order[j], states[:, order[j]]] for j in range(i)) if i else np.zeros(len(states))
+            bound = constant + state_pv[:, None] + pv[g][None, :] + rest_pv[i + 1]
+            keep = self.valid[g][None, :].repeat(len(states), axis=0)
+            if np.isfinite(best_score):
+                # TRI : battre le meilleur TRI r* exige une VAN(r*) positive
+                keep &= bound > (_improvement(best_score) if objective == 'NPV' else 0.0)
+            if dscr_min is not None:
+                noi_bound = state_noi[:, None, :] + noi[g][None] + rest_noi[i + 1]
+                keep &= ~((noi_bound < dscr_min * payment - _TOL) & paying).any(axis=-1)
+            if max_peak is not None:
+                cum_bound = equity_base[1:] + state_cum[:, None, :] + cumulative[g][None] + rest_cum[i + 1]
+                keep &= (cum_bound >= -max_peak - _TOL).all(axis=-1)
+            if quota is not None:
+                keep &= state_presold[:, None] + self.presold[g][None] + rest_presold[i + 1] >= quota - _TOL * max(1.0, quota)
+            candidates += int(self.valid[g].sum()) * len(states)
+            pruned += int((self.valid[g][None, :] & ~keep).sum())
+            s_idx, o_idx = np.nonzero(keep)
+            if not len(s_idx):
+                break
+            if len(s_idx) > beam_width:
+                exhaustive = False
+                top = np.argsort(-bound[s_idx, o_idx], kind='stable')[:beam_width]
+                s_idx, o_idx = s_idx[top], o_idx[top]
+            states = states[s_idx].copy()
+            states[:, g] = o_idx
+            state_noi = state_noi[s_idx] + noi[g, o_idx]
+            state_cum = state_cum[s_idx] + cumulative[g, o_idx]
+            state_presold = state_presold[s_idx] + self.presold[g, o_idx]
+
+            # Complétion gloutonne des groupes restants, évaluée exactement
+            completion = states.copy()
+            remaining = order[i + 1:]
+            if len(remaining):
+                completion[:, remaining] = np.argmax(pv[remaining], axis=1)[None, :]
+            values = self.evaluate(completion)
+            evaluations += len(completion)
+            ok = feasible(values) & (score(values) > best_score)
+            if ok.any():
+                k = np.flatnonzero(ok)[np.argmax(score(values)[ok])]
+                best_choice, best_values = completion[k], {key: v[k] for key, v in values.items()}
+                best_score, best_feasible = score(values)[k], True
+                pv, constant = tables()
+                rest_pv = suffix(pv)
+
+        # 1-opt par lots : tous les changements d'un seul groupe évalués ensemble
+        for _ in range(max_polish):
+            moves = [(g, o) for g in range(G) for o in np.flatnonzero(self.valid[g]) if o != best_choice[g]]
+            if not moves:
+                break
+            trial = np.repeat(best_choice[None, :], len(moves), axis=0)
+            trial[np.arange(len(moves)), [g for g, _ in moves]] = [o for _, o in moves]
+            values = self.evaluate(trial)
+            evaluations += len(trial)
+            ok = feasible(values)
+            s = np.where(ok, score(values), -np.inf)
+            k = int(np.argmax(s))
+            if not (s[k] > _improvement(best_score) if np.isfinite(best_score) else np.isfinite(s[k])):
+                break
+            best_choice, best_values = trial[k], {key: v[k] for key, v in values.items()}
+            best_score, best_feasible = s[k], True
+
+        best_values = {k: v for k, v in best_values.items() if k not in ('NOI', 'Equity CF')}
+        best_values['Feasible'] = best_feasible
+        baseline = {k: v[0] for k, v in baseline.items() if k not in ('NOI', 'Equity CF')}
+        message = "OK" if best_feasible else "aucun mix ne respecte les contraintes : table actuelle conservée"
+        return MixResult(self, best_choice, best_values, baseline, objective, evaluations, candidates, pruned,
+                         exhaustive, time.perf_counter() - start_time, message)
+
+    # --- restitution ---
+    def describe(self, choice):
+        """Un choix par groupe : Code, Mode, Sale Year, Start Year, surface."""
+        rows = []
+        surface = self.df_units[_SURFACE] if _SURFACE in self.df_units.columns else pd.Series(0.0, index=self.df_units.index)
+        codes = self.df_units['Code'].astype(str) if 'Code' in self.df_units.columns else pd.Series('', index=self.df_units.index)
+        for g, code in enumerate(self.codes):
+            mode, sale, start = self.options[self.option_index[g, choice[g]]]
+            rows.append({'Code': code, 'Mode': mode, 'Sale Year': '' if sale is None else str(sale),
+                         'Start Year': '' if start is None else str(start), 'Surface': float(surface[codes == code].sum())})
+        return pd.DataFrame(rows)
+
+    def apply(self, choice):
+        """Table des unités avec les options choisies."""
+        df = self.df_units.copy()
+        codes = df['Code'].astype(str) if 'Code' in df.columns else pd.Series('', index=df.index)
+        for g, code in enumerate(self.codes):
+            mode, sale, start = self.options[self.option_index[g, choice[g]]]
+            if mode == CURRENT:
+                continue
+            rows = codes == code
+            df['Mode'] = df['Mode'].astype(object) if 'Mode' in df.columns else ''
+            df['Sale Year'] = df['Sale Year'].astype(object) if 'Sale Year' in df.columns else 'Exit'
+            df.loc[rows, 'Mode'] = mode
+            df.loc[rows, 'Sale Year'] = sale
+            if start is not None:
+                df.loc[rows, 'Start Year'] = start
+        return df
+
+
+def _improvement(score):
+    """Seuil à dépasser pour améliorer `score` (tolérance relative)."""
+    return score + _TOL * max(1.0, abs(score))
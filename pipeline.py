@@ -0,0 +1,209 @@
+"""
+Graphe de dépendances explicite entre les classes de financial_model, avec
+mémoïsation par empreinte du contenu des entrées (LRU bornée par nœud).
+
+    units ─> UnitsTable ─> Parking ─> Construction ─> CapexSummary ─> CashflowEngine
+                          General ─┘                                 ^
+    Financing ─> CapexSummary, Amortization ─────────────────────────┤
+    UnitsTable + OperationExit ─> Scheduler ─────────────────────────┘
+
+Chaque nœud est indexé par ses propres entrées et par les seuls attributs
+qu'il lit en amont : changer exit_yield ne recalcule qu'OperationExit et CashflowEngine.
+Les nœuds ne sont construits qu'à la lecture ; un CashflowEngine relu du cache
+disque (cache.ResultCache) évite Scheduler et Amortization.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+import instrument
+from financial_model import (Amortization, CapexSummary, CashflowEngine, Construction, Financing, General,
+                             OperationExit, Parking, Scheduler, UnitsTable)
+
+
+def _canonical(obj):
+    if isinstance(obj, pd.DataFrame):
+        digest = hashlib.blake2b(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes(), digest_size=16)
+        return {'__frame__': [list(map(str, obj.columns)), list(map(str, obj.dtypes)), digest.hexdigest()]}
+    if isinstance(obj, pd.Series):
+        return _canonical(obj.to_frame())
+    if isinstance(obj, np.ndarray):
+        return {'__array__': [obj.dtype.str, list(obj.shape), hashlib.blake2b(np.ascontiguousarray(obj).tobytes(), digest_size=16).hexdigest()]}
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in sorted(obj.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v) for v in obj]
+    if isinstance(obj, (bool, np.bool_)):
+        return bool(obj)
+    if isinstance(obj, (int, float, np.integer, np.floating)):
+        return repr(float(obj))
+    return obj if obj is None or isinstance(obj, str) else repr(obj)
+
+
+def content_hash(*parts):
+    """Empreinte stable d'entrées (dicts, nombres, tableaux, DataFrames)."""
+    payload = json.dumps(_canonical(list(parts)), separators=(',', ':'), sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class Node:
+    """
+    Étape du graphe : `inputs` (section des entrées lue), `units` (lit la table des
+    unités), `reads` (nœud amont -> attributs lus, ou None pour tout l'objet),
+    `persist` (sortie conservée dans le cache disque du graphe, s'il y en a un).
+    """
+    def __init__(self, build, inputs=None, units=False, reads=None, persist=False):
+        self.build = build
+        self.inputs = inputs
+        self.units = units
+        self.reads = reads or {}
+        self.persist = persist
+
+
+NODES = OrderedDict([
+    ('UnitsTable', Node(lambda i, u, s: UnitsTable(u), units=True)),
+    ('Parking', Node(lambda i, u, s: Parking(i, s['UnitsTable']), inputs='parking', units=True)),
+    ('General', Node(lambda i, u, s: General(i), inputs='general')),
+    ('Construction', Node(
+        lambda i, u, s: Construction(dict(i, parking_capex=s['Parking'].total_capex), s['General'], s['UnitsTable']),
+        inputs='construction', units=True, reads={'Parking': ('total_capex',), 'General': ('building_efficiency',)})),
+    ('Financing', Node(lambda i, u, s: Financing(i), inputs='financing')),
+    ('OperationExit', Node(lambda i, u, s: OperationExit(i), inputs='operation')),
+    ('CapexSummary', Node(
+        lambda i, u, s: CapexSummary(s['Construction'], s['Financing']),
+        reads={'Construction': ('total_capex',), 'Financing': ('total_upfront_fees',)})),
+    ('Amortization', Node(
+        lambda i, u, s: Amortization(s['Financing'], s['OperationExit']),
+        reads={'Financing': ('debt_principal', 'interest_rate', 'loan_term', 'grace_period'), 'OperationExit': ('holding_period', 'periods_per_year')})),
+    # General et Financing sont passés à Scheduler mais n'y sont pas lus
+    ('Scheduler', Node(
+        lambda i, u, s: Scheduler(s['UnitsTable'], s['OperationExit'], s['General'], s['Financing']),
+        units=True, reads={'OperationExit': ('holding_period', 'occupancy_default', 'rent_growth', 'inflation')})),
+    ('CashflowEngine', Node(
+        lambda i, u, s: CashflowEngine(s['General'], s['Construction'], s['Financing'], s['CapexSummary'],
+                                       s['OperationExit'], s['Amortization'], s['Scheduler']),
+        reads={name: None for name in ('General', 'Construction', 'Financing', 'CapexSummary', 'OperationExit',
+                                       'Amortization', 'Scheduler')}, persist=True)),
+])
+
+
+class Stages(Mapping):
+    """
+    Sorties d'un appel à ModelGraph.run, construites à la demande : un nœud n'est
+    calculé (ou relu) qu'au premier accès, avec les seuls nœuds amont dont dépend
+    son empreinte. Une sortie relue du cache disque n'exige pas ses amonts lus en entier.
+    `state` donne l'état (hit / stored / miss) de chaque nœud touché par cet appel.
+    """
+    def __init__(self, graph, df_units, sections):
+        self._graph = graph
+        self._df_units = df_units
+        self._sections = sections
+        self._units_key = content_hash(df_units)
+        self._keys = {}
+        self._objects = {}
+        self.state = {}
+
+    def key(self, name):
+        if name not in self._keys:
+            node = NODES[name]
+            parts = [name]
+            if node.inputs:
+                parts.append(self._sections[node.inputs])
+            if node.units:
+                parts.append(self._units_key)
+            for upstream, attributes in node.reads.items():
+                if attributes is None:
+                    parts.append(self.key(upstream))
+                else:
+                    parts.append({a: getattr(self[upstream], a) for a in attributes})
+            self._keys[name] = content_hash(*parts)
+        return self._keys[name]
+
+    def reused(self):
+        return [name for name, state in self.state.items() if state != 'miss']
+
+    def __getitem__(self, name):
+        if name not in self._objects:
+            self._objects[name] = self._graph._resolve(name, self)
+        return self._objects[name]
+
+    def __iter__(self):
+        return iter(NODES)
+
+    def __len__(self):
+        return len(NODES)
+
+
+class ModelGraph:
+    """
+    Exécute NODES à la demande ; chaque sortie est mémoïsée par nœud (LRU de
+    `maxsize` entrées, partagée entre threads). Avec `store` (cache.ResultCache),
+    les nœuds `persist` sont aussi relus / écrits sur disque. `stats()` donne les
+    compteurs par nœud ; l'état de chaque appel est porté par les Stages renvoyés.
+    """
+    def __init__(self, maxsize=32, store=None):
+        self.maxsize = maxsize
+        self.store = store
+        self._memo = {name: OrderedDict() for name in NODES}
+        self._lock = threading.Lock()
+        self.hits = dict.fromkeys(NODES, 0)
+        self.stored = dict.fromkeys(NODES, 0)
+        self.misses = dict.fromkeys(NODES, 0)
+
+    def run(self, df_units: pd.DataFrame, general=None, parking=None, construction=None, financing=None, operation=None):
+        """Renvoie les Stages {nom du nœud: objet} ; seuls les nœuds lus dont l'empreinte a changé sont recalculés."""
+        sections = {'general': general or {}, 'parking': parking or {}, 'construction': construction or {},
+                    'financing': financing or {}, 'operation': operation or {}}
+        return Stages(self, df_units, sections)
+
+    def _resolve(self, name, stages):
+        node = NODES[name]
+        key = stages.key(name)
+        memo = self._memo[name]
+        with self._lock:
+            value = memo.get(key)
+            if value is not None:
+                memo.move_to_end(key)
+                self.hits[name] += 1
+                stages.state[name] = 'hit'
+        if value is not None:
+            instrument.emit(name, cache='hit')
+            return value
+        # Relu ou construit hors verrou : deux appels concurrents peuvent calculer le même nœud
+        with instrument.span(name, rows=len(stages._df_units) if node.units else None) as event:
+            value = self.store.get(key) if self.store is not None and node.persist else None
+            if value is not None:
+                state = 'stored'
+            else:
+                value = node.build(stages._sections.get(node.inputs), stages._df_units, stages)
+                if self.store is not None and node.persist:
+                    self.store.put(key, value)
+                state = 'miss'
+            if event is not None:
+                event['cache'] = state
+                if event['rows'] is None and hasattr(value, 'periods'):
+                    event['rows'] = len(value.periods)
+        with self._lock:
+            if state == 'stored':
+                self.stored[name] += 1
+            else:
+                self.misses[name] += 1
+            memo[key] = value
+            if len(memo) > self.maxsize:
+                memo.popitem(last=False)
+        stages.state[name] = state
+        return value
+
+    def stats(self):
+        with self._lock:
+            return pd.DataFrame({'hits': self.hits, 'stored': self.stored, 'misses': self.misses}).rename_axis('Node')
+
+    def clear(self):
+        with self._lock:
+            for memo in self._memo.values():
+                memo.clear()
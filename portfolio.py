@@ -0,0 +1,177 @@
+"""
+Mode portefeuille : chaque projet (un site, ses unités, son financement) est
+évalué sur toute la chaîne General -> CashflowEngine, sur un pool de processus,
+puis les flux sont alignés sur l'année calendaire de démarrage de chaque projet
+et consolidés : cash flows, TRI / VAN / equity de pointe du portefeuille et
+exposition par Asset Class (loyers de Scheduler.rent_schedule_by_asset).
+
+Chaque résultat de projet est mémoïsé par l'empreinte de ses entrées (nom et
+date de démarrage exclus) : après modification d'un projet, seul celui-ci est recalculé.
+"""
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from financial_model import CASHFLOW_COLUMNS
+from kpis import IRR_STATUS_LABELS, solve_irr
+from pipeline import ModelGraph, content_hash
+
+SECTIONS = ('general', 'parking', 'construction', 'financing', 'operation')
+
+
+class Project:
+    """
+    Définition d'un projet : `start_year` (année calendaire de l'année 0 du modèle),
+    table des unités et entrées par section (comme ModelGraph.run). `inputs` (dict à
+    plat) sert de valeur commune aux sections non fournies.
+    """
+    def __init__(self, name, start_year, df_units, inputs=None, **sections):
+        unknown = set(sections) - set(SECTIONS)
+        if unknown:
+            raise KeyError(f"Sections inconnues : {sorted(unknown)} (attendues : {list(SECTIONS)})")
+        self.name = str(name)
+        self.start_year = int(start_year)
+        self.df_units = df_units if isinstance(df_units, pd.DataFrame) else pd.DataFrame(df_units)
+        self.sections = {s: dict(sections.get(s) or inputs or {}) for s in SECTIONS}
+        for section in self.sections.values():
+            if isinstance(section.get('df_asset_costs'), list):
+                section['df_asset_costs'] = pd.DataFrame(section['df_asset_costs'])
+
+    @classmethod
+    def from_dict(cls, data):
+        """{'name', 'start_year', 'units': [...], 'inputs' ou 'general' / 'financing' / ...}"""
+        data = dict(data)
+        return cls(data.pop('name'), data.pop('start_year'), data.pop('units'), data.pop('inputs', None), **data)
+
+    @property
+    def key(self):
+        return content_hash(self.df_units, self.sections)
+
+
+class ProjectResult:
+    """Sorties d'un projet nécessaires à la consolidation (légères, transmises entre processus)."""
+    def __init__(self, stages):
+        cf = stages['CashflowEngine']
+        scheduler = stages['Scheduler']
+        hold = stages['OperationExit'].holding_period
+        self.cashflow = cf.annual().fillna(0.0)
+        self.kpis = dict(cf.kpis)
+        # Loyers par Asset Class sur les années 1 .. hold (comme CashflowEngine)
+        years = [y for y in scheduler.years.tolist() if y <= hold]
+        self.rent_by_asset = pd.DataFrame({a: [scheduler.rent_schedule_by_asset[a][y] for y in years]
+                                           for a in scheduler.asset_classes}, index=pd.Index(years, name='Year'))
+        self.n_unit_errors = len(stages['UnitsTable'].errors)
+
+
+_WORKER = {}
+
+
+def _model_graph():
+    # Un graphe par processus, gardé d'un projet à l'autre : les étapes communes (mêmes unités, même financement) sont réutilisées
+    if 'graph' not in _WORKER:
+        _WORKER['graph'] = ModelGraph()
+    return _WORKER['graph']
+
+
+def evaluate_project(project: Project) -> ProjectResult:
+    s = project.sections
+    stages = _model_graph().run(project.df_units, s['general'], s['parking'], s['construction'],
+                                s['financing'], s['operation'])
+    return ProjectResult(stages)
+
+
+def _calendar(frame, start_year, calendar):
+    """Réindexe un tableau (index = année du projet) sur l'axe calendaire, 0 hors projet."""
+    shifted = frame.set_axis(frame.index + start_year)
+    return shifted.reindex(calendar, fill_value=0.0)
+
+
+class PortfolioResult:
+    """
+    `cashflows` (années calendaires x CASHFLOW_COLUMNS), `equity_flows` (années x
+    projets), `exposure` (loyers par Asset Class et par année), `projects` (KPI par
+    projet), `kpis` du portefeuille et `recomputed` (projets recalculés à cet appel).
+    Total Equity est la somme des apports des projets, Peak Equity le creux de la
+    position cumulée des flux equity consolidés.
+    """
+    def __init__(self, projects, results, discount_rate, recomputed):
+        self.recomputed = recomputed
+        first = min(p.start_year for p in projects)
+        last = max(p.start_year + int(r.cashflow.index.max()) for p, r in zip(projects, results))
+        calendar = pd.RangeIndex(first, last + 1, name='Calendar Year')
+
+        self.cashflows = sum(_calendar(r.cashflow[CASHFLOW_COLUMNS], p.start_year, calendar)
+                             for p, r in zip(projects, results))
+        self.equity_flows = pd.DataFrame({p.name: _calendar(r.cashflow['Equity CF'], p.start_year, calendar)
+                                          for p, r in zip(projects, results)}, index=calendar)
+        exposure = pd.concat([_calendar(r.rent_by_asset, p.start_year, calendar) for p, r in zip(projects, results)],
+                             axis=1).fillna(0.0)
+        self.exposure = exposure.T.groupby(level=0, sort=False).sum().T
+
+        self.projects = pd.DataFrame([{'Project': p.name, 'Start Year': p.start_year, **r.kpis, 'Unit Errors': r.n_unit_errors}
+                                      for p, r in zip(projects, results)]).set_index('Project')
+        self.kpis = self._consolidated_kpis(discount_rate)
+
+    def _consolidated_kpis(self, discount_rate):
+        # Flux equity consolidés : apport de chaque projet à son année 0 (comme Equity CF)
+        flows = self.equity_flows.sum(axis=1).to_numpy()
+        irr, status = solve_irr(flows[None, :])
+        npv = float((flows / (1 + discount_rate) ** np.arange(len(flows))).sum())
+        total_equity = float(self.projects['Peak Equity'].sum())
+        return {
+            'Levered IRR': float(irr[0] * 100), 'NPV': npv,
+            'Equity Multiple': float(flows[flows > 0].sum() / total_equity) if total_equity > 0 else 0.0,
+            # Besoin maximal de la position cumulée : les distributions des premiers projets financent les suivants
+            'Peak Equity': float(max(0.0, -np.cumsum(flows).min())),
+            'Total Equity': total_equity,
+            'IRR Status': int(status[0]), 'IRR Status Label': IRR_STATUS_LABELS[int(status[0])],
+        }
+
+    def exposure_share(self):
+        """Part de chaque Asset Class dans les loyers cumulés du portefeuille."""
+        totals = self.exposure.sum()
+        return (totals / totals.sum() if totals.sum() else totals).rename('Share')
+
+
+class Portfolio:
+    """
+    Évalue un ensemble de projets ; les résultats sont gardés par empreinte (LRU de
+    `maxsize` projets). `jobs` > 1 répartit les projets à recalculer sur un pool de processus.
+    """
+    def __init__(self, jobs=1, maxsize=256):
+        self.jobs = jobs
+        self.maxsize = maxsize
+        self._results = OrderedDict()
+
+    def run(self, projects, discount_rate=0.10) -> PortfolioResult:
+        projects = [p if isinstance(p, Project) else Project.from_dict(p) for p in projects]
+        if not projects:
+            raise ValueError("Portefeuille vide")
+        names = [p.name for p in projects]
+        if len(set(names)) != len(names):
+            raise ValueError("Noms de projets en double")
+
+        keys = [p.key for p in projects]
+        todo = {}
+        for key, project in zip(keys, projects):
+            if key in self._results:
+                self._results.move_to_end(key)
+            else:
+                todo.setdefault(key, project)
+        if self.jobs > 1 and len(todo) > 1:
+            with ProcessPoolExecutor(min(self.jobs, len(todo))) as pool:
+                computed = dict(zip(todo, pool.map(evaluate_project, todo.values())))
+        else:
+            computed = {key: evaluate_project(project) for key, project in todo.items()}
+        self._results.update(computed)
+        results = [self._results[key] for key in keys]
+        while len(self._results) > max(self.maxsize, len(set(keys))):
+            self._results.popitem(last=False)
+
+        recomputed = [p.name for key, p in zip(keys, projects) if key in computed]
+        return PortfolioResult(projects, results, discount_rate, recomputed)
+
+    def clear(self):
+        self._results.clear()
@@ -0,0 +1,115 @@
+"""
+Sensibilités : tableau 2-D (ex. yield de sortie x croissance des loyers) et tornado.
+
+Chaque entrée est rattachée aux étapes qu'elle modifie (batch.STAGE_INPUTS) :
+les étapes non touchées (capex, échéancier de dette, loyers) sont calculées une
+fois sur le scénario de base et diffusées sur toutes les cellules, le reste est
+évalué en un seul appel vectorisé.
+"""
+import numpy as np
+import pandas as pd
+
+from batch import (BatchAmortization, BatchCapex, BatchCashflowEngine, BatchInputs, BatchScheduler, BatchUnits,
+                   STAGE_INPUTS)
+
+# Entrée -> (écart bas, écart haut) autour de la base, dans l'unité de l'entrée
+DEFAULT_TORNADO = {
+    'exit_yield': (-0.5, 0.5),
+    'rent_growth': (-1.0, 1.0),
+    'units_rent_growth_shift': (-1.0, 1.0),
+    'units_occ_shift': (-5.0, 5.0),
+    'occupancy_rate': (-5.0, 5.0),
+    'inflation': (-1.0, 1.0),
+    'opex_per_m2': (-5.0, 5.0),
+    'pm_fee_pct': (-1.0, 1.0),
+    'interest_rate': (-1.0, 1.0),
+    'contingency_pct': (-2.5, 2.5),
+    'architect_fees_pct': (-1.0, 1.0),
+    'amenities_total_capex': (-50000, 50000),
+    'corporate_tax_rate': (-5.0, 5.0),
+    'transac_fees_exit': (-2.0, 2.0),
+    'prepayment_fee_pct': (-1.0, 1.0),
+}
+
+
+def affected_stages(keys):
+    """Étapes à recalculer quand `keys` varient."""
+    return {stage for stage, inputs in STAGE_INPUTS.items() if set(keys) & set(inputs)}
+
+
+class SensitivityEngine:
+    """
+    Scénario de base fixé une fois (unités, entrées) ; `evaluate` ne recalcule que
+    les étapes touchées par les colonnes passées.
+    """
+    def __init__(self, df_units: pd.DataFrame, base_inputs=None):
+        self.base_inputs = dict(base_inputs or {})
+        self.base = BatchInputs([{}], self.base_inputs)
+        self.units = BatchUnits(df_units, self.base.df_asset_costs)
+        self.n_years = int(self.base['holding_period'][0])
+        self._base_stages = {}
+        self.stats = {'computed': {}, 'reused': {}}
+
+    def _stage(self, name, inputs, n_years, varied):
+        if name in varied:
+            self.stats['computed'][name] = self.stats['computed'].get(name, 0) + 1
+            return self._build(name, inputs, n_years)
+        if name not in self._base_stages:
+            self._base_stages[name] = self._build(name, self.base, self.n_years)
+        self.stats['reused'][name] = self.stats['reused'].get(name, 0) + 1
+        return self._base_stages[name]
+
+    def _build(self, name, inputs, n_years):
+        if name == 'capex':
+            return BatchCapex(inputs, self.units)
+        if name == 'amortization':
+            return BatchAmortization(inputs, n_years)
+        return BatchScheduler(inputs, self.units, n_years + 1)
+
+    def run(self, columns):
+        """Étapes (inputs, capex, amortization, scheduler, cashflow) pour des colonnes variant autour de la base."""
+        inputs = BatchInputs(columns, self.base_inputs)
+        varied = affected_stages(columns)
+        n_years = int(inputs['holding_period'].max())
+        if n_years != self.n_years:
+            varied |= {'amortization', 'scheduler'}
+        capex = self._stage('capex', inputs, n_years, varied)
+        amortization = self._stage('amortization', inputs, n_years, varied)
+        scheduler = self._stage('scheduler', inputs, n_years, varied)
+        cf = BatchCashflowEngine(inputs, capex, amortization, scheduler, n_years)
+        return inputs, capex, amortization, scheduler, cf
+
+    def evaluate(self, columns):
+        """KPI (dict de tableaux (N,)) pour des colonnes d'entrées variant autour de la base."""
+        return self.run(columns)[-1].kpis
+
+    def grid(self, x_key, x_values, y_key, y_values, metric='Levered IRR'):
+        """Tableau `metric` : lignes = y_values, colonnes = x_values."""
+        xx, yy = np.meshgrid(np.asarray(x_values, dtype=np.float64), np.asarray(y_values, dtype=np.float64))
+        kpis = self.evaluate({x_key: xx.ravel(), y_key: yy.ravel()})
+        return pd.DataFrame(kpis[metric].reshape(xx.shape), index=pd.Index(y_values, name=y_key),
+                            columns=pd.Index(x_values, name=x_key))
+
+    def tornado(self, ranges=None, metric='Levered IRR'):
+        """
+        Une ligne par entrée : valeur du KPI aux bornes basse / haute et écart,
+        triée par écart décroissant. Toutes les bornes sont évaluées en un appel.
+        """
+        ranges = DEFAULT_TORNADO if ranges is None else ranges
+        keys = list(ranges)
+        n = 2 * len(keys) + 1
+        columns = {key: np.full(n, self.base[key][0], dtype=np.float64) for key in keys}
+        for i, key in enumerate(keys):
+            low, high = ranges[key]
+            columns[key][2 * i + 1] += low
+            columns[key][2 * i + 2] += high
+        values = self.evaluate(columns)[metric]
+        df = pd.DataFrame({
+            'Input': keys,
+            'Low': [self.base[k][0] + ranges[k][0] for k in keys],
+            'High': [self.base[k][0] + ranges[k][1] for k in keys],
+            'KPI Low': values[1::2], 'KPI High': values[2::2],
+        })
+        df['Base'] = values[0]
+        df['Swing'] = (df['KPI High'] - df['KPI Low']).abs()
+        return df.sort_values('Swing', ascending=False).reset_index(drop=True)
@@ -0,0 +1,277 @@
+"""
+Service local d'évaluation du modèle : JSON sur HTTP (127.0.0.1) ou socket Unix.
+
+Les requêtes simultanées sont regroupées pendant `window_ms` (ou jusqu'à
+`max_batch`) puis évaluées en un seul appel vectorisé (batch.evaluate_batch) sur
+un pool de processus ; chaque réponse reprend sa ligne du lot.
+
+    python service.py --units units.csv --base base.json --port 8765
+    curl -s localhost:8765/evaluate -d '{"scenario": {"exit_yield": 7.5}, "cashflow": true}'
+
+POST /evaluate  {"scenario": {entrées à plat}, "cashflow": false}
+                -> {"kpis": {...}, "cashflow": {"Year": [...], colonne: [...]}}
+GET  /stats     compteurs (requêtes, lots, taille moyenne des lots, erreurs)
+GET  /health
+
+Les scénarios en pas trimestriel ou mensuel ('frequency') sont évalués un par un
+par la chaîne de financial_model (le lot est annuel).
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from batch import DESCRIPTIVE_INPUTS, KPI_COLUMNS, SCENARIO_INPUTS
+from financial_model import FREQUENCIES
+
+ACCEPTED_INPUTS = set(SCENARIO_INPUTS) | set(DESCRIPTIVE_INPUTS) | {'frequency'}
+_MAX_BODY = 1 << 20
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+            500: 'Internal Server Error'}
+
+
+def _json_value(value):
+    return None if isinstance(value, float) and not math.isfinite(value) else value
+
+
+def _frame_payload(df):
+    """DataFrame -> {index: [...], colonne: [...]} (NaN -> null)."""
+    payload = {df.index.name or 'index': df.index.tolist()}
+    for column in df.columns:
+        payload[column] = [_json_value(v) for v in df[column].tolist()]
+    return payload
+
+
+# --- processus de calcul ---
+_WORKER = {}
+
+
+def _init_worker(df_units, base_inputs):
+    from batch import BatchUnits
+    from pipeline import ModelGraph
+    # Graphe gardé par processus : les étapes communes aux scénarios scalaires (unités, coûts) sont réutilisées
+    _WORKER.update(df_units=df_units, base_inputs=base_inputs,
+                   units=BatchUnits(df_units, base_inputs.get('df_asset_costs')), graph=ModelGraph(maxsize=8))
+
+
+def _evaluate_batch(scenarios, cashflows):
+    """Lot de scénarios -> liste de réponses ; `cashflows` : indices dont le tableau est demandé."""
+    from batch import evaluate_batch
+    result = evaluate_batch(scenarios, _WORKER['units'], _WORKER['base_inputs'])
+    kpis = result.kpis.to_dict('records')
+    responses = []
+    for i, row in enumerate(kpis):
+        response = {'kpis': {k: _json_value(v) for k, v in row.items()}}
+        if i in cashflows:
+            response['cashflow'] = _frame_payload(result.cashflow(i))
+        responses.append(response)
+    return responses
+
+
+def _evaluate_scalar(scenario, cashflow):
+    """Un scénario par la chaîne de financial_model (pas trimestriel / mensuel)."""
+    inputs = {**_WORKER['base_inputs'], **scenario}
+    cf = _WORKER['graph'].run(_WORKER['df_units'], inputs, inputs, inputs, inputs, inputs)['CashflowEngine']
+    response = {'kpis': {k: _json_value(cf.kpis[k]) for k in KPI_COLUMNS}}
+    if cashflow:
+        response['cashflow'] = _frame_payload(cf.df)
+    return response
+
+
+# --- regroupement des requêtes ---
+class Coalescer:
+    """
+    File des requêtes : la première ouvre une fenêtre de `window` secondes ; à sa
+    fin (ou à `max_batch` requêtes) le lot part sur le pool, sans bloquer la boucle.
+    """
+    def __init__(self, pool, window=0.005, max_batch=4096):
+        self.pool = pool
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._timer = None
+        self.requests = self.batches = self.batched_requests = self.errors = 0
+
+    async def submit(self, scenario, cashflow=False):
+        self.requests += 1
+        loop = asyncio.get_running_loop()
+        if scenario.get('frequency', 'annual') != 'annual':
+            return await loop.run_in_executor(self.pool, _evaluate_scalar, scenario, cashflow)
+        future = loop.create_future()
+        self._pending.append((scenario, cashflow, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if pending:
+            asyncio.ensure_future(self._run(pending))
+
+    async def _run(self, pending):
+        scenarios = [{k: v for k, v in s.items() if k != 'frequency'} for s, _, _ in pending]
+        cashflows = {i for i, (_, cashflow, _) in enumerate(pending) if cashflow}
+        self.batches += 1
+        self.batched_requests += len(pending)
+        try:
+            responses = await asyncio.get_running_loop().run_in_executor(self.pool, _evaluate_batch, scenarios, cashflows)
+        except Exception as exc:
+            self.errors += 1
+            if len(pending) > 1:
+                # Le lot a échoué : reprise requête par requête, l'erreur ne revient qu'à sa requête
+                await asyncio.gather(*(self._run([item]) for item in pending))
+                return
+            for _, _, future in pending:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, _, future), response in zip(pending, responses):
+            if not future.done():
+                future.set_result(response)
+
+    def stats(self):
+        return {'requests': self.requests, 'batches': self.batches, 'errors': self.errors,
+                'mean batch size': self.batched_requests / self.batches if self.batches else 0.0}
+
+
+# --- HTTP minimal (HTTP/1.1, keep-alive) ---
+def _validate(body, base_inputs):
+    """Corps -> (scénario, cashflow) ; entrées vérifiées par BatchInputs avant d'entrer dans un lot."""
+    from batch import BatchInputs
+    request = json.loads(body or b'{}')
+    if not isinstance(request, dict):
+        raise ValueError("Corps JSON attendu : un objet")
+    scenario = request.get('scenario', {})
+    if not isinstance(scenario, dict):
+        raise ValueError("'scenario' doit être un objet")
+    unknown = set(scenario) - ACCEPTED_INPUTS
+    if unknown:
+        raise ValueError(f"Entrées inconnues : {sorted(unknown)}")
+    if scenario.get('frequency', 'annual') not in FREQUENCIES:
+        raise ValueError(f"frequency : {sorted(FREQUENCIES)} attendu")
+    for key, value in scenario.items():
+        if key not in DESCRIPTIVE_INPUTS and key != 'frequency' and not isinstance(value, (int, float)):
+            raise ValueError(f"{key} : valeur numérique attendue")
+    BatchInputs([{k: v for k, v in scenario.items() if k != 'frequency'}], base_inputs)
+    return scenario, bool(request.get('cashflow', False))
+
+
+async def _respond(writer, status, payload, keep_alive):
+    body = json.dumps(payload, allow_nan=False).encode()
+    head = (f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode() + body)
+    await writer.drain()
+
+
+class Service:
+    def __init__(self, coalescer, base_inputs=None):
+        self.coalescer = coalescer
+        self.base_inputs = dict(base_inputs or {})
+        self.started = time.time()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = (request_line.decode('latin-1').split() + ['', '', ''])[:3]
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get('connection', '').lower() != 'close' and version != 'HTTP/1.0'
+                length = int(headers.get('content-length') or 0)
+                if length > _MAX_BODY:
+                    await _respond(writer, 413, {'error': "Corps trop volumineux"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await self.route(method, path, body)
+                await _respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/stats':
+            return 200, {**self.coalescer.stats(), 'uptime s': time.time() - self.started}
+        if path != '/evaluate':
+            return 404, {'error': f"Chemin inconnu : {path}"}
+        if method != 'POST':
+            return 405, {'error': "POST attendu"}
+        try:
+            scenario, cashflow = _validate(body, self.base_inputs)
+        except (KeyError, ValueError) as exc:
+            return 400, {'error': str(exc)}
+        try:
+            return 200, await self.coalescer.submit(scenario, cashflow)
+        except (KeyError, ValueError) as exc:
+            return 400, {'error': str(exc)}
+        except Exception as exc:
+            return 500, {'error': f"{type(exc).__name__} : {exc}"}
+
+
+async def serve(df_units, base_inputs, host='127.0.0.1', port=8765, unix=None, workers=None, window_ms=5.0,
+                max_batch=4096, ready=None):
+    workers = workers or max(1, (os.cpu_count() or 1))
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(df_units, base_inputs)) as pool:
+        service = Service(Coalescer(pool, window_ms / 1000, max_batch), base_inputs)
+        if unix:
+            server = await asyncio.start_unix_server(service.handle, path=unix)
+        else:
+            server = await asyncio.start_server(service.handle, host, port)
+        address = unix or f"http://{host}:{server.sockets[0].getsockname()[1]}"
+        print(f"Service prêt : {address} ({workers} processus, fenêtre {window_ms} ms)", file=sys.stderr)
+        if ready is not None:
+            ready(address)
+        async with server:
+            await server.serve_forever()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='service.py', description="Service JSON local d'évaluation du modèle.")
+    parser.add_argument('--units', required=True, help="Table des unités (.json, .csv, .parquet)")
+    parser.add_argument('--base', help="Entrées communes (.json)")
+    parser.add_argument('--asset-costs', help="Coûts par Asset Class (.json, .csv, .parquet)")
+    parser.add_argument('--host', default='127.0.0.1', help="Adresse d'écoute (défaut : 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="Socket Unix au lieu de TCP")
+    parser.add_argument('--workers', type=int, help="Processus de calcul (défaut : nombre de CPU)")
+    parser.add_argument('--window-ms', type=float, default=5.0, help="Fenêtre de regroupement des requêtes (défaut : 5 ms)")
+    parser.add_argument('--max-batch', type=int, default=4096, help="Requêtes max. par lot")
+    return parser
+
+
+def main(argv=None):
+    from cli import read_base, read_table
+    args = build_parser().parse_args(argv)
+    df_units = read_table(args.units)
+    base_inputs = read_base(args.base, args.asset_costs)
+    try:
+        asyncio.run(serve(df_units, base_inputs, args.host, args.port, args.unix, args.workers, args.window_ms,
+                          args.max_batch))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""
+Fixtures communes : modules du dépôt importables depuis tests/ et tables
+d'unités aléatoires reproductibles (modes Rent / Sale / Mixed, ventes 'Exit'
+ou datées, pourcentages vides).
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ASSET_CLASSES = ['office', 'residential', 'retail', 'hotel']
+ASSET_COSTS = pd.DataFrame({'Asset Class': ASSET_CLASSES, 'Cost €/m²': [1093, 1190, 1200, 1500]})
+
+
+def random_units(n, seed=0, holding_period=20):
+    """Table de `n` unités au schéma de [Feuille Units]."""
+    rng = np.random.default_rng(seed)
+    asset = rng.choice(ASSET_CLASSES, n)
+    mode = rng.choice(['Rent', 'Sale', 'Mixed'], n)
+    sale_year = rng.integers(1, holding_period + 3, n).astype(object)
+    sale_year[rng.random(n) < 0.4] = 'Exit'
+
+    def blank(values, share):
+        values = values.astype(float)
+        values[rng.random(n) < share] = np.nan
+        return values
+
+    return pd.DataFrame({
+        'Code': [f'U-{i}' for i in range(n)],
+        'AssetClass': asset,
+        'Surface (GLA m²)': np.round(rng.uniform(50, 3000, n), 1),
+        'Rent (€/m²/mo)': np.round(rng.uniform(5, 30, n), 2),
+        'Price €/m²': np.round(np.where(mode == 'Rent', 0, rng.uniform(1500, 3500, n))),
+        'Mode': mode,
+        'Start Year': rng.integers(1, 6, n),
+        'Sale Year': sale_year,
+        'Occ %': blank(np.round(rng.uniform(70, 100, n)), 0.3),
+        'Rent growth %': blank(np.round(rng.uniform(0, 5, n), 1), 0.3),
+        'Asset Value Growth (%/yr)': blank(np.round(rng.uniform(0, 6, n), 1), 0.3),
+        'Parking per unit': rng.integers(0, 3, n),
+    })
+
+
+@pytest.fixture
+def make_units():
+    return random_units
+
+
+@pytest.fixture
+def asset_costs():
+    return ASSET_COSTS.copy()
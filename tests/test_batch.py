@@ -0,0 +1,67 @@
+"""
+Lot vectorisé (batch.evaluate_batch) contre la chaîne de classes de
+financial_model, scénario par scénario.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch import KPI_COLUMNS, evaluate_batch
+from financial_model import (Amortization, CapexSummary, CashflowEngine, Construction, Financing, General,
+                             OperationExit, Parking, Scheduler)
+
+SCENARIOS = [
+    {},
+    {'exit_yield': 7.0, 'rent_growth': 3.5, 'holding_period': 12},
+    {'interest_rate': 6.5, 'occupancy_rate': 82.0, 'holding_period': 25, 'grace_period': 0},
+    {'debt_amount': 0.0, 'use_research_cost': False, 'tax_holiday': 0},
+    {'loan_term': 8, 'holding_period': 15, 'inflation': 1.5, 'contingency_pct': 10.0},
+]
+
+
+def scalar_engine(inputs, df_units):
+    gen = General(inputs)
+    park = Parking(inputs, df_units)
+    const = Construction({'parking_capex': park.total_capex, **inputs}, gen, df_units)
+    fin = Financing(inputs)
+    op = OperationExit(inputs)
+    capex_sum = CapexSummary(const, fin)
+    amort = Amortization(fin, op)
+    sched = Scheduler(df_units, op, gen, fin)
+    return CashflowEngine(gen, const, fin, capex_sum, op, amort, sched)
+
+
+@pytest.fixture
+def units(make_units):
+    return make_units(80, seed=5)
+
+
+def test_batch_matches_scalar_chain(units, asset_costs):
+    base = {'df_asset_costs': asset_costs}
+    result = evaluate_batch(SCENARIOS, units, base)
+    for i, scenario in enumerate(SCENARIOS):
+        cf = scalar_engine({**base, **scenario}, units)
+        for key in KPI_COLUMNS:
+            assert result.kpis[key][i] == pytest.approx(cf.kpis[key], rel=1e-9, abs=1e-6), (i, key)
+        expected = cf.df.set_index('Year') if 'Year' in cf.df.columns else cf.df
+        got = result.cashflow(i)
+        np.testing.assert_allclose(got[expected.columns].to_numpy(dtype=float), expected.to_numpy(dtype=float),
+                                   rtol=1e-9, atol=1e-6, equal_nan=True)
+
+
+def test_batch_chunks_do_not_change_results(units, asset_costs):
+    scenarios = pd.DataFrame({'exit_yield': np.linspace(6, 10, 7), 'holding_period': [10, 20, 15, 12, 20, 18, 11]})
+    whole = evaluate_batch(scenarios, units, {'df_asset_costs': asset_costs})
+    chunked = evaluate_batch(scenarios, units, {'df_asset_costs': asset_costs}, chunk_size=2)
+    pd.testing.assert_frame_equal(whole.kpis, chunked.kpis)
+
+
+def test_occupancy_shift_is_bounded(units, asset_costs):
+    base = {'df_asset_costs': asset_costs}
+    shifted = evaluate_batch([{'units_occ_shift': 50.0}, {'units_occ_shift': -150.0}], units, base)
+    for i, shift in enumerate((50.0, -150.0)):
+        bounded = units.copy()
+        bounded['Occ %'] = (bounded['Occ %'] + shift).clip(0, 100)
+        expected = evaluate_batch([{}], bounded, base)
+        np.testing.assert_allclose(shifted.cashflow(i).to_numpy(dtype=float),
+                                   expected.cashflow(0).to_numpy(dtype=float), rtol=1e-9, atol=1e-6)
@@ -0,0 +1,48 @@
+"""
+benchmarks/run.py : référence livrée pour 10 et 1000 unités, référence absente
+refusée avant toute mesure, régressions au-delà du seuil et du bruit.
+"""
+import json
+import os
+import sys
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import run as bench  # noqa: E402
+
+
+def test_shipped_baseline_covers_small_scales():
+    with open(bench.DEFAULT_BASELINE, encoding='utf-8') as f:
+        baseline = json.load(f)
+    scales = {r['scale'] for r in baseline['results']}
+    assert scales == {10, 1000}
+    stages = {r['stage'] for r in baseline['results'] if r['scale'] == 10}
+    assert stages == {r['stage'] for r in baseline['results'] if r['scale'] == 1000}
+    assert {'Scheduler', 'CashflowEngine', 'KPIs', 'Batch'} <= stages
+
+
+def test_missing_baseline_fails_before_measuring(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(bench, 'run', lambda *a, **k: (_ for _ in ()).throw(AssertionError("mesure lancée")))
+    assert bench.main(['--scales', '10', '--baseline', str(tmp_path / 'absente.json')]) == 2
+    assert 'introuvable' in capsys.readouterr().err
+
+
+def test_save_then_compare(tmp_path):
+    path = str(tmp_path / 'ref.json')
+    options = ['--scales', '10', '--repeats', '1', '--budget', '0', '--scenarios', '2', '--no-memory']
+    assert bench.main(options + ['--save-baseline', '--baseline', path]) == 0
+    with open(path, encoding='utf-8') as f:
+        assert {r['scale'] for r in json.load(f)['results']} == {10}
+    assert bench.main(options + ['--baseline', '']) == 0
+
+
+def test_compare_ignores_noise_and_unknown_stages():
+    baseline = {'results': [{'scale': 10, 'stage': 'KPIs', 'min_s': 0.010},
+                            {'scale': 10, 'stage': 'Batch', 'min_s': 0.0001}]}
+    results = [{'scale': 10, 'stage': 'KPIs', 'min_s': 0.020},
+               {'scale': 10, 'stage': 'Batch', 'min_s': 0.0005},
+               {'scale': 1000, 'stage': 'KPIs', 'min_s': 1.0}]
+    rows = {(scale, stage): regression for scale, stage, *_, regression in bench.compare(results, baseline, 0.25)}
+    assert rows == {(10, 'KPIs'): True, (10, 'Batch'): False}
@@ -0,0 +1,100 @@
+"""
+ResultCache sur une base temporaire : aller-retour d'un CashflowEngine,
+éviction LRU sous max_bytes, purge à l'ouverture quand la version du modèle
+change, stats / clear, et cache disque branché sur ModelGraph.
+"""
+import time
+
+import numpy as np
+import pytest
+
+from cache import ResultCache, encode
+from pipeline import ModelGraph
+
+
+@pytest.fixture
+def engines(make_units, asset_costs):
+    units = make_units(20, seed=12)
+    graph = ModelGraph()
+    return [graph.run(units, {}, {}, {'df_asset_costs': asset_costs}, {}, {'exit_yield': y})['CashflowEngine']
+            for y in (7.0, 7.5, 8.0, 8.5, 9.0)]
+
+
+def test_round_trip(tmp_path, engines):
+    cache = ResultCache(str(tmp_path / 'results.sqlite'))
+    assert cache.get('a') is None
+    cache.put('a', engines[0])
+    restored = cache.get('a')
+    assert restored.kpis == engines[0].kpis
+    assert restored.periods_per_year == 1
+    for name, values in engines[0].columns.items():
+        np.testing.assert_array_equal(restored.columns[name], values)
+    cache.close()
+
+
+def test_lru_eviction_under_max_bytes(tmp_path, engines):
+    size = len(encode(engines[0]))
+    cache = ResultCache(str(tmp_path / 'results.sqlite'), max_bytes=int(size * 3.5))
+    for i, engine in enumerate(engines[:3]):
+        cache.put(f'k{i}', engine)
+        time.sleep(0.002)
+    assert cache.get('k0') is not None
+    cache._flush()
+    time.sleep(0.002)
+    # Quatrième entrée : au-delà de la borne, évince la moins récemment lue (k1) jusqu'à 90 %
+    cache.put('k3', engines[3])
+    stats = cache.stats()
+    assert stats['bytes'] <= 0.9 * stats['max bytes']
+    assert stats['evictions'] == 1 and stats['entries'] == 3
+    assert cache.get('k1') is None
+    assert all(cache.get(k) is not None for k in ('k0', 'k2', 'k3'))
+
+
+def test_version_change_purges_entries(tmp_path, engines):
+    path = str(tmp_path / 'results.sqlite')
+    old = ResultCache(path, version='v1')
+    old.put('a', engines[0])
+    old.close()
+    same = ResultCache(path, version='v1')
+    assert same.get('a') is not None and same.stats()['entries'] == 1
+    same.close()
+    new = ResultCache(path, version='v2')
+    assert new.stats()['entries'] == 0 and new.stats()['bytes'] == 0
+    assert new.get('a') is None
+    new.close()
+
+
+def test_stats_and_clear(tmp_path, engines):
+    path = str(tmp_path / 'results.sqlite')
+    cache = ResultCache(path)
+    cache.put('a', engines[0])
+    cache.get('a')
+    cache.get('b')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['writes'], stats['entries']) == (1, 1, 1, 1)
+    assert stats['hit rate'] == 0.5 and stats['bytes'] == len(encode(engines[0]))
+    cache.clear()
+    assert cache.stats()['entries'] == 0 and cache.stats()['bytes'] == 0
+    cache.close()
+    # Compteurs cumulés conservés d'une session à l'autre
+    reopened = ResultCache(path)
+    reopened.get('a')
+    stats = reopened.stats()
+    assert stats['misses'] == 1 and stats['misses (total)'] == 2 and stats['hits (total)'] == 1
+    reopened.close()
+
+
+def test_graph_reads_stored_cashflow(tmp_path, make_units, asset_costs):
+    units = make_units(20, seed=13)
+    sections = ({}, {}, {'df_asset_costs': asset_costs}, {}, {'exit_yield': 7.5})
+    store = ResultCache(str(tmp_path / 'results.sqlite'))
+    first = ModelGraph(store=store).run(units, *sections)
+    cf = first['CashflowEngine']
+    assert first.state['CashflowEngine'] == 'miss'
+    # Nouveau graphe (autre session) : le cash flow est relu du disque, Scheduler n'est pas recalculé
+    second = ModelGraph(store=store).run(units, *sections)
+    assert second['CashflowEngine'].kpis == cf.kpis
+    assert second.state['CashflowEngine'] == 'stored'
+    assert 'Scheduler' not in second.state
+    assert 'CashflowEngine' in second.reused()
+    store.close()
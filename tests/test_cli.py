@@ -0,0 +1,45 @@
+"""
+cli.run : moteurs batch et scalar identiques, scénarios non annuels évalués
+par la chaîne de financial_model sous --engine batch, ordre des lignes conservé.
+"""
+import pandas as pd
+import pytest
+
+from batch import KPI_COLUMNS
+from cli import ResultWriter, main, run
+
+SCENARIOS = pd.DataFrame({
+    'scenario': ['a', 'b', 'c', 'd', 'e'],
+    'exit_yield': [7.0, 8.0, 9.0, 7.5, 8.5],
+    'frequency': ['annual', 'quarterly', None, 'monthly', 'annual'],
+})
+
+
+def evaluate(tmp_path, name, scenarios, units, base, **options):
+    path = tmp_path / f'{name}.csv'
+    writer = ResultWriter(str(path))
+    rows = run(scenarios, units, base, writer, **options)
+    writer.close()
+    assert rows == len(scenarios)
+    return pd.read_csv(path)
+
+
+@pytest.mark.parametrize('jobs, chunk_size', [(1, 10), (1, 2), (2, 2)])
+def test_batch_and_scalar_engines_agree(tmp_path, make_units, asset_costs, capsys, jobs, chunk_size):
+    units = make_units(20, seed=1)
+    base = {'df_asset_costs': asset_costs}
+    batch = evaluate(tmp_path, 'batch', SCENARIOS, units, base, jobs=jobs, chunk_size=chunk_size)
+    scalar = evaluate(tmp_path, 'scalar', SCENARIOS, units, base, engine='scalar')
+    assert list(batch['scenario']) == list(SCENARIOS['scenario'])
+    pd.testing.assert_frame_equal(batch[KPI_COLUMNS], scalar[KPI_COLUMNS], rtol=1e-9)
+    assert "2 scénario(s) en pas trimestriel ou mensuel" in capsys.readouterr().err
+    # Les lignes annuelles ne dépendent pas du pas des autres lignes
+    annual = evaluate(tmp_path, 'annual', SCENARIOS.assign(frequency='annual'), units, base)
+    assert batch.loc[[0, 2, 4], 'Levered IRR'].tolist() == annual.loc[[0, 2, 4], 'Levered IRR'].tolist()
+    assert batch.loc[1, 'Levered IRR'] != annual.loc[1, 'Levered IRR']
+
+
+def test_main_reports_bad_arguments(tmp_path, capsys):
+    assert main(['--units', str(tmp_path / 'missing.csv'), '--jobs', '0']) == 2
+    assert main(['--units', str(tmp_path / 'missing.csv')]) == 1
+    assert 'Erreur' in capsys.readouterr().err
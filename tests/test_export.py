@@ -0,0 +1,81 @@
+"""
+Export Excel : feuilles et valeurs de export_model / export_batch relues avec
+openpyxl.load_workbook.
+"""
+import io
+
+import numpy as np
+import pytest
+from openpyxl import load_workbook
+
+from batch import KPI_COLUMNS, evaluate_batch
+from export import export_batch, export_model
+from financial_model import CASHFLOW_COLUMNS
+from pipeline import ModelGraph
+
+
+def rows(sheet):
+    return [list(row) for row in sheet.iter_rows(values_only=True)]
+
+
+@pytest.fixture
+def units(make_units):
+    return make_units(30, seed=11)
+
+
+@pytest.mark.parametrize('frequency', ['annual', 'quarterly'])
+def test_export_model(tmp_path, units, asset_costs, frequency):
+    operation = {'holding_period': 12, 'frequency': frequency}
+    stages = ModelGraph().run(units, {}, {}, {'df_asset_costs': asset_costs}, {'debt_amount': 3_000_000}, operation)
+    path = tmp_path / 'model.xlsx'
+    export_model(stages, str(path), inputs={'holding_period': 12, 'df_asset_costs': asset_costs})
+    book = load_workbook(path, read_only=True)
+    assert book.sheetnames == ['Inputs', 'General', 'Construction', 'Financing', 'Operation', 'Amortization',
+                               'RentSchedule', 'SaleSchedule', 'Cashflow', 'KPIs']
+    assert rows(book['Inputs']) == [['Item', 'Value'], ['holding_period', 12]]
+
+    cf = stages['CashflowEngine']
+    cashflow = rows(book['Cashflow'])
+    labels = ['Year'] if frequency == 'annual' else ['Period', 'Year']
+    assert cashflow[0] == labels + CASHFLOW_COLUMNS
+    assert len(cashflow) == len(cf.periods) + 1
+    got = np.array([[np.nan if v is None else v for v in row[len(labels):]] for row in cashflow[1:]], dtype=float)
+    expected = np.column_stack([cf.columns[c] for c in CASHFLOW_COLUMNS])
+    np.testing.assert_allclose(got, expected, equal_nan=True)
+
+    kpis = dict(rows(book['KPIs'])[1:])
+    assert kpis['NPV'] == pytest.approx(cf.kpis['NPV'])
+    assert kpis['Levered IRR'] == pytest.approx(cf.kpis['Levered IRR'])
+
+    amortization = stages['Amortization']
+    schedule = rows(book['Amortization'])
+    assert schedule[0] == ['Period', 'Year', 'opening', 'payment', 'interest', 'principal', 'closing']
+    assert schedule[1][:2] == [1, 1]
+    assert schedule[1][3] == pytest.approx(amortization.payment[0])
+
+    rent = rows(book['RentSchedule'])
+    assert rent[0][-1] == 'Total'
+    assert [row[-1] for row in rent[1:]] == pytest.approx(stages['Scheduler'].rent_total.tolist())
+
+
+def test_export_batch(units, asset_costs):
+    scenarios = [{'exit_yield': 7.0, 'holding_period': 10}, {'exit_yield': 9.0, 'holding_period': 14}, {}]
+    result = evaluate_batch(scenarios, units, {'df_asset_costs': asset_costs})
+    content = export_batch(result, cashflow_columns=('Net Cash Flow', 'NOI'), chunk_rows=2)
+    book = load_workbook(io.BytesIO(content), read_only=True)
+    assert book.sheetnames == ['Scenarios', 'Net Cash Flow', 'NOI']
+
+    table = rows(book['Scenarios'])
+    header = table[0]
+    assert header[0] == 'Scenario' and header[-len(KPI_COLUMNS):] == KPI_COLUMNS
+    assert [row[0] for row in table[1:]] == [0, 1, 2]
+    column = {name: [row[i] for row in table[1:]] for i, name in enumerate(header)}
+    assert column['exit_yield'][:2] == [7.0, 9.0]
+    assert column['NPV'] == pytest.approx(result.kpis['NPV'].tolist())
+
+    flows = rows(book['Net Cash Flow'])
+    assert flows[0] == ['Scenario'] + [f'Year {y}' for y in result.years.tolist()]
+    first = flows[1][1:]
+    # Au-delà de la durée de détention : cellules vides
+    assert first[11:] == [None] * (len(first) - 11)
+    assert first[:11] == pytest.approx(result.column('Net Cash Flow')[0, :11].tolist())
@@ -0,0 +1,48 @@
+"""
+GoalSeeker : chaque couple variable / objectif atteint une cible réalisable,
+départ à chaud sur la solution précédente, non-convergence signalée hors bornes.
+"""
+import numpy as np
+import pytest
+
+from goalseek import METRICS, VARIABLES, GoalSeeker
+
+POINTS = {'debt_amount': 0.35, 'exit_yield': 0.3, 'units_rent_multiplier': 0.25}
+
+
+@pytest.fixture
+def seeker(make_units, asset_costs):
+    return GoalSeeker(make_units(30, seed=4), {'df_asset_costs': asset_costs})
+
+
+@pytest.mark.parametrize('metric', METRICS)
+@pytest.mark.parametrize('variable', list(VARIABLES))
+def test_solve_reaches_reachable_target(seeker, variable, metric):
+    lo, hi = seeker.default_bounds(variable)
+    x0 = lo + POINTS[variable] * (hi - lo)
+    target = float(seeker.evaluate(variable, [x0], metric)[0])
+    assert np.isfinite(target)
+    solved = seeker.solve(variable, metric, target)
+    assert solved.converged, solved
+    assert lo <= solved.value <= hi
+    assert solved.achieved == pytest.approx(target, rel=1e-6, abs=1e-6)
+    assert float(seeker.evaluate(variable, [solved.value], metric)[0]) == pytest.approx(target, rel=1e-6, abs=1e-6)
+
+
+def test_warm_start_reuses_last_solution(seeker):
+    target = float(seeker.evaluate('exit_yield', [7.0], 'Levered IRR')[0])
+    cold = seeker.solve('exit_yield', 'Levered IRR', target)
+    warm = seeker.solve('exit_yield', 'Levered IRR', target + 0.01)
+    assert warm.converged
+    assert warm.evaluations < cold.evaluations
+
+
+def test_unreachable_target_is_reported(seeker):
+    solved = seeker.solve('exit_yield', 'Levered IRR', 1e6)
+    assert not solved.converged
+    assert solved.message == "cible hors d'atteinte dans les bornes"
+    assert np.isfinite(solved.value)
+    with pytest.raises(KeyError):
+        seeker.solve('exit_yield', 'unknown', 1.0)
+    with pytest.raises(KeyError):
+        seeker.solve('unknown', 'Levered IRR', 1.0)
@@ -0,0 +1,68 @@
+"""
+Gradients : dérivées analytiques contre différences finies centrées de
+batch.evaluate_batch pour chaque entrée continue, y compris près de la borne
+100 % de l'Occ % décalé (branche relevée) et au-delà (dérivée nulle).
+"""
+import numpy as np
+import pytest
+
+from batch import evaluate_batch
+from gradients import GRADIENT_INPUTS, GRADIENT_KPIS, Gradients
+
+BASE = {'exit_yield': 8.0, 'holding_period': 12, 'debt_amount': 2_000_000, 'interest_rate': 6.0}
+
+
+def finite_differences(units, inputs, keys):
+    """KPI (entrées x GRADIENT_KPIS) par différences centrées, un seul lot."""
+    steps = np.array([1e-4 * max(1.0, abs(inputs.get(k, 0.0))) for k in keys])
+    base = Gradients(units, inputs).values
+    scenarios = []
+    for k, h in zip(keys, steps):
+        scenarios += [{**inputs, k: base[k] - h}, {**inputs, k: base[k] + h}]
+    kpis = evaluate_batch(scenarios, units, inputs).kpis[GRADIENT_KPIS].to_numpy()
+    return (kpis[1::2] - kpis[0::2]) / (2 * steps[:, None])
+
+
+def assert_gradient(units, inputs, keys=GRADIENT_INPUTS):
+    grads = Gradients(units, inputs)
+    expected = finite_differences(units, inputs, list(keys))
+    got = grads.gradient.loc[list(keys), GRADIENT_KPIS].to_numpy()
+    # Tolérance absolue par KPI (échelles différentes : points de TRI, €)
+    tolerance = 1e-4 * np.abs(expected) + 1e-6 * np.abs(expected).max(axis=0)
+    assert (np.abs(got - expected) <= tolerance).all(), got - expected
+    return grads
+
+
+def test_kpis_match_batch(make_units, asset_costs):
+    units, inputs = make_units(30, seed=5), {**BASE, 'df_asset_costs': asset_costs}
+    grads = Gradients(units, inputs)
+    kpis = evaluate_batch([{}], units, inputs).kpis.iloc[0]
+    for key in GRADIENT_KPIS:
+        assert grads.kpis[key] == pytest.approx(kpis[key], rel=1e-9)
+
+
+def test_gradient_matches_central_differences(make_units, asset_costs):
+    assert_gradient(make_units(30, seed=5), {**BASE, 'df_asset_costs': asset_costs, 'units_occ_shift': -2.0})
+
+
+@pytest.fixture
+def full_occupancy(make_units):
+    units = make_units(20, seed=8)
+    units['Occ %'] = 99.0
+    return units
+
+
+def test_near_occupancy_clip(full_occupancy):
+    # Occupation décalée à 99.5 % : la borne 100 % est à 0.5 pt, hors du pas des différences finies
+    grads = assert_gradient(full_occupancy, {**BASE, 'units_occ_shift': 0.5}, ['units_occ_shift', 'occupancy_rate'])
+    assert grads.gradient.loc['units_occ_shift', 'NPV'] > 0
+    bound = grads.discontinuities.query("Input == 'units_occ_shift' and Kind == 'Occ % : borne 100 %'")
+    assert bound['Distance'].item() == pytest.approx(0.5)
+    assert grads.gradient.loc['units_occ_shift', 'Switch'].startswith('Occ % : borne 100 %')
+
+
+def test_beyond_occupancy_clip_has_zero_slope(full_occupancy):
+    grads = assert_gradient(full_occupancy, {**BASE, 'units_occ_shift': 3.0}, ['units_occ_shift'])
+    assert grads.gradient.loc['units_occ_shift', GRADIENT_KPIS].abs().max() == 0
+    bound = grads.discontinuities.query("Input == 'units_occ_shift' and Kind == 'Occ % : borne 100 %'")
+    assert bound['Distance'].item() == pytest.approx(-2.0)
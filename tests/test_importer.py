@@ -0,0 +1,114 @@
+"""
+Import de tables : rapprochement des en-têtes par alias, lecture par blocs
+(CSV, Excel, Parquet) et cache .npy rouvert en mémoire mappée.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from importer import file_key, import_asset_costs, import_table, import_units, normalize_header, resolve_columns
+
+SOURCE = pd.DataFrame({
+    'Unit Code': [f'U-{i}' for i in range(25)],
+    'Classe d’actif': ['Office', 'Retail', 'Résidentiel', 'Hotel', 'Office'] * 5,
+    'Surface GLA (m2)': np.arange(25) * 10.0 + 50,
+    'Loyer €/m²/mois': [12.5] * 25,
+    'Année de vente': ['Exit', 3, 5, 'Exit', 0] * 5,
+    'Occupancy': [90, None, 85, 100, None] * 5,
+    'Notes': ['x'] * 25,
+})
+
+
+def test_normalize_and_resolve_headers():
+    assert normalize_header('Rent (€/m²/mo)') == 'rent eur m2 mo'
+    assert normalize_header(' Année de Vente ') == 'annee de vente'
+    mapping = resolve_columns(SOURCE.columns)
+    assert mapping == {
+        'Unit Code': 'Code', 'Classe d’actif': 'AssetClass', 'Surface GLA (m2)': 'Surface (GLA m²)',
+        'Loyer €/m²/mois': 'Rent (€/m²/mo)', 'Année de vente': 'Sale Year', 'Occupancy': 'Occ %', 'Notes': 'Notes',
+    }
+    assert resolve_columns(['Tenant'], aliases={'Code': ['tenant']}) == {'Tenant': 'Code'}
+    # Deux en-têtes pour la même colonne : seul le premier est importé
+    assert resolve_columns(['GLA', 'Surface']) == {'GLA': 'Surface (GLA m²)'}
+    assert resolve_columns(['Coût €/m²', 'Usage'], kind='asset_costs') == {'Coût €/m²': 'Cost €/m²', 'Usage': 'Asset Class'}
+
+
+def write(tmp_path, suffix):
+    path = tmp_path / f'units.{suffix}'
+    if suffix == 'csv':
+        SOURCE.to_csv(path, index=False)
+    elif suffix == 'xlsx':
+        SOURCE.to_excel(path, index=False, sheet_name='Units')
+    else:
+        SOURCE.astype({'Année de vente': str}).to_parquet(path, index=False)
+    return path
+
+
+@pytest.mark.parametrize('suffix', ['csv', 'xlsx', 'parquet'])
+def test_chunked_read_matches_whole_file(tmp_path, suffix):
+    path = write(tmp_path, suffix)
+    cache = tmp_path / 'cache'
+    whole = import_units(str(path), chunk_rows=100, use_cache=False)
+    chunked = import_units(str(path), chunk_rows=4, cache_dir=str(cache))
+    pd.testing.assert_frame_equal(chunked.df, whole.df)
+    df = chunked.df
+    assert list(df.columns[:5]) == ['Code', 'AssetClass', 'Surface (GLA m²)', 'Rent (€/m²/mo)', 'Sale Year']
+    assert list(df.columns[5:]) == ['Occ %', 'Notes']
+    assert 'Notes' in df.columns and 'Mode' in chunked.missing
+    np.testing.assert_allclose(df['Surface (GLA m²)'], SOURCE['Surface GLA (m2)'])
+    assert list(df['Sale Year'][:5]) == ['Exit', '3', '5', 'Exit', '0']
+    assert df['Occ %'].isna().sum() == 10
+
+
+def test_cache_is_reused_by_file_key(tmp_path):
+    path = write(tmp_path, 'csv')
+    cache = str(tmp_path / 'cache')
+    first = import_units(str(path), cache_dir=cache)
+    assert not first.from_cache
+    assert first.key == file_key(str(path), 'units', None, None)
+    assert os.path.exists(os.path.join(cache, 'imports', first.key, 'columns.json'))
+
+    second = import_units(str(path), cache_dir=cache)
+    assert second.from_cache and second.key == first.key
+    pd.testing.assert_frame_equal(second.df, first.df)
+    assert second.mapping == first.mapping
+
+    # Même contenu en mémoire : même clé ; options ou contenu différents : nouvelle clé
+    class Upload:
+        name = 'units.csv'
+
+        def getvalue(self):
+            return path.read_bytes()
+    assert import_units(Upload(), cache_dir=cache).from_cache
+    assert file_key(str(path), 'units', None, {'Code': ['tenant']}) != first.key
+    SOURCE.head(3).to_csv(path, index=False)
+    third = import_units(str(path), cache_dir=cache)
+    assert not third.from_cache and len(third.df) == 3
+
+
+def test_cached_columns_are_memory_mapped(tmp_path, monkeypatch):
+    import importer
+    path = write(tmp_path, 'csv')
+    cache = str(tmp_path / 'cache')
+    key = import_units(str(path), cache_dir=cache).key
+    arrays, mapping = importer._load_cached(os.path.join(cache, 'imports', key))
+    assert isinstance(arrays['Surface (GLA m²)'], np.memmap)
+    assert mapping['Surface GLA (m2)'] == 'Surface (GLA m²)'
+    # Relu depuis le cache : le fichier source n'est pas relu
+    monkeypatch.setattr(importer, '_read', lambda *a, **k: pytest.fail("fichier source relu"))
+    assert import_units(str(path), cache_dir=cache).from_cache
+
+
+def test_asset_costs_and_errors(tmp_path):
+    path = tmp_path / 'costs.csv'
+    pd.DataFrame({'Usage': ['office', 'retail'], 'Coût travaux €/m²': [1100, 1200]}).to_csv(path, index=False)
+    costs = import_asset_costs(str(path), use_cache=False)
+    assert list(costs.df.columns) == ['Asset Class', 'Cost €/m²'] and costs.missing == []
+    text = tmp_path / 'units.txt'
+    text.write_text('Code\nU-1\n')
+    with pytest.raises(ValueError):
+        import_units(str(text), use_cache=False)
+    with pytest.raises(KeyError):
+        import_table(str(path), kind='other')
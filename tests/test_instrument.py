@@ -0,0 +1,85 @@
+"""
+instrument : abonnés, span/emit, contexte vide sans abonné, totaux d'un
+Recorder et une étape mesurée par nœud de ModelGraph.run (puis relue du cache).
+"""
+import time
+
+import pytest
+
+import instrument
+from pipeline import NODES, ModelGraph
+
+
+@pytest.fixture
+def events():
+    received = []
+    callback = instrument.subscribe(received.append)
+    yield received
+    instrument.unsubscribe(callback)
+
+
+def test_disabled_span_is_shared_nullcontext():
+    assert not instrument.enabled()
+    assert instrument.span('a') is instrument.span('b', rows=3)
+    with instrument.span('a') as event:
+        assert event is None
+    instrument.emit('a')   # sans abonné : rien à publier
+
+
+def test_span_and_emit_publish_to_subscribers(events):
+    assert instrument.enabled()
+    with instrument.span('outer', rows=5, extra='x') as event:
+        event['cache'] = 'miss'
+        with instrument.span('inner'):
+            time.sleep(0.01)
+    instrument.emit('cached', cache='hit')
+    inner, outer, cached = events
+    assert (inner['stage'], inner['depth']) == ('inner', 1)
+    assert (outer['stage'], outer['depth'], outer['rows'], outer['extra'], outer['cache']) == ('outer', 0, 5, 'x', 'miss')
+    assert outer['wall_s'] >= inner['wall_s'] >= 0.01
+    assert outer['self_s'] == pytest.approx(outer['wall_s'] - inner['wall_s'])
+    assert outer['alloc_bytes'] is None
+    assert (cached['cache'], cached['wall_s'], cached['depth']) == ('hit', 0.0, 0)
+
+
+def test_unsubscribe_restores_null_path(events):
+    received = []
+    callback = instrument.subscribe(received.append)
+    instrument.unsubscribe(callback)
+    with instrument.span('a'):
+        pass
+    assert received == [] and len(events) == 1
+
+
+def test_recorder_totals_and_memory():
+    with instrument.recording(memory=True) as rec:
+        with instrument.span('outer'):
+            with instrument.span('inner'):
+                block = bytearray(2**20)
+            del block
+    frame = rec.frame()
+    assert list(frame['stage']) == ['inner', 'outer']
+    top = frame.query('depth == 0')
+    assert top['wall_s'].sum() == pytest.approx(frame['self_s'].sum())
+    assert (frame['alloc_bytes'] >= 2**20).all()
+    assert not instrument.enabled()
+
+
+def test_model_graph_emits_one_span_per_stage(make_units, asset_costs):
+    graph, units = ModelGraph(), make_units(30, seed=2)
+    sections = ({}, {}, {'df_asset_costs': asset_costs}, {'debt_amount': 1_000_000, 'interest_rate': 6.0},
+                {'exit_yield': 8.0, 'holding_period': 12})
+    with instrument.recording() as rec:
+        dict(graph.run(units, *sections))
+    nodes = [e for e in rec.events if e['stage'] in NODES]
+    assert sorted(e['stage'] for e in nodes) == sorted(NODES)
+    assert {e['cache'] for e in nodes} == {'miss'}
+    by_stage = {e['stage']: e for e in nodes}
+    assert by_stage['UnitsTable']['rows'] == 30
+    assert by_stage['CashflowEngine']['rows'] == len(graph.run(units, *sections)['CashflowEngine'].periods)
+    assert {'Construction.asset_costs', 'KPIs'} <= {e['stage'] for e in rec.events}
+
+    with instrument.recording() as rec:
+        dict(graph.run(units, *sections))
+    assert sorted(e['stage'] for e in rec.events) == sorted(NODES)
+    assert {e['cache'] for e in rec.events} == {'hit'}
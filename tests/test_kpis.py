@@ -0,0 +1,41 @@
+"""
+TRI vectorisé (kpis.solve_irr) : racines connues, statuts d'échec et accord
+avec numpy_financial sur des flux conventionnels.
+"""
+import numpy as np
+import numpy_financial as npf
+import pytest
+
+from kpis import IRR_MULTIPLE_SIGN_CHANGES, IRR_NO_SIGN_CHANGE, IRR_OK, equity_kpis, solve_irr
+
+
+def test_known_roots():
+    irr, status = solve_irr(np.array([[-100.0, 110.0, 0.0], [-100.0, 0.0, 121.0], [-100.0, 55.0, 60.5]]))
+    np.testing.assert_allclose(irr, [0.10, 0.10, 0.10], rtol=1e-10)
+    assert status.tolist() == [IRR_OK] * 3
+
+
+def test_failure_statuses():
+    irr, status = solve_irr(np.array([[100.0, 10.0, 10.0], [-100.0, -10.0, -10.0], [-100.0, 230.0, -132.0]]))
+    assert np.isnan(irr[:2]).all()
+    assert status[:2].tolist() == [IRR_NO_SIGN_CHANGE, IRR_NO_SIGN_CHANGE]
+    # Deux changements de signe : racines 10 % et 20 %, la plus proche du point de départ (10 %)
+    assert status[2] == IRR_MULTIPLE_SIGN_CHANGES
+    assert irr[2] == pytest.approx(0.10)
+
+
+def test_matches_numpy_financial():
+    rng = np.random.default_rng(0)
+    flows = np.hstack([-rng.uniform(50, 150, (64, 1)), rng.uniform(0, 30, (64, 20))])
+    irr, status = solve_irr(flows)
+    assert (status == IRR_OK).all()
+    np.testing.assert_allclose(irr, [npf.irr(row) for row in flows], rtol=1e-8)
+
+
+def test_equity_kpis_replace_year_zero():
+    flows = np.array([[-5.0, 10.0, 20.0, 130.0]])
+    kpis = equity_kpis(flows, 0.1, 100.0)
+    final = [-100.0, 10.0, 20.0, 130.0]
+    assert kpis['Levered IRR'][0] == pytest.approx(npf.irr(final) * 100)
+    assert kpis['NPV'][0] == pytest.approx(npf.npv(0.1, final))
+    assert kpis['Equity Multiple'][0] == pytest.approx(1.6)
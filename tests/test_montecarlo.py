@@ -0,0 +1,106 @@
+"""
+Monte Carlo : percentiles des histogrammes cumulés, bandes de trésorerie et
+échantillon contre les tirages exacts, indépendance au nombre de processus et
+validation des paramètres.
+"""
+import numpy as np
+import pytest
+
+from batch import BatchUnits, evaluate_batch
+from montecarlo import METRICS, Distribution, StreamingHistogram, _draw_inputs, _normalize, run_monte_carlo
+
+DISTRIBUTIONS = {
+    'exit_yield': ('normal', 8.25, 0.5),
+    'rent_growth': ('triangular', 1.0, 2.0, 3.5),
+    'Occ %': Distribution('normal', 0.0, 5.0, low=-20, high=20),
+}
+
+
+def test_histogram_percentiles_match_numpy():
+    values = np.random.default_rng(0).normal(10.0, 2.0, 50_000)
+    hist = StreamingHistogram(0.0, 20.0, bins=4000)
+    for part in np.array_split(values, 5):
+        other = StreamingHistogram(0.0, 20.0, bins=4000)
+        other.update(part)
+        hist.merge(other)
+    assert hist.n == len(values)
+    assert hist.mean == pytest.approx(values.mean())
+    assert hist.std == pytest.approx(values.std())
+    for q in (1, 25, 50, 75, 99):
+        assert hist.percentile(q) == pytest.approx(np.percentile(values, q), abs=0.01)
+
+
+def test_histogram_out_of_range_uses_exact_extrema():
+    hist = StreamingHistogram(0.0, 1.0, bins=10)
+    hist.update(np.array([-5.0, 0.5, 7.0, np.nan]))
+    assert hist.n_nan == 1
+    assert hist.percentile(0) == -5.0
+    assert hist.percentile(100) == 7.0
+
+
+def test_result_does_not_depend_on_jobs(make_units, asset_costs):
+    units = make_units(20, seed=2)
+    base = {'df_asset_costs': asset_costs}
+    kwargs = dict(n_paths=300, chunk_size=100, seed=7, bins=200)
+    serial = run_monte_carlo(DISTRIBUTIONS, units, base, jobs=1, **kwargs)
+    parallel = run_monte_carlo(DISTRIBUTIONS, units, base, jobs=2, **kwargs)
+    assert serial.n_paths == 300
+    np.testing.assert_array_equal(serial.summary().to_numpy(), parallel.summary().to_numpy())
+    np.testing.assert_array_equal(serial.irr_status_counts, parallel.irr_status_counts)
+    assert serial.irr_status_counts.sum() == 300
+
+
+def exact_paths(units, base, n_paths, chunk_size, seed):
+    """Trajectoires rejouées bloc par bloc avec les graines de run_monte_carlo : KPI et trésorerie cumulée."""
+    sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    batch_units = BatchUnits(units, base.get('df_asset_costs'))
+    blocks = []
+    for seed_seq, n in zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes):
+        inputs = _draw_inputs(_normalize(DISTRIBUTIONS), base, np.random.default_rng(seed_seq), n)
+        blocks.append(evaluate_batch(inputs, batch_units))
+    cash = np.concatenate([np.cumsum(r.column('Equity CF'), axis=1) for r in blocks])
+    kpis = {key: np.concatenate([r.kpis[key].to_numpy() for r in blocks]) for key in METRICS[:3]}
+    return sizes, kpis, cash
+
+
+def test_bands_and_sample_match_exact_paths(make_units, asset_costs):
+    units = make_units(20, seed=2)
+    base = {'df_asset_costs': asset_costs}
+    result = run_monte_carlo(DISTRIBUTIONS, units, base, n_paths=1000, chunk_size=300, seed=3, cash_bins=2000,
+                             sample_size=100)
+    sizes, kpis, cash = exact_paths(units, base, 1000, 300, 3)
+
+    bands = result.bands()
+    assert list(bands.columns) == ['P5', 'P25', 'P50', 'P75', 'P95'] and len(bands) == cash.shape[1]
+    # Écart au percentile exact : moins de 1 % de l'étendue de l'année
+    spread = cash.max(axis=0) - cash.min(axis=0)
+    for q in (5, 50, 95):
+        assert (np.abs(bands[f'P{q}'] - np.percentile(cash, q, axis=0)) <= 0.01 * spread + 1e-6).all()
+
+    # Échantillon : 100 tirages, les premiers de chaque bloc au prorata de sa taille
+    assert len(result.sample) == 100 and list(result.sample.columns) == METRICS
+    taken = np.diff(np.floor(np.cumsum([0] + sizes) * 100 / 1000).astype(int))
+    rows = np.concatenate([start + np.arange(k) for start, k in zip(np.cumsum([0] + sizes[:-1]), taken)])
+    np.testing.assert_array_equal(result.sample['NPV'].to_numpy(), kpis['NPV'][rows])
+    np.testing.assert_array_equal(result.sample['Min Cash Position'].to_numpy(), cash.min(axis=1)[rows])
+
+
+def test_bands_and_sample_do_not_depend_on_jobs(make_units, asset_costs):
+    units = make_units(20, seed=2)
+    base = {'df_asset_costs': asset_costs}
+    kwargs = dict(n_paths=300, chunk_size=100, seed=7, bins=200, sample_size=50)
+    serial = run_monte_carlo(DISTRIBUTIONS, units, base, jobs=1, **kwargs)
+    parallel = run_monte_carlo(DISTRIBUTIONS, units, base, jobs=2, **kwargs)
+    np.testing.assert_array_equal(serial.bands().to_numpy(), parallel.bands().to_numpy())
+    np.testing.assert_array_equal(serial.sample.to_numpy(), parallel.sample.to_numpy())
+    assert len(run_monte_carlo(DISTRIBUTIONS, units, base, n_paths=20, sample_size=50).sample) == 20
+
+
+def test_invalid_parameters(make_units):
+    units = make_units(5)
+    with pytest.raises(ValueError):
+        run_monte_carlo(DISTRIBUTIONS, units, n_paths=0)
+    with pytest.raises(KeyError):
+        run_monte_carlo({'unknown': ('fixed', 1.0)}, units, n_paths=10)
+    with pytest.raises(ValueError):
+        Distribution('normal', 1.0)
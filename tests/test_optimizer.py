@@ -0,0 +1,78 @@
+"""
+MixOptimizer : meilleur mix contre une énumération exhaustive (VAN, TRI, avec
+contraintes DSCR, pré-ventes et equity de pointe), évaluation par contributions
+égale au modèle complet sur la table modifiée.
+"""
+import itertools
+
+import numpy as np
+import pytest
+
+from batch import evaluate_batch
+from optimizer import MixOptimizer
+
+BASE = {'holding_period': 6, 'exit_yield': 8.0, 'debt_amount': 3_000_000, 'interest_rate': 7.0, 'loan_term': 5,
+        'grace_period': 1}
+
+
+@pytest.fixture(scope='module')
+def setup():
+    from conftest import ASSET_COSTS, random_units
+    units = random_units(8, seed=11, holding_period=6)
+    units['Code'] = ['A', 'A', 'B', 'B', 'C', 'C', 'D', 'D']
+    # Surfaces et loyers relevés : un projet rentable face aux coûts du terrain par défaut
+    units['Surface (GLA m²)'] *= 20
+    units['Rent (€/m²/mo)'] *= 3
+    base = {**BASE, 'df_asset_costs': ASSET_COSTS}
+    optimizer = MixOptimizer(units, base, sale_years=[2, 5])
+    # Tous les mix : produit des options valides de chaque groupe
+    choices = np.array(list(itertools.product(*(np.flatnonzero(v) for v in optimizer.valid))))
+    return units, base, optimizer, choices, optimizer.evaluate(choices)
+
+
+def brute_force(values, objective, min_dscr=None, max_peak=None, presale=None, presale_total=1.0):
+    ok = np.ones(len(values['NPV']), dtype=bool)
+    if min_dscr is not None:
+        ok &= ~(values['Min DSCR'] < min_dscr)
+    if max_peak is not None:
+        ok &= values['Peak Equity'] <= max_peak
+    if presale is not None:
+        ok &= values['Presold'] >= presale * presale_total
+    score = np.where(ok & ~np.isnan(values[objective]), values[objective], -np.inf)
+    return score.max()
+
+
+@pytest.mark.parametrize('objective', ['NPV', 'Levered IRR'])
+@pytest.mark.parametrize('constraint', [None, 'dscr', 'peak', 'presale'])
+def test_matches_exhaustive_search(setup, objective, constraint):
+    units, base, optimizer, choices, values = setup
+    # Seuils entre le meilleur mix libre et l'extrême atteignable : contrainte active, problème faisable
+    free = np.nanargmax(np.where(np.isnan(values[objective]), -np.inf, values[objective]))
+    options = {
+        None: {},
+        'dscr': {'min_dscr': float(values['Min DSCR'][free] + np.nanmax(values['Min DSCR'])) / 2},
+        'peak': {'max_peak_equity': float(values['Peak Equity'][free] + values['Peak Equity'].min()) / 2},
+        'presale': {'presale_share': float(values['Presold'][free] + values['Presold'].max()) / 2 / optimizer.presale_total},
+    }[constraint]
+    expected = brute_force(values, objective, options.get('min_dscr'), options.get('max_peak_equity'),
+                           options.get('presale_share'), optimizer.presale_total)
+    result = optimizer.optimize(objective, beam_width=len(choices), **options)
+    assert result.exhaustive and result.feasible
+    assert result.kpis[objective] == pytest.approx(expected, rel=1e-9)
+    if constraint is not None:
+        assert result.kpis[objective] < values[objective][free]
+
+
+def test_infeasible_constraints_keep_current_table(setup):
+    units, base, optimizer, choices, values = setup
+    result = optimizer.optimize('NPV', max_peak_equity=float(values['Peak Equity'].min()) / 2)
+    assert not result.feasible
+    assert (result.choice == 0).all()
+
+
+def test_optimized_units_match_full_model(setup):
+    units, base, optimizer, choices, values = setup
+    result = optimizer.optimize('NPV')
+    kpis = evaluate_batch([{}], result.units(), base).kpis.iloc[0]
+    assert kpis['NPV'] == pytest.approx(result.kpis['NPV'], rel=1e-9)
+    assert kpis['Levered IRR'] == pytest.approx(result.kpis['Levered IRR'], rel=1e-9)
@@ -0,0 +1,89 @@
+"""
+Pas trimestriel / mensuel : agrégation annuelle du cash flow, échéancier de
+dette par période et TRI annualisé ; le lot vectorisé refuse les pas non annuels.
+"""
+import numpy as np
+import numpy_financial as npf
+import pytest
+
+from batch import BatchInputs
+from financial_model import (Amortization, CapexSummary, CashflowEngine, Construction, Financing, General,
+                             OperationExit, Parking, Scheduler)
+
+BASE = {'debt_amount': 5_000_000, 'interest_rate': 7.0, 'loan_term': 6, 'grace_period': 1, 'holding_period': 10}
+# Lignes dont le total annuel ne dépend pas du pas (la dette et l'impôt suivent l'échéancier par période)
+ROLLED_UP = ['Rental Income', 'Sales Proceeds', 'Exit Proceeds', 'Total Revenues', 'Total OPEX', 'NOI', 'CAPEX',
+             'Debt Drawdown']
+
+
+def engine(inputs, df_units):
+    gen = General(inputs)
+    park = Parking(inputs, df_units)
+    const = Construction({'parking_capex': park.total_capex, **inputs}, gen, df_units)
+    fin = Financing(inputs)
+    op = OperationExit(inputs)
+    capex_sum = CapexSummary(const, fin)
+    amort = Amortization(fin, op)
+    sched = Scheduler(df_units, op, gen, fin)
+    return CashflowEngine(gen, const, fin, capex_sum, op, amort, sched)
+
+
+@pytest.fixture
+def inputs(asset_costs):
+    return {**BASE, 'df_asset_costs': asset_costs}
+
+
+@pytest.mark.parametrize('frequency, m', [('quarterly', 4), ('monthly', 12)])
+def test_periods_roll_up_to_annual(make_units, inputs, frequency, m):
+    units = make_units(40, seed=8, holding_period=10)
+    annual = engine(inputs, units)
+    periodic = engine({**inputs, 'frequency': frequency}, units)
+    assert periodic.periods_per_year == m
+    assert len(periodic.df) == 10 * m + 1
+    rolled = periodic.annual()
+    assert list(rolled.index) == list(annual.df.index)
+    np.testing.assert_allclose(rolled[ROLLED_UP].to_numpy(), annual.df[ROLLED_UP].to_numpy(), rtol=1e-9, atol=1e-6)
+    assert rolled['Net Cash Flow'].sum() == pytest.approx(periodic.columns['Net Cash Flow'].sum())
+    np.testing.assert_array_equal(annual.annual().to_numpy(), annual.df.to_numpy())
+
+
+@pytest.mark.parametrize('frequency, m', [('quarterly', 4), ('monthly', 12)])
+def test_periodic_debt_schedule(frequency, m):
+    fin = Financing(BASE)
+    amort = Amortization(fin, OperationExit({**BASE, 'frequency': frequency}))
+    rate = fin.interest_rate / m
+    grace, term = int(fin.grace_period * m), int(fin.loan_term * m)
+    annuity = npf.pmt(rate, term - grace, -fin.debt_principal)
+    balance = fin.debt_principal
+    for i in range(term):
+        interest = balance * rate
+        payment = interest if i < grace else annuity
+        assert amort.opening[i] == pytest.approx(balance)
+        assert amort.interest[i] == pytest.approx(interest)
+        assert amort.payment[i] == pytest.approx(payment)
+        balance -= payment - interest
+    assert amort.closing[term - 1] == 0
+    assert amort.principal.sum() == pytest.approx(fin.debt_principal)
+    assert not amort.payment[term:].any()
+    assert list(amort.years[:m]) == [1] * m
+    assert amort.schedule[1]['interest'] == pytest.approx(fin.debt_principal * rate)
+
+
+@pytest.mark.parametrize('frequency, m', [('quarterly', 4), ('monthly', 12)])
+def test_irr_is_annualized(make_units, inputs, frequency, m):
+    cf = engine({**inputs, 'frequency': frequency}, make_units(40, seed=9, holding_period=10))
+    flows = cf.columns['Net Cash Flow'].copy()
+    flows[0] = cf.columns['Equity Injection'][0]
+    periodic_irr = npf.irr(flows)
+    assert cf.kpis['Levered IRR'] == pytest.approx(((1 + periodic_irr) ** m - 1) * 100, rel=1e-7)
+    periods = np.arange(len(flows))
+    discount = General(inputs).discount_rate
+    assert cf.kpis['NPV'] == pytest.approx(np.sum(flows / (1 + discount) ** (periods / m)), rel=1e-9)
+
+
+def test_batch_refuses_non_annual_frequency():
+    assert len(BatchInputs([{'frequency': 'annual'}, {}], {'frequency': 'annual'})) == 2
+    with pytest.raises(ValueError):
+        BatchInputs([{'frequency': 'quarterly'}])
+    with pytest.raises(ValueError):
+        BatchInputs([{}], {'frequency': 'monthly'})
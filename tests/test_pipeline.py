@@ -0,0 +1,119 @@
+"""
+ModelGraph : compteurs de mémoïsation, invalidation par section d'entrées,
+construction à la demande et résultats identiques à la chaîne de classes de
+financial_model.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from financial_model import (Amortization, CapexSummary, CashflowEngine, Construction, Financing, General,
+                             OperationExit, Parking, Scheduler)
+from pipeline import NODES, ModelGraph
+
+
+@pytest.fixture
+def sections(make_units, asset_costs):
+    return make_units(40, seed=6), {
+        'general': {'corporate_tax_rate': 30.0},
+        'parking': {'cost_per_space': 9000},
+        'construction': {'df_asset_costs': asset_costs, 'contingency_pct': 5.0},
+        'financing': {'debt_amount': 4_000_000, 'interest_rate': 7.0},
+        'operation': {'exit_yield': 8.25, 'holding_period': 15},
+    }
+
+
+def run(graph, units, s):
+    return graph.run(units, s['general'], s['parking'], s['construction'], s['financing'], s['operation'])
+
+
+def run_all(graph, units, s):
+    # Stages est construit à la demande : dict() lit tous les nœuds
+    stages = run(graph, units, s)
+    dict(stages)
+    return stages
+
+
+def test_graph_matches_class_chain(sections):
+    units, s = sections
+    cf = run(ModelGraph(), units, s)['CashflowEngine']
+    gen = General(s['general'])
+    park = Parking(s['parking'], units)
+    const = Construction(dict(s['construction'], parking_capex=park.total_capex), gen, units)
+    fin = Financing(s['financing'])
+    op = OperationExit(s['operation'])
+    expected = CashflowEngine(gen, const, fin, CapexSummary(const, fin), op, Amortization(fin, op),
+                              Scheduler(units, op, gen, fin))
+    assert cf.kpis == pytest.approx(expected.kpis, nan_ok=True)
+
+
+def test_memo_counters(sections):
+    units, s = sections
+    graph = ModelGraph()
+    first = run_all(graph, units, s)
+    assert set(first.state.values()) == {'miss'} and first.reused() == []
+    second = run_all(graph, units, s)
+    assert set(second.state.values()) == {'hit'}
+    assert second['CashflowEngine'] is first['CashflowEngine']
+    stats = graph.stats()
+    assert (stats['hits'] == 1).all() and (stats['misses'] == 1).all()
+    assert list(stats.index) == list(NODES)
+    graph.clear()
+    assert set(run_all(graph, units, s).state.values()) == {'miss'}
+
+
+@pytest.mark.parametrize('section, change, recomputed', [
+    ('operation', {'exit_yield': 7.0}, {'OperationExit', 'CashflowEngine'}),
+    ('financing', {'interest_rate': 6.0}, {'Financing', 'Amortization', 'CashflowEngine'}),
+    ('parking', {'cost_per_space': 12000}, {'Parking', 'Construction', 'CapexSummary', 'CashflowEngine'}),
+    ('general', {'corporate_tax_rate': 25.0}, {'General', 'CashflowEngine'}),
+])
+def test_only_changed_section_is_recomputed(sections, section, change, recomputed):
+    units, s = sections
+    graph = ModelGraph()
+    before = run_all(graph, units, s)
+    after = run_all(graph, units, dict(s, **{section: dict(s[section], **change)}))
+    assert {name for name, state in after.state.items() if state == 'miss'} == recomputed
+    assert set(after.reused()) == set(NODES) - recomputed
+    assert after['CashflowEngine'].kpis != before['CashflowEngine'].kpis
+
+
+def test_units_change_invalidates_unit_stages(sections, make_units):
+    units, s = sections
+    graph = ModelGraph()
+    run_all(graph, units, s)
+    changed = units.copy()
+    changed.loc[0, 'Rent (€/m²/mo)'] += 1.0
+    state = run_all(graph, changed, s).state
+    assert state['Scheduler'] == 'miss' and state['Financing'] == 'hit'
+
+
+def test_lru_bound_and_threads(sections):
+    units, s = sections
+    graph = ModelGraph(maxsize=2)
+    yields = [7.0, 7.5, 8.0, 8.5] * 4
+
+    def one(y):
+        return run(graph, units, dict(s, operation=dict(s['operation'], exit_yield=y)))['CashflowEngine'].kpis['NPV']
+
+    with ThreadPoolExecutor(4) as pool:
+        npv = list(pool.map(one, yields))
+    assert npv[:4] == npv[4:8]
+    assert all(len(memo) <= 2 for memo in graph._memo.values())
+    stats = graph.stats().loc['CashflowEngine']
+    assert stats['hits'] + stats['misses'] == len(yields)
+
+
+def test_nodes_are_built_on_demand(sections):
+    units, s = sections
+    graph = ModelGraph()
+    stages = run(graph, units, s)
+    assert stages.state == {}
+    stages['Financing']
+    assert stages.state == {'Financing': 'miss'}
+    stages['CashflowEngine']
+    # Sur un hit du cash flow, Scheduler et Amortization ne sont ni relus ni recalculés
+    again = run(graph, units, s)
+    again['CashflowEngine']
+    assert again.state['CashflowEngine'] == 'hit'
+    assert 'Scheduler' not in again.state and 'Amortization' not in again.state
@@ -0,0 +1,94 @@
+"""
+Portefeuille : alignement calendaire des projets (années de démarrage
+décalées), KPI consolidés contre les flux sommés à la main, recalcul du seul
+projet modifié et graphe réutilisé d'un projet à l'autre.
+"""
+import numpy as np
+import numpy_financial as npf
+import pytest
+
+import portfolio
+from financial_model import CASHFLOW_COLUMNS
+from pipeline import ModelGraph
+from portfolio import Portfolio, Project, evaluate_project
+
+
+@pytest.fixture
+def projects(make_units, asset_costs):
+    construction = {'df_asset_costs': asset_costs}
+    return [
+        Project('A', 2026, make_units(20, seed=1, holding_period=10), construction=construction,
+                financing={'debt_amount': 2_000_000}, operation={'holding_period': 10}),
+        Project('B', 2029, make_units(15, seed=2, holding_period=8), construction=construction,
+                financing={'debt_amount': 1_000_000}, operation={'holding_period': 8, 'exit_yield': 7.5}),
+        Project('C', 2027, make_units(10, seed=3, holding_period=12), construction=construction,
+                operation={'holding_period': 12}),
+    ]
+
+
+def test_calendar_alignment(projects):
+    result = Portfolio().run(projects)
+    assert result.cashflows.index[0] == 2026 and result.cashflows.index[-1] == 2039
+    assert list(result.projects['Start Year']) == [2026, 2029, 2027]
+    for project in projects:
+        own = evaluate_project(project).cashflow
+        hold = int(own.index.max())
+        flows = result.equity_flows[project.name]
+        np.testing.assert_allclose(flows.loc[project.start_year:project.start_year + hold], own['Equity CF'])
+        outside = flows.drop(range(project.start_year, project.start_year + hold + 1))
+        assert (outside == 0).all()
+    # Année calendaire 2029 : année 3 de A, année 0 de B, année 2 de C
+    expected = sum(evaluate_project(p).cashflow.loc[2029 - p.start_year, 'NOI'] for p in projects)
+    assert result.cashflows.loc[2029, 'NOI'] == pytest.approx(expected)
+    assert list(result.cashflows.columns) == CASHFLOW_COLUMNS
+    assert result.exposure.sum().sum() == pytest.approx(result.cashflows['Rental Income'].sum())
+    assert result.exposure_share().sum() == pytest.approx(1.0)
+
+
+def test_consolidated_kpis_match_hand_sum(projects):
+    result = Portfolio().run(projects, discount_rate=0.08)
+    flows = np.zeros(14)
+    equity = 0.0
+    for project in projects:
+        own = evaluate_project(project)
+        offset = project.start_year - 2026
+        flows[offset:offset + len(own.cashflow)] += own.cashflow['Equity CF'].to_numpy()
+        equity += own.kpis['Peak Equity']
+    kpis = result.kpis
+    assert kpis['Levered IRR'] == pytest.approx(npf.irr(flows) * 100, rel=1e-8)
+    assert kpis['NPV'] == pytest.approx(npf.npv(0.08, flows), rel=1e-9)
+    assert kpis['Total Equity'] == pytest.approx(equity)
+    assert kpis['Equity Multiple'] == pytest.approx(flows[flows > 0].sum() / equity)
+    assert kpis['Peak Equity'] == pytest.approx(-np.cumsum(flows).min())
+
+
+def test_only_changed_project_is_recomputed(projects):
+    book = Portfolio()
+    assert book.run(projects).recomputed == ['A', 'B', 'C']
+    assert book.run(projects).recomputed == []
+    projects[1].sections['operation']['exit_yield'] = 9.0
+    assert book.run(projects).recomputed == ['B']
+    # Nom et année de démarrage hors empreinte
+    moved = Project('A bis', 2030, projects[0].df_units, **projects[0].sections)
+    assert book.run([moved, projects[1]]).recomputed == []
+    with pytest.raises(ValueError):
+        book.run([projects[0], projects[0]])
+
+
+def test_graph_is_shared_between_projects(projects, monkeypatch):
+    graph = ModelGraph()
+    monkeypatch.setitem(portfolio._WORKER, 'graph', graph)
+    evaluate_project(projects[0])
+    twin = Project('A2', 2031, projects[0].df_units, **dict(projects[0].sections, operation={'holding_period': 10,
+                                                                                              'exit_yield': 9.0}))
+    evaluate_project(twin)
+    stats = graph.stats()
+    assert stats.loc['UnitsTable', 'hits'] == 1 and stats.loc['Construction', 'hits'] == 1
+    assert stats.loc['CashflowEngine', 'misses'] == 2
+
+
+def test_parallel_matches_serial(projects):
+    serial = Portfolio().run(projects)
+    parallel = Portfolio(jobs=2).run(projects)
+    np.testing.assert_allclose(parallel.cashflows.to_numpy(), serial.cashflows.to_numpy())
+    assert parallel.kpis == serial.kpis
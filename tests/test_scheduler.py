@@ -0,0 +1,75 @@
+"""
+Scheduler vectorisé : résultats identiques, au bit près, à la boucle iterrows
+d'origine (reprise ci-dessous telle quelle) sur des tables aléatoires.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from financial_model import Financing, General, OperationExit, Scheduler
+
+
+def loop_schedules(df_units, operation):
+    """Boucle d'origine de Scheduler : (loyers, ventes, surfaces, loyers par classe, ventes par classe)."""
+    rent_schedule, sale_schedule, occupied_area_schedule = {}, {}, {}
+    rent_by_asset, sale_by_asset = {}, {}
+    years = range(1, operation.holding_period + 2)
+    for y in years:
+        rent_schedule[y] = 0.0
+        sale_schedule[y] = 0.0
+        occupied_area_schedule[y] = 0.0
+    asset_classes = df_units['AssetClass'].unique() if 'AssetClass' in df_units.columns else []
+    asset_classes = [str(ac).lower().strip() for ac in asset_classes]
+    for ac in asset_classes:
+        rent_by_asset[ac] = {y: 0.0 for y in years}
+        sale_by_asset[ac] = {y: 0.0 for y in years}
+    rent_by_asset['other'] = {y: 0.0 for y in years}
+    sale_by_asset['other'] = {y: 0.0 for y in years}
+
+    for _, row in df_units.iterrows():
+        asset_key = str(row.get('AssetClass', 'Other')).lower().strip()
+        if asset_key not in rent_by_asset:
+            asset_key = 'other'
+        surface = pd.to_numeric(row.get('Surface (GLA m²)', 0), errors='coerce')
+        base_rent_monthly = pd.to_numeric(row.get('Rent (€/m²/mo)', 0), errors='coerce')
+        base_price_m2 = pd.to_numeric(row.get('Price €/m²', 0), errors='coerce')
+        mode = str(row.get('Mode', '')).lower()
+        start_year = int(pd.to_numeric(row.get('Start Year', 999), errors='coerce'))
+        sale_year_val = row.get('Sale Year', 'Exit')
+        is_exit_sale = str(sale_year_val).strip().lower() == 'exit'
+        sale_year = operation.holding_period if is_exit_sale else int(pd.to_numeric(sale_year_val, errors='coerce') or 999)
+        occ = (pd.to_numeric(row.get('Occ %', np.nan), errors='coerce') / 100.0) if pd.notna(row.get('Occ %')) else operation.occupancy_default
+        rent_growth = (pd.to_numeric(row.get('Rent growth %', np.nan), errors='coerce') / 100.0) if pd.notna(row.get('Rent growth %')) else operation.rent_growth
+        price_growth = (pd.to_numeric(row.get('Asset Value Growth (%/yr)', np.nan), errors='coerce') / 100.0) if pd.notna(row.get('Asset Value Growth (%/yr)')) else operation.inflation
+
+        if mode in ['rent', 'mixed']:
+            current_rent_m2 = base_rent_monthly * 12
+            for y in years:
+                if y >= start_year and (is_exit_sale or sale_year > y):
+                    val = surface * (current_rent_m2 * ((1 + rent_growth) ** y)) * occ
+                    rent_schedule[y] += val
+                    rent_by_asset[asset_key][y] += val
+                    occupied_area_schedule[y] += (surface * occ)
+        if mode in ['sale', 'mixed']:
+            if not is_exit_sale and sale_year in years:
+                val = surface * (base_price_m2 * ((1 + price_growth) ** sale_year))
+                sale_schedule[sale_year] += val
+                sale_by_asset[asset_key][sale_year] += val
+    return rent_schedule, sale_schedule, occupied_area_schedule, rent_by_asset, sale_by_asset
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('holding_period', [5, 20])
+def test_scheduler_matches_loop(make_units, seed, holding_period):
+    df_units = make_units(150, seed=seed)
+    assert set(df_units['Mode']) == {'Rent', 'Sale', 'Mixed'}
+    assert (df_units['Sale Year'] == 'Exit').any() and df_units['Occ %'].isna().any()
+    inputs = {'holding_period': holding_period}
+    operation = OperationExit(inputs)
+    sched = Scheduler(df_units, operation, General(inputs), Financing(inputs))
+    rent, sale, area, rent_by_asset, sale_by_asset = loop_schedules(df_units, operation)
+    assert sched.rent_schedule == rent
+    assert sched.sale_schedule == sale
+    assert sched.occupied_area_schedule == area
+    assert sched.rent_schedule_by_asset == rent_by_asset
+    assert sched.sale_schedule_by_asset == sale_by_asset
@@ -0,0 +1,40 @@
+"""
+SensitivityEngine : tableau et tornado (étapes de base réutilisées) contre des
+réévaluations complètes avec batch.evaluate_batch.
+"""
+import numpy as np
+import pytest
+
+from batch import evaluate_batch
+from sensitivity import DEFAULT_TORNADO, SensitivityEngine
+
+
+@pytest.fixture
+def setup(make_units, asset_costs):
+    return make_units(40, seed=3), {'df_asset_costs': asset_costs}
+
+
+def test_grid_matches_full_evaluation(setup):
+    units, base = setup
+    sens = SensitivityEngine(units, base)
+    exit_yields = [7.0, 8.25, 9.5]
+    shifts = [-1.0, 0.0, 1.5]
+    grid = sens.grid('exit_yield', exit_yields, 'units_rent_growth_shift', shifts)
+    scenarios = [{'exit_yield': x, 'units_rent_growth_shift': y} for y in shifts for x in exit_yields]
+    full = evaluate_batch(scenarios, units, base).kpis['Levered IRR'].to_numpy()
+    np.testing.assert_allclose(grid.to_numpy().ravel(), full, rtol=1e-9, atol=1e-9)
+    assert sens.stats['reused'] == {'capex': 1, 'amortization': 1}
+
+
+def test_tornado_matches_full_evaluation(setup):
+    units, base = setup
+    sens = SensitivityEngine(units, base)
+    tornado = sens.tornado().set_index('Input')
+    assert set(tornado.index) == set(DEFAULT_TORNADO)
+    assert (tornado['Swing'].diff().dropna() <= 0).all()
+    scenarios = [{key: tornado.loc[key, bound]} for key in DEFAULT_TORNADO for bound in ('Low', 'High')]
+    full = evaluate_batch([{}] + scenarios, units, base).kpis['Levered IRR'].to_numpy()
+    assert tornado['Base'].iloc[0] == pytest.approx(full[0])
+    got = np.column_stack([tornado.loc[list(DEFAULT_TORNADO), 'KPI Low'],
+                           tornado.loc[list(DEFAULT_TORNADO), 'KPI High']]).ravel()
+    np.testing.assert_allclose(got, full[1:], rtol=1e-9, atol=1e-9)
@@ -0,0 +1,130 @@
+"""
+service : requêtes simultanées regroupées en un lot, scénario invalide refusé
+(400) à sa seule requête, échec d'un lot isolé, scénarios trimestriels évalués
+par la chaîne scalaire ; service réel sur un port éphémère.
+"""
+import asyncio
+import http.client
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import service
+from pipeline import ModelGraph
+
+BASE = {'exit_yield': 8.0, 'holding_period': 12, 'debt_amount': 1_000_000, 'interest_rate': 6.0}
+
+
+@pytest.fixture(scope='module')
+def units():
+    from conftest import random_units
+    return random_units(25, seed=4)
+
+
+@pytest.fixture(scope='module')
+def server(units):
+    """Service lancé dans un thread (pool de processus réel) ; renvoie (hôte, port)."""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    address = {}
+
+    def on_ready(url):
+        address['url'] = url
+        ready.set()
+
+    task = loop.create_task(service.serve(units, BASE, port=0, workers=2, window_ms=100, ready=on_ready))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        # Connexions encore ouvertes : fermées avant la boucle
+        pending = asyncio.all_tasks(loop)
+        for t in pending:
+            t.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.close()
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert ready.wait(30)
+    host, port = address['url'].removeprefix('http://').split(':')
+    yield host, int(port)
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join(30)
+
+
+def post(server, payload, path='/evaluate'):
+    connection = http.client.HTTPConnection(*server, timeout=30)
+    try:
+        connection.request('POST' if payload is not None else 'GET', path, body=json.dumps(payload) if payload is not None else None)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def direct(units, scenario):
+    inputs = {**BASE, **scenario}
+    return ModelGraph().run(units, inputs, inputs, inputs, inputs, inputs)['CashflowEngine'].kpis
+
+
+def test_concurrent_requests_are_coalesced(server, units):
+    before = post(server, None, '/stats')[1]
+    scenarios = [{'exit_yield': 7.0 + i / 10} for i in range(12)] + [{'holding_period': 0}]
+    with ThreadPoolExecutor(len(scenarios)) as pool:
+        replies = list(pool.map(lambda s: post(server, {'scenario': s}), scenarios))
+    after = post(server, None, '/stats')[1]
+
+    assert [status for status, _ in replies] == [200] * 12 + [400]
+    assert 'error' in replies[-1][1]
+    assert after['requests'] - before['requests'] == 12
+    assert after['batches'] - before['batches'] < 12
+    for scenario, (_, reply) in zip(scenarios[:-1], replies):
+        assert reply['kpis']['Levered IRR'] == pytest.approx(direct(units, scenario)['Levered IRR'], abs=1e-6)
+
+
+def test_quarterly_scenario_uses_scalar_path(server, units):
+    before = post(server, None, '/stats')[1]
+    status, reply = post(server, {'scenario': {'frequency': 'quarterly', 'exit_yield': 7.5}, 'cashflow': True})
+    after = post(server, None, '/stats')[1]
+    assert status == 200
+    assert after['batches'] == before['batches']
+    expected = direct(units, {'frequency': 'quarterly', 'exit_yield': 7.5})
+    assert reply['kpis']['Levered IRR'] == pytest.approx(expected['Levered IRR'], abs=1e-6)
+    assert len(reply['cashflow']['Period']) == 4 * BASE['holding_period'] + 1
+
+
+@pytest.mark.parametrize('payload', [
+    {'scenario': {'frequency': 'weekly'}},
+    {'scenario': {'exit_yield': 'high'}},
+    {'scenario': {'unknown_input': 1}},
+    {'scenario': []},
+])
+def test_invalid_requests_get_400(server, payload):
+    status, reply = post(server, payload)
+    assert status == 400 and reply['error']
+
+
+def test_failed_batch_is_retried_per_request(units, monkeypatch):
+    service._init_worker(units, BASE)
+    evaluate = service._evaluate_batch
+
+    def failing(scenarios, cashflows):
+        if any(s.get('exit_yield') == 99 for s in scenarios):
+            raise ValueError("scénario refusé")
+        return evaluate(scenarios, cashflows)
+    monkeypatch.setattr(service, '_evaluate_batch', failing)
+
+    async def main():
+        with ThreadPoolExecutor(1) as pool:
+            coalescer = service.Coalescer(pool, window=0.05)
+            replies = await asyncio.gather(*(coalescer.submit({'exit_yield': y}) for y in (7.0, 99, 8.0)),
+                                           return_exceptions=True)
+            return coalescer, replies
+    coalescer, (first, failed, last) = asyncio.run(main())
+    assert isinstance(failed, ValueError)
+    assert first['kpis']['Levered IRR'] != last['kpis']['Levered IRR']
+    assert coalescer.batches == 4 and coalescer.errors == 2
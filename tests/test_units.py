@@ -0,0 +1,73 @@
+"""
+UnitsTable : conversion typée, relevé des valeurs invalides, et mêmes
+résultats pour Parking / Construction / Scheduler depuis une table partagée.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from financial_model import Construction, Financing, General, OperationExit, Parking, Scheduler, UnitsTable
+
+
+def test_typed_conversion():
+    df = pd.DataFrame({
+        'AssetClass': ['Office', 'office ', 'Retail'],
+        'Surface (GLA m²)': [100.0, None, '250'],
+        'Mode': ['Rent', 'sale', 'MIXED'],
+        'Start Year': [1, 2.7, 3],
+        'Sale Year': ['Exit', 0, 5],
+        'Occ %': [80, None, 95],
+    })
+    table = UnitsTable(df)
+    assert table.errors == []
+    np.testing.assert_array_equal(table.surface, [100.0, 0.0, 250.0])
+    np.testing.assert_array_equal(table.start_year, [1, 2, 3])
+    np.testing.assert_array_equal(table.sale_year, [UnitsTable.SALE_AT_EXIT, UnitsTable.NEVER, 5])
+    np.testing.assert_array_equal(table.is_rent, [True, False, True])
+    np.testing.assert_array_equal(table.is_sale, [False, True, True])
+    np.testing.assert_array_equal(table.occ_given, [True, False, True])
+    assert table.asset_codes[0] == table.asset_codes[1] != table.asset_codes[2]
+    assert table.gla_matching('office') == 100.0
+    assert UnitsTable.of(table) is table
+
+
+def test_invalid_values_are_collected():
+    df = pd.DataFrame({
+        'Surface (GLA m²)': [100, 'abc', 50],
+        'Mode': ['Rent', 'Lease', ''],
+        'Start Year': [1, None, 2],
+        'Sale Year': ['Exit', 'soon', 3],
+        'Occ %': ['90', 'n/a', None],
+    }, index=[10, 11, 12])
+    table = UnitsTable(df)
+    found = {(row, column) for row, column, _, _ in table.errors}
+    assert found == {(11, 'Surface (GLA m²)'), (11, 'Mode'), (11, 'Start Year'), (11, 'Sale Year'), (11, 'Occ %')}
+    report = table.error_report()
+    assert list(report.columns) == ['Row', 'Column', 'Value', 'Error']
+    assert report.set_index('Column').loc['Surface (GLA m²)', 'Value'] == 'abc'
+    # Valeurs neutres à la place des cellules invalides
+    assert table.surface[1] == 0 and table.mode[1] == 0 and table.start_year[1] == UnitsTable.NEVER
+    assert table.sale_year[1] == UnitsTable.NEVER and not table.occ_given[1]
+    with pytest.raises(ValueError, match="5 valeur"):
+        table.raise_for_errors()
+    UnitsTable(df.iloc[[0, 2]]).raise_for_errors()
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_shared_table_matches_dataframe(make_units, asset_costs, seed):
+    df = make_units(60, seed=seed)
+    table = UnitsTable(df)
+    inputs = {'df_asset_costs': asset_costs, 'cost_per_space': 15000}
+    gen, fin, op = General(inputs), Financing(inputs), OperationExit(inputs)
+
+    assert Parking(inputs, table).total_capex == Parking(inputs, df).total_capex
+    from_table = Construction(inputs, gen, table)
+    from_df = Construction(inputs, gen, df)
+    assert from_table.total_capex == from_df.total_capex
+    assert from_table.gfa_calculated == from_df.gfa_calculated
+
+    sched_table, sched_df = Scheduler(table, op, gen, fin), Scheduler(df, op, gen, fin)
+    assert sched_table.rent_schedule == sched_df.rent_schedule
+    assert sched_table.sale_schedule == sched_df.sale_schedule
+    assert sched_table.occupied_area_schedule == sched_df.occupied_area_schedule
+    assert sched_table.rent_schedule_by_asset == sched_df.rent_schedule_by_asset
@@ -0,0 +1,36 @@
+"""
+viz : agrégation des périodes bornée, nuage WebGL puis grille de densité au-delà
+de `max_points`, fan chart d'un tableau de percentiles.
+"""
+import numpy as np
+import pandas as pd
+
+from viz import aggregate_periods, fan_chart, scatter
+
+
+def test_aggregate_periods_keeps_totals():
+    df = pd.DataFrame({'NOI': np.arange(241.0), 'Debt Service': np.r_[np.nan, np.ones(240)]},
+                      index=pd.Index(np.arange(241), name='Period'))
+    assert aggregate_periods(df, max_points=300) is df
+    out = aggregate_periods(df, max_points=120)
+    assert len(out) <= 120 and out.index[0] == 0 and out.index.name == 'Period'
+    assert out['NOI'].sum() == df['NOI'].sum()
+    assert out['Debt Service'].sum() == 240
+
+
+def test_scatter_switches_to_density_grid():
+    rng = np.random.default_rng(0)
+    x, y = rng.normal(size=5000), rng.normal(size=5000)
+    x[0] = np.nan
+    points = scatter(x, y, max_points=10_000)
+    assert points.data[0].type == 'scattergl' and len(points.data[0].x) == 4999
+    grid = scatter(x, y, max_points=1000, bins=40)
+    assert grid.data[0].type == 'heatmap' and np.nansum(grid.data[0].z) == 4999
+
+
+def test_fan_chart_bands_and_median():
+    bands = pd.DataFrame({'P5': [0, 1], 'P25': [1, 2], 'P50': [2, 3], 'P75': [3, 4], 'P95': [4, 5]},
+                         index=pd.Index([0, 1], name='Year'))
+    fig = fan_chart(bands)
+    assert len(fig.data) == 5
+    assert [t.name for t in fig.data if t.name] == ['P5 - P95', 'P25 - P75', 'P50']
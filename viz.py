@@ -0,0 +1,79 @@
+"""
+Graphiques et tableaux du tableau de bord, à coût d'affichage borné : les
+données sont réduites côté serveur avant d'être envoyées au navigateur.
+
+- fan_chart : bandes de percentiles précalculées (MonteCarloResult.bands) ;
+- aggregate_periods : flux regroupés par blocs de périodes consécutives ;
+- scatter : nuage WebGL (Scattergl), densité 2-D au-delà de `max_points` ;
+- large_dataframe : tableau virtualisé, formaté par column_config plutôt que Styler.
+"""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+BAND_COLORS = ['rgba(37, 99, 235, 0.15)', 'rgba(37, 99, 235, 0.30)', 'rgba(37, 99, 235, 0.45)']
+
+
+def fan_chart(bands: pd.DataFrame, title="", yaxis_title="", color='#2563EB') -> go.Figure:
+    """
+    Fan chart d'un tableau de percentiles (colonnes P5, P25, P50, ... triées) :
+    une bande par paire de percentiles symétriques, la médiane en trait plein.
+    """
+    columns = list(bands.columns)
+    x = bands.index.to_numpy()
+    fig = go.Figure()
+    for depth in range(len(columns) // 2):
+        low, high = columns[depth], columns[-1 - depth]
+        fig.add_trace(go.Scatter(x=x, y=bands[high], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=x, y=bands[low], mode='lines', line=dict(width=0), fill='tonexty',
+                                 fillcolor=BAND_COLORS[min(depth, len(BAND_COLORS) - 1)], name=f"{low} - {high}"))
+    if len(columns) % 2:
+        fig.add_trace(go.Scatter(x=x, y=bands[columns[len(columns) // 2]], mode='lines', line=dict(color=color, width=2),
+                                 name=columns[len(columns) // 2]))
+    fig.update_layout(title=title, yaxis_title=yaxis_title, xaxis_title=bands.index.name, plot_bgcolor="white")
+    return fig
+
+
+def aggregate_periods(df: pd.DataFrame, max_points=120) -> pd.DataFrame:
+    """
+    Flux sommés par blocs de périodes consécutives pour ne pas dépasser `max_points`
+    lignes ; chaque bloc prend l'index de sa première période. Inchangé si déjà assez court.
+    """
+    if len(df) <= max_points:
+        return df
+    starts = np.arange(0, len(df), -(-len(df) // max_points))
+    data = {column: np.add.reduceat(df[column].fillna(0.0).to_numpy(), starts) for column in df.columns}
+    return pd.DataFrame(data, index=df.index[starts])
+
+
+def scatter(x, y, max_points=20_000, bins=150, x_title="", y_title="", title="") -> go.Figure:
+    """
+    Nuage de points en WebGL (Scattergl). Au-delà de `max_points`, les points sont
+    agrégés en une grille de densité `bins` x `bins` calculée ici : le volume envoyé
+    au navigateur ne dépend plus du nombre de scénarios.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+    if len(x) <= max_points:
+        trace = go.Scattergl(x=x, y=y, mode='markers', marker=dict(size=4, color='#2563EB', opacity=0.4))
+    else:
+        counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins)
+        trace = go.Heatmap(x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2,
+                           z=np.where(counts.T > 0, counts.T, np.nan), colorscale='Blues', colorbar=dict(title="Tirages"))
+    fig = go.Figure(trace)
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title=y_title, plot_bgcolor="white")
+    return fig
+
+
+def large_dataframe(df: pd.DataFrame, number_format="%,.0f", **kwargs):
+    """
+    st.dataframe sans Styler : le format des nombres passe par column_config et
+    la grille du navigateur est virtualisée (seules les lignes visibles sont
+    dessinées) ; le coût ne croît plus avec la mise en forme de chaque cellule.
+    """
+    import streamlit as st
+    config = {column: st.column_config.NumberColumn(format=number_format)
+              for column in df.columns if pd.api.types.is_numeric_dtype(df[column])}
+    st.dataframe(df, column_config=config, **kwargs)